@@ -0,0 +1,127 @@
+"""
+Bulk loader: JSONL / Parquet archetype files -> USER_VECTORS + SERVER_MEMBERSHIPS.
+Run from backend/: python load_archetypes.py users.jsonl [more files...]
+
+Every batch of rows goes through matching_engine.bulk_upsert_archetypes(),
+i.e. one staged MERGE per batch rather than one MERGE + commit per row.
+Each user's vector is stored once; every (user, server) becomes a membership.
+
+Record fields (one JSON object per line, or one Parquet row):
+    user_id              required
+    server_id            required unless --server-ids is given
+    scores               required — {variable: float}, or its JSON text
+    vector               optional — 50 floats as they should be stored
+    evidence, reputation_score, confidence, message_count_used   optional
+
+--server-ids general,hackathon,friend,cofounder writes every record once per
+listed server (what the seed scripts do), ignoring any server_id in the file.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Iterator, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "matching"))
+
+from matching_engine import bulk_upsert_archetypes
+
+DEFAULT_BATCH_SIZE = 10000
+_JSON_FIELDS = ("scores", "vector", "evidence")
+
+
+def read_records(path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[tuple[str, dict]]:
+    """
+    (location, record) pairs from a .jsonl/.ndjson or .parquet file,
+    streamed. location is "path:line" ("path:row" for Parquet).
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        row_no = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            for record in batch.to_pylist():
+                row_no += 1
+                yield f"{path}:{row_no}", record
+        return
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield f"{path}:{line_no}", json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_no}: {e}") from e
+
+
+def to_rows(record: dict, server_ids: Optional[list[str]], where: str = "record") -> list[dict]:
+    """
+    One bulk_upsert_archetypes() row per target server for a file record.
+    Raises ValueError naming `where` (path:line) for an invalid record.
+    """
+    row = dict(record)
+    for field in _JSON_FIELDS:
+        if isinstance(row.get(field), str):
+            try:
+                row[field] = json.loads(row[field])
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{where}: {field}: {e}") from e
+    if not (row.get("user_id") and row.get("scores")):
+        raise ValueError(f"{where}: record needs user_id and scores")
+    if server_ids:
+        return [{**row, "server_id": server_id} for server_id in server_ids]
+    if not row.get("server_id"):
+        raise ValueError(f"{where}: record for {row['user_id']} has no server_id (or pass --server-ids)")
+    return [row]
+
+
+def load(paths: list[str], server_ids: Optional[list[str]] = None,
+         batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False) -> dict:
+    totals = {"rows": 0, "inserted": 0, "updated": 0, "memberships": 0, "batches": 0}
+    started = time.perf_counter()
+    batch: list[dict] = []
+
+    def flush():
+        if not batch:
+            return
+        if not dry_run:
+            report = bulk_upsert_archetypes(batch)
+            totals["inserted"] += report["inserted"]
+            totals["updated"] += report["updated"]
+            totals["memberships"] += report["memberships"]
+        totals["rows"] += len(batch)
+        totals["batches"] += 1
+        elapsed = time.perf_counter() - started
+        print(f"  batch {totals['batches']}: {totals['rows']} rows, "
+              f"{totals['rows'] / elapsed:,.0f} rows/s")
+        batch.clear()
+
+    for path in paths:
+        print(f"Loading {path}")
+        for where, record in read_records(path, batch_size):
+            batch.extend(to_rows(record, server_ids, where))
+            if len(batch) >= batch_size:
+                flush()
+    flush()
+
+    totals["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load archetype vectors into USER_VECTORS")
+    parser.add_argument("paths", nargs="+", help=".jsonl / .ndjson / .parquet files")
+    parser.add_argument("--server-ids", default=None,
+                        help="Comma-separated servers to write every record to")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per MERGE (default: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and validate only")
+    args = parser.parse_args()
+
+    servers = [s.strip() for s in args.server_ids.split(",") if s.strip()] if args.server_ids else None
+    summary = load(args.paths, servers, args.batch_size, args.dry_run)
+    print(json.dumps(summary, indent=2))
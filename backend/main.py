@@ -19,6 +19,7 @@ from typing import Optional
 
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -36,19 +37,24 @@ from features import (
     how_well_do_you_know_me,
     growth_diff,
     group_match,
+    partition_teams,
     relationship_type,
     opening_message,
 )
 from vector_extraction import run_pipeline, extract_user_messages, scrub_pii, build_corpus
 from matching import compute_match, result_to_dict
+from team_search import GROUP_MODES, PARTITION_OBJECTIVES
+from team_jobs import submit_job, get_job, cancel_job, job_events
+from embedding_jobs import enqueue_embedding, get_embedding_job
+from history_writer import get_history_writer
 from matching_engine import (
     get_matches as snowflake_get_matches,
     get_matches_cortex as snowflake_get_matches_cortex,
     get_group_match as snowflake_get_group_match,
     upsert_archetype,
     upsert_raw_corpus,
-    embed_and_upsert_archetype,
     increment_abandonment,
+    precompute_matches,
 )
 
 # Optional: Solana minting helpers (graceful if solders not installed)
@@ -114,6 +120,8 @@ class GroupPayload(BaseModel):
     vectors: list[dict]
     names: list[str]
     team_size: int = 4
+    mode: str = "exhaustive"  # exhaustive | exact | heuristic | partition
+    objective: str = "total"  # partition mode: total | min
 
 class BlurbPayload(BaseModel):
     vector_a: dict
@@ -142,10 +150,17 @@ class SnowflakeMatchPayload(BaseModel):
     top_n: int = 10
     include_blurbs: bool = False
     use_cortex: bool = False  # use Snowflake Cortex Search (768-dim) for vector comparison
+    cortex_rerank: bool = True  # with use_cortex: re-rank Cortex candidates on their 50-dim scores
+    pushdown: Optional[bool] = None  # re-rank the whole pool in Snowflake (default: MATCH_RERANK_PUSHDOWN)
 
 class SnowflakeGroupPayload(BaseModel):
     server_id: str
     team_size: int = 4
+    mode: str = "exhaustive"  # exhaustive | exact | heuristic | partition
+    objective: str = "total"  # partition mode: total | min
+
+class GroupJobPayload(SnowflakeGroupPayload):
+    time_budget_seconds: Optional[float] = None  # stop and return the best found after this long
 
 class ArchetypePayload(BaseModel):
     user_id: str
@@ -169,6 +184,7 @@ def health():
     return {
         "status": "ok",
         "gemini_key_loaded": bool(GEMINI_API_KEY),
+        "match_history": get_history_writer().metrics(),
     }
 
 
@@ -187,9 +203,10 @@ async def extract_and_ingest(
 ):
     """
     Upload a Google Takeout Gemini JSON file.
-    Parses, scrubs PII, stores the cleaned corpus in Snowflake
-    raw_user_onboarding, then generates a 768-dim embedding via
-    SNOWFLAKE.CORTEX.EMBED_TEXT_768 and upserts into user_archetypes.
+    Parses, scrubs PII and stores the cleaned corpus in Snowflake
+    raw_user_onboarding, then queues the 768-dim embedding
+    (SNOWFLAKE.CORTEX.EMBED_TEXT_768 -> USER_VECTORS) as a background
+    job and returns at once. Poll GET /extract/jobs/{job_id} for progress.
 
     If wallet_address is provided and Solana is enabled, returns the
     instruction data needed to mint a Soulbound UserIdentity on-chain.
@@ -211,7 +228,7 @@ async def extract_and_ingest(
         message_count = len(messages)
 
         upsert_raw_corpus(user_id, cleaned_corpus)
-        embed_and_upsert_archetype(user_id, server_id)
+        embedding_job = enqueue_embedding(user_id, server_id)
 
         result = {
             "success": True,
@@ -219,6 +236,7 @@ async def extract_and_ingest(
             "corpus_length": len(cleaned_corpus),
             "user_id": user_id,
             "server_id": server_id,
+            "embedding_job": embedding_job.snapshot(),
         }
 
         if wallet_address and SOLANA_ENABLED:
@@ -246,6 +264,15 @@ async def extract_and_ingest(
             os.remove(tmp_path)
 
 
+@app.get("/extract/jobs/{job_id}")
+def get_extract_job(job_id: str):
+    """Status and progress of a background embedding job started by /extract."""
+    job = get_embedding_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
 # ── 1b. SOULBOUND IDENTITY MINTING ────────────────────────────────────────
 
 class MintPayload(BaseModel):
@@ -464,8 +491,14 @@ def get_group_match(payload: GroupPayload):
         raise HTTPException(status_code=400, detail=f"Need at least {payload.team_size} people in the pool")
     if len(payload.vectors) != len(payload.names):
         raise HTTPException(status_code=400, detail="vectors and names must be same length")
+    if payload.mode not in GROUP_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {GROUP_MODES}")
+    if payload.objective not in PARTITION_OBJECTIVES:
+        raise HTTPException(status_code=400, detail=f"objective must be one of {PARTITION_OBJECTIVES}")
     try:
-        return group_match(payload.vectors, payload.names, payload.team_size)
+        if payload.mode == "partition":
+            return partition_teams(payload.vectors, payload.names, payload.team_size, payload.objective)
+        return group_match(payload.vectors, payload.names, payload.team_size, payload.mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -524,8 +557,9 @@ def store_archetype(payload: ArchetypePayload):
 @app.post("/v2/match")
 def get_snowflake_matches(payload: SnowflakeMatchPayload):
     """
-    Production matching. When use_cortex=True: vector comparison is done entirely
-    in Snowflake via Cortex Search (768-dim, same as frontend). When use_cortex=False:
+    Production matching. When use_cortex=True: candidates come from Snowflake
+    Cortex Search (768-dim, same as frontend) and, unless cortex_rerank=False,
+    are re-ranked on their 50-dim scores with full results. When use_cortex=False:
     legacy 50-dim vector + Python re-rank.
     """
     if payload.context not in ("hackathon", "romantic", "friendship"):
@@ -541,6 +575,7 @@ def get_snowflake_matches(payload: SnowflakeMatchPayload):
                 top_n=payload.top_n,
                 include_blurbs=payload.include_blurbs,
                 api_key=GEMINI_API_KEY,
+                rerank=payload.cortex_rerank,
             )
         return snowflake_get_matches(
             user_id=payload.user_id,
@@ -550,20 +585,89 @@ def get_snowflake_matches(payload: SnowflakeMatchPayload):
             top_n=payload.top_n,
             include_blurbs=payload.include_blurbs,
             api_key=GEMINI_API_KEY,
+            pushdown=payload.pushdown,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class PrecomputePayload(BaseModel):
+    server_id: str
+
+
+@app.post("/v2/match/precompute")
+def precompute_snowflake_matches(payload: PrecomputePayload):
+    """
+    Recompute the server's stored top-N matches now (a background job also
+    refreshes them periodically). /v2/match serves these while fresh.
+    """
+    try:
+        return precompute_matches(payload.server_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/v2/match/group")
 def get_snowflake_group(payload: SnowflakeGroupPayload):
     """Find optimal hackathon team from all active users in a server."""
+    if payload.mode not in GROUP_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {GROUP_MODES}")
+    if payload.objective not in PARTITION_OBJECTIVES:
+        raise HTTPException(status_code=400, detail=f"objective must be one of {PARTITION_OBJECTIVES}")
     try:
-        return snowflake_get_group_match(payload.server_id, payload.team_size)
+        return snowflake_get_group_match(payload.server_id, payload.team_size, payload.mode, payload.objective)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/v2/match/group/jobs")
+def submit_snowflake_group_job(payload: GroupJobPayload):
+    """
+    Same search as /v2/match/group, run in the background.
+    Returns a job to poll (GET /v2/match/group/jobs/{job_id}) or stream
+    (GET .../events); the job reports best-so-far, work done and ETA.
+    """
+    if payload.mode not in GROUP_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {GROUP_MODES}")
+    if payload.objective not in PARTITION_OBJECTIVES:
+        raise HTTPException(status_code=400, detail=f"objective must be one of {PARTITION_OBJECTIVES}")
+
+    def search(control):
+        return snowflake_get_group_match(
+            payload.server_id, payload.team_size, payload.mode, payload.objective, control=control,
+        )
+
+    params = payload.model_dump(exclude={"time_budget_seconds"})
+    return submit_job(search, params, payload.time_budget_seconds).snapshot()
+
+
+@app.get("/v2/match/group/jobs/{job_id}")
+def get_group_job(job_id: str):
+    """Job status, live progress, and the result once finished."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
+@app.get("/v2/match/group/jobs/{job_id}/events")
+def stream_group_job(job_id: str):
+    """Server-sent events: progress updates, then a final result event."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(job_events(job), media_type="text/event-stream")
+
+
+@app.post("/v2/match/group/jobs/{job_id}/cancel")
+def cancel_group_job(job_id: str):
+    """Stop a job; it finishes with the best teams found so far."""
+    job = cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
 @app.post("/v2/abandon")
 def report_abandonment(payload: AbandonPayload):
     """Increment abandonment counter for a user. Auto-flags at >= 3."""
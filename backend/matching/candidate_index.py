@@ -0,0 +1,218 @@
+"""
+candidate_index.py
+==================
+Columnar candidates for get_matches(), and the in-process per-server index
+that serves them.
+
+CandidateSet is Phase 1's output whichever way it was fetched (index,
+Snowflake Arrow batches): parallel arrays instead of one dict per row, with
+scores rebuilt from the vector in DIMENSION_ORDER only for the rows that
+get a full breakdown. Evidence is not part of it — it is only needed for
+blurbs and is fetched separately for those rows.
+
+CandidateIndex mirrors one server's active, unflagged users in contiguous
+arrays next to an id table:
+
+  - vectors:    float32 (n, 50), archetype_vector as stored in Snowflake
+  - unit:       float32 (n, 50), the same rows L2-normalised for cosine retrieval
+  - reputation: float64 (n,)
+
+Scoring never sees the raw float32 values: float32 moves decimals like 0.65
+to 0.64999998, enough to flip a clash, bonus or role threshold, so vectors
+leave the index (and the storage backends) snapped back to the decimals
+SCORES_JSON holds (stored_scores). Cosine retrieval stays in float32 like
+VECTOR_COSINE_SIMILARITY.
+
+Retrieval pages through the server in descending score_upper_bound order
+(one vectorised pass over the rows plus a sort), keyed on (bound, user_id)
+so each page starts where the last one stopped (bound_page). Snowflake stays
+the source of truth: the index is bootstrapped from one bulk query and then
+fed changed rows (see matching_engine's poller, keyed on updated_at).
+Not thread-safe on its own — hold `lock`.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from matching import DIMENSION_ORDER, score_upper_bound
+
+N_DIMS = len(DIMENSION_ORDER)
+INITIAL_CAPACITY = 64
+STORED_DECIMALS = 6
+
+
+def stored_scores(vectors) -> np.ndarray:
+    """float32 archetype vectors -> float64 scores as written to SCORES_JSON (6 dp)."""
+    return np.round(np.asarray(vectors, dtype=np.float64), STORED_DECIMALS)
+
+
+def bound_page(bound: np.ndarray, user_ids: list[str], after: Optional[tuple[float, str]],
+               limit: int) -> np.ndarray:
+    """
+    Positions of the next `limit` rows in (bound DESC, user_id ASC) order,
+    starting after the keyset `after` = (bound, user_id) of the previous page's
+    last row (None for the first page).
+    """
+    ids = np.array(user_ids, dtype=str)
+    if after is not None:
+        after_bound, after_user = after
+        rest = np.flatnonzero((bound < after_bound) | ((bound == after_bound) & (ids > after_user)))
+    else:
+        rest = np.arange(len(user_ids))
+    order = np.lexsort((ids[rest], -bound[rest]))
+    return rest[order[:max(limit, 0)]]
+
+
+# ── CANDIDATE SET ─────────────────────────────────────────────────────────────
+
+@dataclass
+class CandidateSet:
+    user_ids: list[str]
+    cosine: np.ndarray          # (n,) cosine similarity to the query
+    vectors: np.ndarray         # (n, 50) float64 in DIMENSION_ORDER, see stored_scores
+    reputation: np.ndarray      # (n,)
+    pool_size: Optional[int] = None     # eligible users the page was drawn from, if known
+    weighted: Optional[np.ndarray] = None   # (n,) final scores when the store ranked them (pushdown)
+    bound: Optional[np.ndarray] = None      # (n,) score_upper_bound the page was ordered by
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def scores(self, i: int) -> dict:
+        return dict(zip(DIMENSION_ORDER, self.vectors[i].tolist()))
+
+    @classmethod
+    def empty(cls) -> "CandidateSet":
+        return cls([], np.zeros(0), np.zeros((0, N_DIMS)), np.zeros(0), bound=np.zeros(0))
+
+    @classmethod
+    def concat(cls, pages: list["CandidateSet"]) -> "CandidateSet":
+        """Consecutive pages of one bound-ordered fetch as one set."""
+        return cls(
+            user_ids=[uid for page in pages for uid in page.user_ids],
+            cosine=np.concatenate([page.cosine for page in pages]),
+            vectors=np.concatenate([page.vectors for page in pages]),
+            reputation=np.concatenate([page.reputation for page in pages]),
+            pool_size=next((page.pool_size for page in pages if page.pool_size is not None), None),
+            bound=np.concatenate([page.bound for page in pages]),
+        )
+
+
+# ── INDEX ─────────────────────────────────────────────────────────────────────
+
+class CandidateIndex:
+    def __init__(self, server_id: str, capacity: int = INITIAL_CAPACITY):
+        self.server_id = server_id
+        self.ids: list[str] = []
+        self._row: dict[str, int] = {}
+        self._vectors = np.zeros((capacity, N_DIMS), dtype=np.float32)
+        self._unit = np.zeros((capacity, N_DIMS), dtype=np.float32)
+        self._reputation = np.zeros(capacity, dtype=np.float64)
+        self.lock = threading.RLock()
+        self.built_at = time.time()
+        self.polled_at = self.built_at
+        self.watermark = None       # newest updated_at applied from Snowflake
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._row
+
+    def _reserve(self, n: int) -> None:
+        if n <= len(self._reputation):
+            return
+        capacity = max(n, 2 * len(self._reputation))
+        for name in ("_vectors", "_unit", "_reputation"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self.ids)] = old[:len(self.ids)]
+            setattr(self, name, new)
+
+    def _normalise(self, rows: slice | int) -> None:
+        vectors = self._vectors[rows]
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        self._unit[rows] = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    # ── updates ──
+
+    def load(self, ids: list[str], vectors: np.ndarray, reputation: np.ndarray) -> None:
+        """Bulk-append users not yet in the index (bootstrap)."""
+        start, n = len(self.ids), len(ids)
+        self._reserve(start + n)
+        self._vectors[start:start + n] = vectors
+        self._reputation[start:start + n] = reputation
+        self._normalise(slice(start, start + n))
+        self.ids.extend(ids)
+        self._row.update((uid, start + k) for k, uid in enumerate(ids))
+
+    def upsert(self, user_id: str, vector, reputation: float) -> None:
+        """Insert or replace one user; `vector` is in DIMENSION_ORDER."""
+        i = self._row.get(user_id)
+        if i is None:
+            self._reserve(len(self.ids) + 1)
+            i = len(self.ids)
+            self._row[user_id] = i
+            self.ids.append(user_id)
+        self._vectors[i] = vector
+        self._reputation[i] = reputation
+        self._normalise(i)
+
+    def remove(self, user_id: str) -> None:
+        """Drop a user by moving the last row into their slot."""
+        i = self._row.pop(user_id, None)
+        if i is None:
+            return
+        last = len(self.ids) - 1
+        if i != last:
+            moved = self.ids[last]
+            self.ids[i] = moved
+            self._vectors[i], self._unit[i] = self._vectors[last], self._unit[last]
+            self._reputation[i] = self._reputation[last]
+            self._row[moved] = i
+        self.ids.pop()
+
+    def advance(self, updated_at) -> None:
+        if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+    def snapshot(self) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+        """Copies of (ids, stored_scores vectors, unit vectors, reputation) for work outside the lock."""
+        n = len(self.ids)
+        return (list(self.ids), stored_scores(self._vectors[:n]),
+                self._unit[:n].copy(), self._reputation[:n].copy())
+
+    # ── retrieval ──
+
+    def search(self, query_vector: list[float], exclude_user_id: str, context: str, limit: int,
+               after: Optional[tuple[float, str]] = None) -> CandidateSet:
+        """
+        The next `limit` users by score_upper_bound against `query_vector`
+        (in DIMENSION_ORDER), best first, after the keyset `after`.
+        """
+        excluded = self._row.get(exclude_user_id)
+        keep = np.arange(len(self.ids))
+        if excluded is not None:
+            keep = np.delete(keep, excluded)
+        if len(keep) == 0 or limit <= 0:
+            return CandidateSet.empty()
+        vectors = stored_scores(self._vectors[keep])
+        bound = score_upper_bound(np.asarray(query_vector, dtype=np.float64), vectors, context)
+        top = bound_page(bound, [self.ids[i] for i in keep.tolist()], after, limit)
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        unit = self._unit[keep[top]]
+        cosine = unit @ (query / norm) if norm > 0 else np.zeros(len(top), dtype=np.float32)
+        return CandidateSet(
+            user_ids=[self.ids[i] for i in keep[top].tolist()],
+            cosine=cosine.astype(np.float64),
+            vectors=vectors[top],
+            reputation=self._reputation[keep[top]],
+            pool_size=len(keep),
+            bound=bound[top],
+        )
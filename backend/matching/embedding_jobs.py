@@ -0,0 +1,156 @@
+"""
+embedding_jobs.py
+=================
+Background Cortex embedding of uploaded corpora, so /extract doesn't hold
+the upload request open for an EMBED_TEXT_768 round-trip per user.
+
+enqueue_embedding(user_id, server_id) records the pair and returns the job
+that will embed it. Pairs enqueued while a job is still waiting for the
+worker join that job, so a burst of uploads becomes one run. A run embeds:
+
+  - every requested pair, then
+  - every member whose RAW_USER_ONBOARDING corpus has no embedding yet or
+    is newer than it (storage.stale_embeddings), until none are left,
+
+EMBED_BATCH_ROWS pairs per set-based MERGE (storage.embed_archetypes).
+Jobs run one at a time, so two sweeps never embed the same rows. On a
+storage backend without Cortex embedding (supports_embedding False, e.g.
+LocalStorage) a job ends as "skipped" without embedding anything.
+
+Sweep the stale archetypes by hand:
+
+    python embedding_jobs.py
+"""
+
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from storage import get_storage
+
+EMBED_BATCH_ROWS = int(os.environ.get("EMBED_BATCH_ROWS", "100"))
+EMBED_JOB_RETENTION_SECONDS = float(os.environ.get("EMBED_JOB_RETENTION_SECONDS", "3600"))
+
+TERMINAL_STATUSES = ("done", "skipped", "failed")
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+_jobs: dict[str, "EmbeddingJob"] = {}
+_open_job: Optional["EmbeddingJob"] = None
+_jobs_lock = threading.Lock()
+
+
+# ── JOB ───────────────────────────────────────────────────────────────────────
+
+class EmbeddingJob:
+    """One embedding run: the pairs it was asked for, its progress and outcome."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.requested: dict[tuple[str, str], None] = {}   # ordered set of (user_id, server_id)
+        self.progress = {"requested": 0, "stale": 0, "batches": 0, "embedded": 0}
+        self.error: Optional[str] = None
+
+    def _embed(self, storage, batch: list[tuple[str, str]]) -> None:
+        self.progress["embedded"] += storage.embed_archetypes(batch)
+        self.progress["batches"] += 1
+
+    def run(self) -> None:
+        global _open_job
+        with _jobs_lock:
+            # From here on new requests start the next job
+            if _open_job is self:
+                _open_job = None
+            pairs = list(self.requested)
+        self.status = "running"
+        self.started_at = time.time()
+        self.progress["requested"] = len(pairs)
+        try:
+            storage = get_storage()
+            if not storage.supports_embedding:
+                self.error = f"{storage.name} storage has no Cortex embedding"
+                self.status = "skipped"
+                self.finished_at = time.time()
+                return
+            done = set(pairs)
+            for i in range(0, len(pairs), EMBED_BATCH_ROWS):
+                self._embed(storage, pairs[i:i + EMBED_BATCH_ROWS])
+            while True:
+                # A pair still stale after its MERGE (corpus re-uploaded meanwhile) waits for the next job
+                stale = [p for p in storage.stale_embeddings(EMBED_BATCH_ROWS) if p not in done]
+                if not stale:
+                    break
+                done.update(stale)
+                self.progress["stale"] += len(stale)
+                self._embed(storage, stale)
+            self.status = "done"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+        self.finished_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id":      self.id,
+            "status":      self.status,
+            "created_at":  self.created_at,
+            "started_at":  self.started_at,
+            "finished_at": self.finished_at,
+            "progress":    dict(self.progress),
+            "error":       self.error,
+        }
+
+
+# ── REGISTRY ──────────────────────────────────────────────────────────────────
+
+def _evict_finished() -> None:
+    cutoff = time.time() - EMBED_JOB_RETENTION_SECONDS
+    for job_id in [j.id for j in _jobs.values() if j.finished and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def enqueue_embedding(user_id: Optional[str] = None, server_id: str = "general") -> EmbeddingJob:
+    """
+    Queue (user_id, server_id) for embedding and return the job that will do
+    it — the one still waiting for the worker if there is one. With no
+    user_id, just queue a sweep of stale archetypes.
+    """
+    global _open_job
+    with _jobs_lock:
+        job = _open_job
+        if job is None:
+            _evict_finished()
+            job = _open_job = EmbeddingJob()
+            _jobs[job.id] = job
+            _executor.submit(job.run)
+        if user_id is not None:
+            job.requested[(user_id, server_id)] = None
+            job.progress["requested"] = len(job.requested)
+    return job
+
+
+def get_embedding_job(job_id: str) -> Optional[EmbeddingJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    import sys
+    import json
+
+    sweep = EmbeddingJob()
+    sweep.run()
+    print(json.dumps(sweep.snapshot(), indent=2))
+    sys.exit(0 if sweep.status != "failed" else 1)
@@ -13,6 +13,7 @@ FEATURES:
   6.  how_well_do_you_know_me(vector, api_key)       → quiz questions + answer key
   7.  growth_diff(vector_past, vector_now)           → delta per dimension + narrative
   8.  group_match(vectors, names)                    → optimal 4-person hackathon team
+      partition_teams(vectors, names)                → everyone placed in a team
   9.  relationship_type(vector_a, vector_b)          → what kind of connection this naturally is
   10. opening_message(vector_a, vector_b, context, api_key) → Gemini-drafted icebreaker
 """
@@ -20,10 +21,10 @@ FEATURES:
 import os
 import json
 import re
-from itertools import combinations
 from typing import Optional
 
-from matching import compute_match, result_to_dict, VARIABLE_CONFIG
+from matching import compute_match, compute_match_all_contexts, result_to_dict, VARIABLE_CONFIG
+from team_search import PairwiseMatrix, SearchControl, search_teams, partition_pool
 
 # ── GEMINI CLIENT ─────────────────────────────────────────────────────────────
 
@@ -155,7 +156,8 @@ def all_context_scores(vector_a: dict, vector_b: dict) -> dict:
             summary: "You two are built to build together"
         }
     """
-    results = {ctx: result_to_dict(compute_match(vector_a, vector_b, ctx)) for ctx in CONTEXTS}
+    fused = compute_match_all_contexts(vector_a, vector_b)
+    results = {ctx: result_to_dict(fused[ctx]) for ctx in CONTEXTS}
     best = max(results, key=lambda c: results[c]["score"])
 
     summaries = {
@@ -582,70 +584,52 @@ def growth_diff(vector_past: dict, vector_now: dict,
 # 8. GROUP MATCH — optimal hackathon team of 4
 # ═════════════════════════════════════════════════════════════════════════════
 
-def group_match(vectors: list[dict], names: list[str], team_size: int = 4) -> dict:
+def group_match(vectors: list[dict], names: list[str], team_size: int = 4,
+                mode: str = "exhaustive", workers: Optional[int] = None,
+                matrix: Optional[PairwiseMatrix] = None,
+                control: Optional[SearchControl] = None) -> dict:
     """
     Given a pool of people, find the optimal team of `team_size` people.
     Scores teams on: pairwise compatibility average + role coverage bonus.
     team_size can be any integer >= 2 (default 4).
+
+    mode: "exhaustive" scores every combination; "exact" returns the same
+    teams via branch-and-bound for mid-sized pools; "heuristic" runs beam +
+    swap local search for large pools and reports its gap to an upper bound.
+    workers: processes for exhaustive search (default: TEAM_SEARCH_WORKERS env).
+    matrix: prebuilt PairwiseMatrix for this pool (e.g. from a TeamSearchState).
+    control: SearchControl for progress, cancellation and a time budget —
+    a stopped search returns the best teams found so far.
     """
     assert team_size >= 2, "team_size must be at least 2"
     assert len(vectors) >= team_size, f"Need at least {team_size} people in the pool"
     assert len(vectors) == len(names)
 
-    pool = list(zip(names, vectors))
-
-    def team_score(combo: list) -> float:
-        combo_names, combo_vectors = zip(*combo)
-
-        # Pairwise hackathon compatibility average
-        pairs = list(combinations(range(len(combo)), 2))
-        pair_scores = []
-        for i, j in pairs:
-            result = compute_match(combo_vectors[i], combo_vectors[j], "hackathon")
-            pair_scores.append(result.score)
-        avg_pairwise = sum(pair_scores) / len(pair_scores)
-
-        # Role coverage bonus — reward teams that cover all dimensions well
-        # Key hackathon dimensions and what score means "covered"
-        key_vars = {
-            "execution_bias":      0.65,   # someone who ships
-            "systems_thinking":    0.65,   # someone who architects
-            "detail_orientation":  0.60,   # someone who catches bugs
-            "leadership_drive":    0.65,   # someone who drives
-            "creativity":          0.60,   # creative thinker (use novelty_seeking)
-        }
-        # Use novelty_seeking as proxy for creativity
-        actual_key_vars = {
-            "execution_bias":     "execution_bias",
-            "systems_thinking":   "systems_thinking",
-            "detail_orientation": "detail_orientation",
-            "leadership_drive":   "leadership_drive",
-            "novelty_seeking":    "novelty_seeking",
-        }
+    # Every pair scored once; teams read pair scores from the matrix by index
+    if matrix is None:
+        matrix = PairwiseMatrix(vectors, "hackathon")
 
-        coverage_bonus = 0.0
-        for role_var, threshold in zip(actual_key_vars.values(), key_vars.values()):
-            team_max = max(v["scores"].get(role_var, 0.5) for v in combo_vectors)
-            if team_max >= threshold:
-                coverage_bonus += 0.02   # small bonus per covered role
+    if control is not None:
+        control.labels = names
 
-        return round(avg_pairwise + coverage_bonus, 4)
+    # Best team + 3 runner-ups
+    scored, search = search_teams(matrix, team_size, mode, workers, control)
+    return team_report(vectors, names, matrix, scored, search)
 
-    # Score all combinations of team_size
-    all_combos = list(combinations(pool, team_size))
-    scored = [(combo, team_score(list(combo))) for combo in all_combos]
-    scored.sort(key=lambda x: x[1], reverse=True)
 
+def team_report(vectors: list[dict], names: list[str], matrix: PairwiseMatrix,
+                scored: list[tuple], search: dict) -> dict:
+    """
+    group_match() response for already-ranked teams: scored is
+    [(pool indices, team score)] best first, from any team_search mode.
+    """
     best_combo, best_score = scored[0]
-    best_names   = [n for n, _ in best_combo]
-    best_vectors = [v for _, v in best_combo]
+    team_size = len(best_combo)
+    best_names   = [names[i] for i in best_combo]
+    best_vectors = [vectors[i] for i in best_combo]
 
     # Pairwise breakdown for the best team
-    pairwise = {}
-    for i, j in combinations(range(team_size), 2):
-        key = f"{best_names[i]} × {best_names[j]}"
-        result = compute_match(best_vectors[i], best_vectors[j], "hackathon")
-        pairwise[key] = result.score
+    pairwise = matrix.pairwise_breakdown(best_combo, names)
 
     # Coverage analysis
     coverage = {}
@@ -669,7 +653,7 @@ def group_match(vectors: list[dict], names: list[str], team_size: int = 4) -> di
 
     # Runner-ups (next 3 best teams)
     runner_ups = [
-        {"members": [n for n, _ in combo], "score": score}
+        {"members": [names[i] for i in combo], "score": score}
         for combo, score in scored[1:4]
     ]
 
@@ -682,6 +666,42 @@ def group_match(vectors: list[dict], names: list[str], team_size: int = 4) -> di
         "coverage_gaps":     gaps,
         "coverage_strengths": strengths,
         "runner_up_teams":   runner_ups,
+        "search":            search,
+    }
+
+
+def partition_teams(vectors: list[dict], names: list[str], team_size: int = 4, objective: str = "total",
+                    matrix: Optional[PairwiseMatrix] = None,
+                    control: Optional[SearchControl] = None) -> dict:
+    """
+    Split the whole pool into disjoint teams of `team_size` so everyone is placed.
+    When the pool doesn't divide evenly, a few teams get one extra member
+    (or, with more leftovers than teams, the leftovers form a smaller team).
+
+    objective: "total" maximizes the sum of team scores, "min" maximizes the
+    weakest team's score. Team scores are the same as group_match().
+    """
+    assert team_size >= 2, "team_size must be at least 2"
+    assert len(vectors) >= team_size, f"Need at least {team_size} people in the pool"
+    assert len(vectors) == len(names)
+
+    if matrix is None:
+        matrix = PairwiseMatrix(vectors, "hackathon")
+    if control is not None:
+        control.labels = names
+    scored, search = partition_pool(matrix, team_size, objective, control=control)
+
+    teams = [
+        {"members": [names[i] for i in team], "score": score}
+        for team, score in scored
+    ]
+
+    return {
+        "teams":       teams,
+        "total_score": search["total_score"],
+        "min_score":   search["min_score"],
+        "mean_score":  search["mean_score"],
+        "search":      search,
     }
 
 
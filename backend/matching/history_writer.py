@@ -0,0 +1,291 @@
+"""
+history_writer.py
+=================
+Write-behind recorder for MATCH_HISTORY.
+
+get_matches() used to run one INSERT per match on its own connection while
+the user waited. Now requests only enqueue rows; one background thread
+batches rows from every request and writes each batch with a single call to
+the storage backend's insert_match_history() (one multi-row INSERT per chunk
+on Snowflake, see snowflake_storage).
+
+  - Flush triggers: `flush_rows` rows buffered, or `flush_interval` seconds
+    since the oldest buffered row.
+  - The queue is bounded; when it is full, rows go straight to the spill file
+    instead of blocking the request.
+  - A batch that fails to insert (Snowflake unreachable) is appended to a
+    local JSONL spill file and replayed, `flush_rows` rows per insert, at
+    startup and after the next successful flush. A replay cut short by a
+    crash resumes where it stopped.
+  - close() (registered at exit) drains the queue before the process ends.
+  - metrics() reports queue depth, flush latency and row counters.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Callable, Optional
+
+from storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+MATCH_HISTORY_FLUSH_ROWS = int(os.environ.get("MATCH_HISTORY_FLUSH_ROWS", "500"))
+MATCH_HISTORY_FLUSH_SECONDS = float(os.environ.get("MATCH_HISTORY_FLUSH_SECONDS", "2"))
+MATCH_HISTORY_QUEUE_SIZE = int(os.environ.get("MATCH_HISTORY_QUEUE_SIZE", "20000"))
+# A relative path is taken from backend/ (not the working directory), so a
+# restart from another directory still finds and replays pending rows
+MATCH_HISTORY_SPILL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    os.environ.get("MATCH_HISTORY_SPILL_PATH", "match_history_spill.jsonl"),
+)
+
+HISTORY_COLUMNS = (
+    "user_a_id", "user_b_id", "server_id", "context",
+    "cosine_score", "weighted_score", "grade",
+    "red_flags_json", "blurb_json",
+)
+
+
+def history_row(user_id: str, match: dict, server_id: str, context: str) -> dict:
+    """One MATCH_HISTORY row from a get_matches() result entry."""
+    return {
+        "user_a_id":      user_id,
+        "user_b_id":      match["user_id"],
+        "server_id":      server_id,
+        "context":        context,
+        "cosine_score":   match["cosine_score"],
+        "weighted_score": match["weighted_score"],
+        "grade":          match["grade"],
+        "red_flags_json": json.dumps(match.get("red_flags")),
+        "blurb_json":     json.dumps(match.get("blurb")),
+    }
+
+
+# ── WRITER ────────────────────────────────────────────────────────────────────
+
+class MatchHistoryWriter:
+    def __init__(
+        self,
+        write: Optional[Callable[[list[dict]], None]] = None,
+        flush_rows: int = MATCH_HISTORY_FLUSH_ROWS,
+        flush_interval: float = MATCH_HISTORY_FLUSH_SECONDS,
+        max_queue: int = MATCH_HISTORY_QUEUE_SIZE,
+        spill_path: str = MATCH_HISTORY_SPILL_PATH,
+    ):
+        self._write = write
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "enqueued_rows":      0,
+            "flushed_rows":       0,
+            "flushes":            0,
+            "failed_flushes":     0,
+            "spilled_rows":       0,
+            "replayed_rows":      0,
+            "last_flush_ms":      None,
+            "max_flush_ms":       0.0,
+            "total_flush_ms":     0.0,
+            "last_flush_at":      None,
+        }
+        self._thread = threading.Thread(target=self._run, name="match-history-writer", daemon=True)
+        self._thread.start()
+
+    # ── producer side ──
+
+    def enqueue(self, rows: list[dict]) -> None:
+        """Hand rows to the writer without waiting on Snowflake."""
+        overflow = []
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                overflow.append(row)
+        self._count("enqueued_rows", len(rows) - len(overflow))
+        if overflow:
+            logger.warning("Match history queue full; spilling %d rows", len(overflow))
+            self._spill(overflow)
+
+    def metrics(self) -> dict:
+        with self._metrics_lock:
+            m = dict(self._metrics)
+        m["queue_depth"] = self._queue.qsize()
+        m["queue_capacity"] = self._queue.maxsize
+        m["avg_flush_ms"] = round(m.pop("total_flush_ms") / m["flushes"], 2) if m["flushes"] else None
+        m["spill_pending"] = any(
+            os.path.exists(path) and os.path.getsize(path) > 0
+            for path in (self.spill_path, self.spill_path + ".replay")
+        )
+        return m
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Stop the flush loop, write everything still queued, and join the thread."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # ── writer thread ──
+
+    def _count(self, key: str, n) -> None:
+        with self._metrics_lock:
+            self._metrics[key] += n
+
+    def _next_batch(self) -> list[dict]:
+        """Block for the first row, then gather until flush_rows or flush_interval."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> list[dict]:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self) -> None:
+        # Rows a previous process spilled (or was replaying when it died)
+        self._replay_spill()
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch and self._flush(batch):
+                self._replay_spill()
+        # Shutdown: write whatever is left in one go (spilled if Snowflake is down)
+        remaining = self._drain()
+        if remaining:
+            self._flush(remaining)
+
+    def _flush(self, rows: list[dict]) -> bool:
+        started = time.perf_counter()
+        try:
+            (self._write or get_storage().insert_match_history)(rows)
+        except Exception as e:
+            logger.error("Failed to record %d match history rows: %s", len(rows), e)
+            self._count("failed_flushes", 1)
+            self._spill(rows)
+            return False
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            self._metrics["flushes"] += 1
+            self._metrics["flushed_rows"] += len(rows)
+            self._metrics["last_flush_ms"] = round(elapsed_ms, 2)
+            self._metrics["max_flush_ms"] = round(max(self._metrics["max_flush_ms"], elapsed_ms), 2)
+            self._metrics["total_flush_ms"] += elapsed_ms
+            self._metrics["last_flush_at"] = time.time()
+        return True
+
+    # ── spill file ──
+
+    def _spill(self, rows: list[dict]) -> None:
+        try:
+            with self._spill_lock, open(self.spill_path, "a") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+            self._count("spilled_rows", len(rows))
+        except OSError as e:
+            logger.error("Dropping %d match history rows; spill file unwritable: %s", len(rows), e)
+
+    def _replay_spill(self) -> None:
+        """
+        Re-insert spilled rows once Snowflake is reachable again, `flush_rows`
+        per insert, until the spill file is empty or an insert fails.
+        """
+        while self._replay_once():
+            pass
+
+    def _replay_once(self) -> bool:
+        """
+        Replay one spill file; False when there was nothing to replay or an
+        insert failed. The spill file is renamed to <spill>.replay first, and
+        the offset past each inserted batch is kept in <spill>.replay.pos, so
+        a .replay left behind by a crash is resumed (before any newer spill)
+        without inserting its rows twice.
+        """
+        replaying = self.spill_path + ".replay"
+        position = replaying + ".pos"
+        with self._spill_lock:
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0:
+                    return False
+                os.replace(self.spill_path, replaying)
+                if os.path.exists(position):
+                    os.remove(position)
+        offset = 0
+        if os.path.exists(position):
+            with open(position) as p:
+                offset = int(p.read() or 0)
+
+        replayed = True
+        with open(replaying) as f:
+            f.seek(offset)
+            while True:
+                batch = self._read_spilled(f)
+                if not batch:
+                    break
+                if not self._flush(batch):
+                    # _flush() spilled this batch again; the rest goes back with it
+                    self._spill(self._read_spilled(f, limit=None))
+                    replayed = False
+                    break
+                self._count("replayed_rows", len(batch))
+                with open(position, "w") as p:
+                    p.write(str(f.tell()))
+        os.remove(replaying)
+        if os.path.exists(position):
+            os.remove(position)
+        return replayed
+
+    def _read_spilled(self, f, limit: Optional[int] = -1) -> list[dict]:
+        """Up to `limit` rows (default flush_rows, None for all) from a spill file."""
+        limit = self.flush_rows if limit == -1 else limit
+        rows = []
+        while limit is None or len(rows) < limit:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # A line cut off when a process died mid-spill
+                logger.warning("Skipping unreadable match history spill line: %r", line[:200])
+        return rows
+
+
+# ── SHARED WRITER ─────────────────────────────────────────────────────────────
+
+_writer: Optional[MatchHistoryWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer() -> MatchHistoryWriter:
+    """The process-wide writer, started on first use and drained at exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MatchHistoryWriter()
+            atexit.register(_writer.close)
+        return _writer
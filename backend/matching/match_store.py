@@ -0,0 +1,72 @@
+"""
+match_store.py
+==============
+Materialized top-N matches, so /v2/match can answer from memory.
+
+matching_engine.precompute_matches() fills the store for every user of a
+server in every context; get_matches() serves an entry while it is fresh
+and was computed for the vector the caller sent, and scores live otherwise.
+Entries for one user are dropped as soon as their own archetype changes;
+everyone else's entries age out after `max_age` seconds. A user who stops
+being eligible (flagged, abandonment limit) is also struck from every other
+entry on the server (evict).
+"""
+
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+
+class MatchStore:
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._entries: dict[str, dict[str, dict[str, dict]]] = {}  # server -> user -> context -> entry
+        self._refreshed: dict[str, dict] = {}                       # server -> last run report
+        self._lock = threading.Lock()
+
+    def replace_server(self, server_id: str, entries: dict[str, dict[str, dict]], report: dict) -> None:
+        """Swap in a server's freshly computed entries ({user_id: {context: entry}})."""
+        with self._lock:
+            self._entries[server_id] = entries
+            self._refreshed[server_id] = report
+
+    def get(self, server_id: str, user_id: str, context: str, vector: list[float],
+            top_n: int) -> Optional[dict]:
+        """A fresh entry covering top_n for exactly this query vector, else None."""
+        with self._lock:
+            entry = self._entries.get(server_id, {}).get(user_id, {}).get(context)
+        if entry is None or time.time() - entry["computed_at"] > self.max_age:
+            return None
+        if len(entry["matches"]) < top_n and not entry["complete"]:
+            return None
+        if not np.array_equal(entry["vector"], np.asarray(vector, dtype=entry["vector"].dtype)):
+            return None
+        return entry
+
+    def invalidate(self, server_id: str, user_id: str) -> None:
+        with self._lock:
+            self._entries.get(server_id, {}).pop(user_id, None)
+
+    def evict(self, server_id: str, user_id: str) -> None:
+        """Drop a user's own entries and remove them from everyone else's matches."""
+        with self._lock:
+            by_user = self._entries.get(server_id, {})
+            by_user.pop(user_id, None)
+            for by_context in by_user.values():
+                for context, entry in by_context.items():
+                    if any(m["user_id"] == user_id for m in entry["matches"]):
+                        by_context[context] = {
+                            **entry,
+                            "matches": [m for m in entry["matches"] if m["user_id"] != user_id],
+                        }
+
+    def last_refresh(self, server_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._refreshed.get(server_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            users = sum(len(by_user) for by_user in self._entries.values())
+            return {"users": users, "servers": dict(self._refreshed)}
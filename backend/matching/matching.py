@@ -9,8 +9,13 @@ Usage:
 """
 
 import json
+import heapq
 import argparse
 from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
 
 # ── 1. CONFIGURATION ──────────────────────────────────────────────────────────
 
@@ -82,6 +87,9 @@ VARIABLE_CONFIG = {
     "life_pace":               {"mode": "similarity", "hackathon": 0.7, "romantic": 0.8, "friendship": 0.7},
 }
 
+# Canonical variable order for (N, 50) score matrices and the VECTOR(FLOAT, 50) column
+DIMENSION_ORDER: list[str] = list(VARIABLE_CONFIG.keys())
+
 # Clash penalties: conditions that tank compatibility regardless of other scores
 # Each clash: (var, threshold_a, var_b, threshold_b, contexts, penalty)
 CLASH_RULES = [
@@ -110,17 +118,385 @@ BONUS_RULES = [
 ]
 
 
-# ── 2. SCORING ────────────────────────────────────────────────────────────────
+# ── 2. SCORING PLANS ──────────────────────────────────────────────────────────
+# VARIABLE_CONFIG, CLASH_RULES and BONUS_RULES compiled once per context into
+# NumPy arrays. Every scoring path (single pair, batch, group, SQL pushdown)
+# runs off these, so a call does no config parsing at all.
+# Call rebuild_scoring_plans() after editing the config at runtime.
+
+CONTEXTS = ("hackathon", "romantic", "friendship")
+
+DIMENSION_SLICES = {
+    "Cognitive Style":      (0, 9),
+    "Emotional Profile":    (9, 19),
+    "Collaboration & Work": (19, 29),
+    "Values & Motivation":  (29, 38),
+    "Communication":        (38, 45),
+    "Identity & Lifestyle": (45, 50),
+}
+
+# dim_score() as offset + sign * |a - b|: similarity = 1 - gap, complement = gap, else 0.5
+_MODE_TERMS = {"similarity": (1.0, -1.0), "complement": (0.0, 1.0)}
+
+# (threshold, grade) — first band the final score reaches wins
+GRADE_BANDS = [(0.88, "A+"), (0.80, "A"), (0.70, "B"), (0.60, "C")]
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    rules: list             # (name, col_a, a_greater, thresh_a, col_b, b_greater, thresh_b, is_gap, amount)
+    names: list             # rule[0] of every active rule, in rule order
+    var_a: np.ndarray       # (R,) column of var_a
+    a_greater: np.ndarray   # (R,) op_a == ">" (else "<")
+    thresh_a: np.ndarray
+    var_b: np.ndarray       # (R,) column of var_b (var_a for gap rules)
+    b_greater: np.ndarray
+    thresh_b: np.ndarray
+    is_gap: np.ndarray      # (R,) |a - b| >= thresh_a on var_a
+    amount: np.ndarray      # (R,) penalty or bonus
+
+    def fired(self, a: list, b: list) -> list:
+        """Positions of the rules that fire (with a non-zero amount) for one pair of score lists."""
+        out = []
+        for r, (_, col_a, a_gt, t_a, col_b, b_gt, t_b, gap, amount) in enumerate(self.rules):
+            val_a, val_b = a[col_a], b[col_b]
+            if gap:
+                hit = abs(val_a - val_b) >= t_a
+            else:
+                hit = ((val_a > t_a) if a_gt else (val_a < t_a)) and ((val_b > t_b) if b_gt else (val_b < t_b))
+            if hit and amount != 0.0:
+                out.append(r)
+        return out
+
+    def named(self, positions: list) -> list:
+        """[(rule name, amount)] for fired rule positions."""
+        return [(self.rules[r][0], self.rules[r][8]) for r in positions]
+
+    def hits(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """(N, R) bool — which rules fire for each (a row, b row) pair."""
+        val_a = a[:, self.var_a]
+        val_b = b[:, self.var_b]
+        a_triggered = np.where(self.a_greater, val_a > self.thresh_a, val_a < self.thresh_a)
+        b_triggered = np.where(self.b_greater, val_b > self.thresh_b, val_b < self.thresh_b)
+        gap_hit = np.abs(val_a - val_b) >= self.thresh_a
+        return np.where(self.is_gap, gap_hit, a_triggered & b_triggered)
+
+    def total(self, hits: np.ndarray) -> np.ndarray:
+        """Sum of fired amounts per row, added in rule order like the scalar loop."""
+        if not self.rules:
+            return np.zeros(hits.shape[0])
+        return _ordered_row_sum(np.where(hits, self.amount, 0.0))
+
+
+@dataclass(frozen=True)
+class ScoringPlan:
+    context: str
+    weights: np.ndarray           # (50,) raw context weights
+    normalized: np.ndarray        # (50,) weights / total weight
+    offset: np.ndarray            # (50,) per-variable score = offset + sign * |a - b|
+    sign: np.ndarray
+    similarity_mask: np.ndarray   # (50,) bool
+    complement_mask: np.ndarray   # (50,) bool
+    dimension_names: list
+    dimension_index: list         # one int array of columns per dimension
+    dimension_weight: np.ndarray  # (6,) weight sum per dimension
+    clash: RuleSet
+    bonus: RuleSet
+    terms: list                   # [(offset, sign, weight, normalized, rounded normalized)] — scalar-path mirror
+    dimension_slices: list        # [(name, start, stop, weight sum)] — scalar-path mirror
+
+
+def _compile_rules(rules: list, context: Optional[str], allow_gap: bool) -> RuleSet:
+    """Compile the rules active in `context` (every rule when context is None)."""
+    index = {v: i for i, v in enumerate(DIMENSION_ORDER)}
+    active = [rule for rule in rules if context is None or context in rule[6]]
+    # evaluate_bonus has no gap branch, so bonus "gap" rules read var_b like any other
+    is_gap = [allow_gap and rule[1] == "gap" for rule in active]
+    columns = [
+        (index[rule[0]], index[rule[0]] if gap else index[rule[3]])
+        for rule, gap in zip(active, is_gap)
+    ]
+    return RuleSet(
+        rules=[
+            (rule[0], col_a, rule[1] == ">", rule[2], col_b, rule[4] == ">",
+             0.0 if gap else rule[5], gap, rule[7])
+            for rule, gap, (col_a, col_b) in zip(active, is_gap, columns)
+        ],
+        names=[rule[0] for rule in active],
+        var_a=np.array([c[0] for c in columns], dtype=np.intp),
+        a_greater=np.array([rule[1] == ">" for rule in active], dtype=bool),
+        thresh_a=np.array([rule[2] for rule in active], dtype=np.float64),
+        var_b=np.array([c[1] for c in columns], dtype=np.intp),
+        b_greater=np.array([rule[4] == ">" for rule in active], dtype=bool),
+        thresh_b=np.array(
+            [0.0 if gap else rule[5] for rule, gap in zip(active, is_gap)], dtype=np.float64
+        ),
+        is_gap=np.array(is_gap, dtype=bool),
+        amount=np.array([rule[7] for rule in active], dtype=np.float64),
+    )
+
+
+def compile_plan(context: str) -> ScoringPlan:
+    """Compile the current VARIABLE_CONFIG / CLASH_RULES / BONUS_RULES for one context."""
+    assert context in CONTEXTS, f"Invalid context: {context}"
+
+    weights = [VARIABLE_CONFIG[v][context] for v in DIMENSION_ORDER]
+    total_weight = sum(weights)
+    modes = [VARIABLE_CONFIG[v]["mode"] for v in DIMENSION_ORDER]
+    terms = [_MODE_TERMS.get(mode, (0.5, 0.0)) for mode in modes]
+
+    dimension_index = [np.arange(start, stop) for start, stop in DIMENSION_SLICES.values()]
+    dimension_weight = [sum(weights[start:stop]) for start, stop in DIMENSION_SLICES.values()]
+    normalized = [w / total_weight for w in weights]
+
+    return ScoringPlan(
+        context=context,
+        weights=np.array(weights, dtype=np.float64),
+        normalized=np.array(normalized, dtype=np.float64),
+        offset=np.array([t[0] for t in terms], dtype=np.float64),
+        sign=np.array([t[1] for t in terms], dtype=np.float64),
+        similarity_mask=np.array([m == "similarity" for m in modes], dtype=bool),
+        complement_mask=np.array([m == "complement" for m in modes], dtype=bool),
+        dimension_names=list(DIMENSION_SLICES),
+        dimension_index=dimension_index,
+        dimension_weight=np.array(dimension_weight, dtype=np.float64),
+        clash=_compile_rules(CLASH_RULES, context, allow_gap=True),
+        bonus=_compile_rules(BONUS_RULES, context, allow_gap=False),
+        terms=[(t[0], t[1], w, n, round(n, 3)) for t, w, n in zip(terms, weights, normalized)],
+        dimension_slices=[
+            (name, start, stop, dim_w)
+            for (name, (start, stop)), dim_w in zip(DIMENSION_SLICES.items(), dimension_weight)
+        ],
+    )
+
+
+@dataclass(frozen=True)
+class FusedPlan:
+    """All three context plans stacked, for scoring one pair in every context at once."""
+    plans: list                 # ScoringPlan per context, in CONTEXTS order
+    weights: np.ndarray         # (3, 50)
+    normalized: np.ndarray      # (3, 50)
+    clash: RuleSet              # every clash rule, whatever its contexts
+    bonus: RuleSet
+    clash_contexts: np.ndarray  # (3, R) bool — rule r counts in context c
+    bonus_contexts: np.ndarray
+
+
+def compile_fused_plan(plans: list) -> FusedPlan:
+    return FusedPlan(
+        plans=plans,
+        weights=np.stack([plan.weights for plan in plans]),
+        normalized=np.stack([plan.normalized for plan in plans]),
+        clash=_compile_rules(CLASH_RULES, None, allow_gap=True),
+        bonus=_compile_rules(BONUS_RULES, None, allow_gap=False),
+        clash_contexts=np.array([[plan.context in rule[6] for rule in CLASH_RULES] for plan in plans]),
+        bonus_contexts=np.array([[plan.context in rule[6] for rule in BONUS_RULES] for plan in plans]),
+    )
+
+
+SCORING_PLANS: dict[str, ScoringPlan] = {}
+FUSED_PLAN: Optional[FusedPlan] = None
+
+
+def rebuild_scoring_plans() -> None:
+    """Recompile every context's plan — call after mutating the config at runtime."""
+    global FUSED_PLAN
+    DIMENSION_ORDER[:] = list(VARIABLE_CONFIG.keys())
+    SCORING_PLANS.update({ctx: compile_plan(ctx) for ctx in CONTEXTS})
+    FUSED_PLAN = compile_fused_plan([SCORING_PLANS[ctx] for ctx in CONTEXTS])
+
+
+def get_plan(context: str) -> ScoringPlan:
+    plan = SCORING_PLANS.get(context)
+    assert plan is not None, f"Invalid context: {context}"
+    return plan
+
+
+rebuild_scoring_plans()
+
+
+def scores_matrix(vectors: list[dict]) -> np.ndarray:
+    """Vector dicts -> (N, 50) float array in DIMENSION_ORDER (missing vars = 0.5)."""
+    return np.array(
+        [[float(v["scores"].get(var, 0.5)) for var in DIMENSION_ORDER] for v in vectors],
+        dtype=np.float64,
+    ).reshape(len(vectors), len(DIMENSION_ORDER))
+
+
+def _as_rows(vector) -> np.ndarray:
+    """Vector dict, 50-array or (N, 50) matrix -> 2-D float array."""
+    if isinstance(vector, dict):
+        return scores_matrix([vector])
+    return np.asarray(vector, dtype=np.float64).reshape(-1, len(DIMENSION_ORDER))
+
+
+def _ordered_row_sum(terms: np.ndarray) -> np.ndarray:
+    """Left-to-right row sums (no pairwise summation) so every path rounds identically."""
+    if terms.shape[0] < 256:
+        return np.add.accumulate(terms, axis=1)[:, -1]
+    total = terms[:, 0]
+    for j in range(1, terms.shape[1]):
+        total = total + terms[:, j]
+    return total
+
+
+def _pair_scores(plan: ScoringPlan, a: np.ndarray, b: np.ndarray):
+    """
+    Core kernel. a is (1, 50) or (N, 50), b is (N, 50).
+    Returns (raw (N, 50), final (N,), clash hits (N, R), bonus hits (N, R)).
+    """
+    raw = np.abs(b - a)
+    raw *= plan.sign
+    raw += plan.offset
+
+    base_score = _ordered_row_sum(raw * plan.normalized)
+
+    clash_hits = plan.clash.hits(a, b)
+    bonus_hits = plan.bonus.hits(a, b)
+    final = base_score + plan.clash.total(clash_hits) + plan.bonus.total(bonus_hits)
+    return raw, np.clip(final, 0.0, 1.0), clash_hits, bonus_hits
+
+
+def _dimension_rollups(plan: ScoringPlan, raw: np.ndarray) -> np.ndarray:
+    """(N, 50) per-variable scores -> (N, 6) weighted dimension averages."""
+    weighted = raw * plan.weights
+    out = np.empty((raw.shape[0], len(plan.dimension_index)))
+    for col, idx in enumerate(plan.dimension_index):
+        dim_w = plan.dimension_weight[col]
+        if dim_w == 0:
+            out[:, col] = 0.5
+        else:
+            out[:, col] = _ordered_row_sum(weighted[:, idx]) / dim_w
+    return out
+
+
+def _grades(final: np.ndarray) -> np.ndarray:
+    return np.select(
+        [final >= threshold for threshold, _ in GRADE_BANDS],
+        [grade for _, grade in GRADE_BANDS],
+        default="D",
+    )
+
+
+def _round(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """np.round, but falls back to Python's round() on the rare near-half ties."""
+    out = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for idx in zip(*np.nonzero(ties)):
+        out[idx] = round(float(values[idx]), ndigits)
+    return out
+
+
+# ── 3. SCORING ────────────────────────────────────────────────────────────────
 
-@dataclass
 class MatchResult:
-    score: float          # 0.0 - 1.0 final compatibility score
-    grade: str            # A+, A, B, C, D
-    dimension_scores: dict
-    top_strengths: list
-    top_tensions: list
-    clash_penalties: list
-    bonuses: list
+    """
+    Compatibility result for one pair in one context.
+
+    score (0.0 - 1.0) and grade (A+, A, B, C, D) are set up front. The
+    explanation fields — dimension_scores, top_strengths, top_tensions,
+    clash_penalties, bonuses — are built from the pair's per-variable terms
+    on first access, so callers that only read .score never pay for them.
+    """
+
+    def __init__(
+        self,
+        score: float,
+        grade: str,
+        dimension_scores: Optional[dict] = None,
+        top_strengths: Optional[list] = None,
+        top_tensions: Optional[list] = None,
+        clash_penalties: Optional[list] = None,
+        bonuses: Optional[list] = None,
+        terms: Optional["_PairTerms"] = None,
+    ):
+        self.score = score
+        self.grade = grade
+        self._terms = terms
+        # Explicit values win over the lazy properties below (instance dict shadows them)
+        for name, value in (
+            ("dimension_scores", dimension_scores),
+            ("top_strengths", top_strengths),
+            ("top_tensions", top_tensions),
+            ("clash_penalties", clash_penalties),
+            ("bonuses", bonuses),
+        ):
+            if value is not None:
+                self.__dict__[name] = value
+
+    def __repr__(self) -> str:
+        return f"MatchResult(score={self.score!r}, grade={self.grade!r})"
+
+    @cached_property
+    def dimension_scores(self) -> dict:
+        return {k: round(v, 3) for k, v in self._terms.dimension_values().items()}
+
+    @cached_property
+    def top_strengths(self) -> list:
+        weighted = self._terms.weighted()
+        # nlargest/nsmallest == sorted(...)[:5], ties included, without the full sort
+        return self._terms.describe(heapq.nlargest(5, range(len(weighted)), key=weighted.__getitem__))
+
+    @cached_property
+    def top_tensions(self) -> list:
+        weighted = self._terms.weighted()
+        return self._terms.describe(heapq.nsmallest(5, range(len(weighted)), key=weighted.__getitem__))
+
+    @cached_property
+    def clash_penalties(self) -> list:
+        return [{"rule": name, "penalty": p} for name, p in self._terms.clash_hits]
+
+    @cached_property
+    def bonuses(self) -> list:
+        return [{"rule": name, "bonus": b} for name, b in self._terms.bonus_hits]
+
+
+class _PairTerms:
+    """Per-variable terms of one scored pair, kept for lazy MatchResult explanations."""
+
+    __slots__ = ("plan", "raw_scores", "clash_hits", "bonus_hits", "_weighted", "_dimensions", "_rounded")
+
+    def __init__(self, plan, raw_scores, clash_hits, bonus_hits,
+                 weighted=None, dimension_values=None, rounded_raw=None):
+        self.plan = plan
+        self.raw_scores = raw_scores
+        self.clash_hits = clash_hits
+        self.bonus_hits = bonus_hits
+        self._weighted = weighted
+        self._dimensions = dimension_values
+        self._rounded = rounded_raw
+
+    def weighted(self) -> list:
+        if self._weighted is None:
+            self._weighted = [s * t[2] for s, t in zip(self.raw_scores, self.plan.terms)]
+        return self._weighted
+
+    def dimension_values(self) -> dict:
+        if self._dimensions is None:
+            weighted = self.weighted()
+            values = {}
+            for dim_name, start, stop, dim_w in self.plan.dimension_slices:
+                if dim_w == 0:
+                    values[dim_name] = 0.5
+                    continue
+                acc = 0.0
+                for j in range(start, stop):
+                    acc += weighted[j]
+                values[dim_name] = acc / dim_w
+            self._dimensions = values
+        return self._dimensions
+
+    def describe(self, columns: list) -> list:
+        terms = self.plan.terms
+        return [
+            {
+                "variable": DIMENSION_ORDER[j],
+                "score": self._rounded[j] if self._rounded is not None else round(self.raw_scores[j], 2),
+                "weight": terms[j][4],
+            }
+            for j in columns
+        ]
 
 
 def dim_score(a: float, b: float, mode: str) -> float:
@@ -175,99 +551,221 @@ def evaluate_bonus(a_scores: dict, b_scores: dict, rule: tuple, context: str) ->
     return 0.0
 
 
-def compute_match(vector_a: dict, vector_b: dict, context: str) -> MatchResult:
-    assert context in ("hackathon", "romantic", "friendship"), f"Invalid context: {context}"
+def _final_score(base_score: float, clash_hits: list, bonus_hits: list) -> float:
+    """Clamp base + penalties + bonuses, added in rule order."""
+    clash_total = 0.0
+    for _, p in clash_hits:
+        clash_total += p
+    bonus_total = 0.0
+    for _, b in bonus_hits:
+        bonus_total += b
+    return max(0.0, min(1.0, base_score + clash_total + bonus_total))
+
 
+def _grade(final: float) -> str:
+    return next((g for threshold, g in GRADE_BANDS if final >= threshold), "D")
+
+
+def _score_pair(plan: ScoringPlan, vector_a: dict, vector_b: dict):
+    """Scalar kernel: (raw_scores, final, clash_hits, bonus_hits) for one pair."""
     a_scores = vector_a["scores"]
     b_scores = vector_b["scores"]
+    a = [a_scores.get(var, 0.5) for var in DIMENSION_ORDER]
+    b = [b_scores.get(var, 0.5) for var in DIMENSION_ORDER]
 
-    # ── Per-variable weighted scores ──
-    raw_scores = {}
-    weights = {}
-    for var, config in VARIABLE_CONFIG.items():
-        w = config[context]
-        s = dim_score(a_scores.get(var, 0.5), b_scores.get(var, 0.5), config["mode"])
-        raw_scores[var] = s
-        weights[var] = w
-
-    # Normalize weights to sum to 1
-    total_weight = sum(weights.values())
-    normalized = {v: w / total_weight for v, w in weights.items()}
-
-    # Weighted sum
-    base_score = sum(raw_scores[v] * normalized[v] for v in VARIABLE_CONFIG)
-
-    # ── Dimension rollups ──
-    dimension_groups = {
-        "Cognitive Style":      list(VARIABLE_CONFIG.keys())[0:9],
-        "Emotional Profile":    list(VARIABLE_CONFIG.keys())[9:19],
-        "Collaboration & Work": list(VARIABLE_CONFIG.keys())[19:29],
-        "Values & Motivation":  list(VARIABLE_CONFIG.keys())[29:38],
-        "Communication":        list(VARIABLE_CONFIG.keys())[38:45],
-        "Identity & Lifestyle": list(VARIABLE_CONFIG.keys())[45:50],
-    }
+    # ── Per-variable scores, same op order as _pair_scores() ──
+    raw_scores = [offset + sign * abs(b[j] - a[j]) for j, (offset, sign, *_) in enumerate(plan.terms)]
 
-    dimension_scores = {}
-    for dim_name, vars_ in dimension_groups.items():
-        dim_w = sum(weights[v] for v in vars_)
-        if dim_w == 0:
-            dimension_scores[dim_name] = 0.5
-        else:
-            dimension_scores[dim_name] = sum(raw_scores[v] * weights[v] for v in vars_) / dim_w
+    base_score = 0.0
+    for s, t in zip(raw_scores, plan.terms):
+        base_score += s * t[3]
 
-    # ── Clashes ──
-    clash_hits = []
-    clash_total = 0.0
-    for rule in CLASH_RULES:
-        p = evaluate_clash(a_scores, b_scores, rule, context)
-        if p != 0.0:
-            clash_hits.append({"rule": rule[0], "penalty": p})
-            clash_total += p
-
-    # ── Bonuses ──
-    bonus_hits = []
-    bonus_total = 0.0
-    for rule in BONUS_RULES:
-        b = evaluate_bonus(a_scores, b_scores, rule, context)
-        if b != 0.0:
-            bonus_hits.append({"rule": rule[0], "bonus": b})
-            bonus_total += b
-
-    # ── Final score ──
-    final = max(0.0, min(1.0, base_score + clash_total + bonus_total))
-
-    # ── Top strengths and tensions ──
-    sorted_vars = sorted(raw_scores.items(), key=lambda x: weights[x[0]] * x[1], reverse=True)
-    top_strengths = [
-        {"variable": v, "score": round(s, 2), "weight": round(normalized[v], 3)}
-        for v, s in sorted_vars[:5]
-    ]
+    # ── Clashes + bonuses ──
+    clash_hits = plan.clash.named(plan.clash.fired(a, b))
+    bonus_hits = plan.bonus.named(plan.bonus.fired(a, b))
 
-    sorted_tensions = sorted(raw_scores.items(), key=lambda x: weights[x[0]] * x[1])
-    top_tensions = [
-        {"variable": v, "score": round(s, 2), "weight": round(normalized[v], 3)}
-        for v, s in sorted_tensions[:5]
-    ]
+    return raw_scores, _final_score(base_score, clash_hits, bonus_hits), clash_hits, bonus_hits
 
-    # ── Grade ──
-    if final >= 0.88:   grade = "A+"
-    elif final >= 0.80: grade = "A"
-    elif final >= 0.70: grade = "B"
-    elif final >= 0.60: grade = "C"
-    else:               grade = "D"
+
+def compute_match(vector_a: dict, vector_b: dict, context: str) -> MatchResult:
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    plan = get_plan(context)
+
+    raw_scores, final, clash_hits, bonus_hits = _score_pair(plan, vector_a, vector_b)
 
     return MatchResult(
         score=round(final, 4),
-        grade=grade,
-        dimension_scores={k: round(v, 3) for k, v in dimension_scores.items()},
-        top_strengths=top_strengths,
-        top_tensions=top_tensions,
-        clash_penalties=clash_hits,
-        bonuses=bonus_hits,
+        grade=_grade(final),
+        terms=_PairTerms(plan, raw_scores, clash_hits, bonus_hits),
+    )
+
+
+def match_score(vector_a: dict, vector_b: dict, context: str) -> float:
+    """Score-only compute_match(): same .score, no explanation state at all."""
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    _, final, _, _ = _score_pair(get_plan(context), vector_a, vector_b)
+    return round(final, 4)
+
+
+def compute_match_all_contexts(vector_a: dict, vector_b: dict) -> dict[str, MatchResult]:
+    """
+    compute_match() for every context in one pass: the 50 per-variable scores
+    and the rule predicates are evaluated once, then the 3×50 weight matrix and
+    each context's rule subset are applied. Results equal three compute_match calls.
+    """
+    fused = FUSED_PLAN
+    a_scores = vector_a["scores"]
+    b_scores = vector_b["scores"]
+    a = [a_scores.get(var, 0.5) for var in DIMENSION_ORDER]
+    b = [b_scores.get(var, 0.5) for var in DIMENSION_ORDER]
+
+    plan0 = fused.plans[0]
+    raw = np.abs(np.array(b, dtype=np.float64) - np.array(a, dtype=np.float64))
+    raw *= plan0.sign
+    raw += plan0.offset
+
+    base_scores = _ordered_row_sum(raw * fused.normalized).tolist()
+    weighted = raw * fused.weights
+    rollups = np.empty((len(fused.plans), len(plan0.dimension_index)))
+    for col, idx in enumerate(plan0.dimension_index):
+        rollups[:, col] = _ordered_row_sum(weighted[:, idx])
+
+    clash_fired = fused.clash.fired(a, b)
+    bonus_fired = fused.bonus.fired(a, b)
+
+    raw_scores = raw.tolist()
+    rounded_raw = _round(raw, 2).tolist()
+    results = {}
+    for c, plan in enumerate(fused.plans):
+        dimension_values = {
+            name: (acc / dim_w if dim_w != 0 else 0.5)
+            for (name, _, _, dim_w), acc in zip(plan.dimension_slices, rollups[c].tolist())
+        }
+        clash_hits = fused.clash.named([r for r in clash_fired if fused.clash_contexts[c, r]])
+        bonus_hits = fused.bonus.named([r for r in bonus_fired if fused.bonus_contexts[c, r]])
+        final = _final_score(base_scores[c], clash_hits, bonus_hits)
+        results[plan.context] = MatchResult(
+            score=round(final, 4),
+            grade=_grade(final),
+            terms=_PairTerms(
+                plan, raw_scores, clash_hits, bonus_hits,
+                weighted=weighted[c].tolist(),
+                dimension_values=dimension_values,
+                rounded_raw=rounded_raw,
+            ),
+        )
+    return results
+
+
+# ── 3b. BATCH SCORING ─────────────────────────────────────────────────────────
+# Same plan and kernel as compute_match, one query against N candidates at once.
+
+@dataclass
+class BatchMatchResult:
+    score: np.ndarray             # (N,) final scores, rounded like MatchResult.score
+    grade: np.ndarray             # (N,) grade strings
+    dimension_scores: np.ndarray  # (N, 6) rollups, rounded like MatchResult.dimension_scores
+    dimension_names: list         # column labels for dimension_scores
+
+
+def compute_match_many(query_vector, candidate_matrix: np.ndarray, context: str) -> BatchMatchResult:
+    """
+    Score one query against N candidates in a single NumPy pass.
+
+    query_vector:     vector dict ({"scores": ...}) or a length-50 array in DIMENSION_ORDER
+    candidate_matrix: (N, 50) float array in DIMENSION_ORDER
+
+    score[i], grade[i] and dimension_scores[i] equal what
+    compute_match(query, candidate_i, context) returns for the same pair.
+    """
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    plan = get_plan(context)
+
+    raw, final, _, _ = _pair_scores(plan, _as_rows(query_vector), _as_rows(candidate_matrix))
+
+    return BatchMatchResult(
+        score=_round(final, 4),
+        grade=_grades(final),
+        dimension_scores=_round(_dimension_rollups(plan, raw), 3),
+        dimension_names=list(plan.dimension_names),
     )
 
 
-# ── 3. PRETTY PRINT ───────────────────────────────────────────────────────────
+def score_upper_bound(query_vector, candidate_matrix: np.ndarray, context: str) -> np.ndarray:
+    """
+    A per-candidate upper bound on compute_match(query, b, context).score,
+    built term by term: every variable term exactly, plus each bonus rule
+    that fires for the pair. Clash rules are left out — they only subtract —
+    so the bound is the score itself unless a clash fires.
+
+    get_matches() pages through a pool in descending bound order: once the
+    last bound fetched is below the top_n-th exact score, nobody further
+    down can enter the top_n.
+    """
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    plan = get_plan(context)
+    a = _as_rows(query_vector)
+    b = _as_rows(candidate_matrix)
+
+    raw = np.abs(b - a)
+    raw *= plan.sign
+    raw += plan.offset
+    bound = _ordered_row_sum(raw * plan.normalized) + plan.bonus.total(plan.bonus.hits(a, b))
+    return np.clip(bound, 0.0, 1.0)
+
+
+def pairwise_scores(candidate_matrix: np.ndarray, context: str, block_pairs: int = 65536) -> np.ndarray:
+    """
+    Every-pair compute_match().score for a pool, as an (n, n) matrix.
+
+    Entry [i, j] (and its mirror [j, i]) is compute_match(pool[i], pool[j]).score
+    for i < j — pool order decides which side plays "a" in the asymmetric rules,
+    exactly like scoring a combination drawn from the pool. The diagonal is 0.
+    Pairs are scored in vectorized blocks of roughly `block_pairs`.
+    """
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    plan = get_plan(context)
+    rows = _as_rows(candidate_matrix)
+    n = rows.shape[0]
+    out = np.zeros((n, n))
+
+    start = 0
+    while start < n - 1:
+        stop, count = start, 0
+        while stop < n - 1 and (count == 0 or count + (n - 1 - stop) <= block_pairs):
+            count += n - 1 - stop
+            stop += 1
+        ii = np.concatenate([np.full(n - 1 - r, r, dtype=np.intp) for r in range(start, stop)])
+        jj = np.concatenate([np.arange(r + 1, n, dtype=np.intp) for r in range(start, stop)])
+        _, final, _, _ = _pair_scores(plan, rows[ii], rows[jj])
+        block = _round(final, 4)
+        out[ii, jj] = block
+        out[jj, ii] = block
+        start = stop
+    return out
+
+
+def pairwise_row(candidate_matrix: np.ndarray, index: int, context: str) -> np.ndarray:
+    """
+    Row `index` of pairwise_scores() without scoring the rest of the pool:
+    pool[i] plays "a" against pool[index] for i < index, and pool[index]
+    plays "a" for j > index. Entry [index] is 0.
+    """
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    plan = get_plan(context)
+    rows = _as_rows(candidate_matrix)
+    out = np.zeros(rows.shape[0])
+    me = rows[index:index + 1]
+    if index > 0:
+        _, final, _, _ = _pair_scores(plan, rows[:index], np.repeat(me, index, axis=0))
+        out[:index] = _round(final, 4)
+    if index < rows.shape[0] - 1:
+        _, final, _, _ = _pair_scores(plan, me, rows[index + 1:])
+        out[index + 1:] = _round(final, 4)
+    return out
+
+
+# ── 4. PRETTY PRINT ───────────────────────────────────────────────────────────
 
 def print_result(result: MatchResult, context: str):
     print(f"\n{'═'*52}")
@@ -314,7 +812,7 @@ def result_to_dict(result: MatchResult) -> dict:
     }
 
 
-# ── 4. CLI ────────────────────────────────────────────────────────────────────
+# ── 5. CLI ────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Match two personality vectors")
@@ -4,40 +4,36 @@ matching_engine.py
 Snowflake-backed matching engine for Mirror.
 Two-phase search: fast vector filtering in SQL, rich re-ranking in Python.
 
-Phase 1 (SQL):  VECTOR_COSINE_SIMILARITY with server scoping + flag filtering
+Phase 1 (SQL):  VECTOR_COSINE_SIMILARITY with server scoping + flag filtering,
+                served from an in-process CandidateIndex mirrored from Snowflake
 Phase 2 (Python): compute_match() re-ranking with clash/bonus rules
+
+All reads and writes go through the storage backend (storage.get_storage());
+MATCH_STORAGE_BACKEND=local runs the same paths against in-memory tables.
 """
 
 import os
-import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Optional
 
-import snowflake.connector
+import numpy as np
 
-from matching import compute_match, result_to_dict, VARIABLE_CONFIG
-from features import red_flag_radar, gemini_blurb, group_match
+from matching import compute_match, compute_match_many, result_to_dict, CONTEXTS, DIMENSION_ORDER
+from features import red_flag_radar, gemini_blurb, partition_teams, team_report
+from team_search import GROUP_MODES, SearchControl, TeamSearchState, search_teams
+from candidate_index import CandidateIndex, CandidateSet, stored_scores
+from history_writer import get_history_writer, history_row
+from match_store import MatchStore
+from storage import ArchetypeRows, get_storage
 
 logger = logging.getLogger(__name__)
 
-DIMENSION_ORDER: list[str] = list(VARIABLE_CONFIG.keys())
 assert len(DIMENSION_ORDER) == 50
 
-# ── Snowflake Connection ────────────────────────────────────────────────────
-
-def _get_connection() -> snowflake.connector.SnowflakeConnection:
-    return snowflake.connector.connect(
-        account=os.environ["SNOWFLAKE_ACCOUNT"],
-        user=os.environ["SNOWFLAKE_USER"],
-        password=os.environ["SNOWFLAKE_PASSWORD"],
-        warehouse=os.environ.get("SNOWFLAKE_WAREHOUSE", "MIRROR_WH"),
-        database=os.environ.get("SNOWFLAKE_DATABASE", "MIRROR"),
-        schema=os.environ.get("SNOWFLAKE_SCHEMA", "MATCHING"),
-        role=os.environ.get("SNOWFLAKE_ROLE", "MIRROR_APP_ROLE"),
-    )
-
-
 # ── Vector Conversion ──────────────────────────────────────────────────────
 
 def scores_to_vector(scores: dict[str, float]) -> list[float]:
@@ -61,65 +57,18 @@ def _reconstruct_vector_dict(scores_json: dict, evidence_json: dict | None) -> d
 
 def upsert_raw_corpus(user_id: str, cleaned_corpus: str) -> None:
     """Write the cleaned Takeout corpus into raw_user_onboarding for Cortex embedding."""
-    conn = _get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            MERGE INTO RAW_USER_ONBOARDING tgt
-            USING (SELECT %(user_id)s AS auth0_id, %(corpus)s AS cleaned_corpus) src
-            ON tgt.auth0_id = src.auth0_id
-            WHEN MATCHED THEN UPDATE SET
-                cleaned_corpus = src.cleaned_corpus,
-                updated_at     = CURRENT_TIMESTAMP()
-            WHEN NOT MATCHED THEN INSERT (auth0_id, cleaned_corpus)
-                VALUES (src.auth0_id, src.cleaned_corpus)
-            """,
-            {"user_id": user_id, "corpus": cleaned_corpus},
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    get_storage().upsert_raw_corpus(user_id, cleaned_corpus)
 
 
 def embed_and_upsert_archetype(user_id: str, server_id: str = "general") -> None:
     """
     Generate a 768-dim embedding from the user's cleaned_corpus in raw_user_onboarding
-    via SNOWFLAKE.CORTEX.EMBED_TEXT_768, then insert/update user_archetypes.
-    """
-    conn = _get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            MERGE INTO USER_ARCHETYPES tgt
-            USING (
-                SELECT
-                    auth0_id,
-                    %(server_id)s AS server_id,
-                    SNOWFLAKE.CORTEX.EMBED_TEXT_768(
-                        'snowflake-arctic-embed-m',
-                        cleaned_corpus
-                    ) AS embedding,
-                    'Analyzed Persona' AS archetype_label
-                FROM RAW_USER_ONBOARDING
-                WHERE auth0_id = %(user_id)s
-            ) src
-            ON tgt.user_id = src.auth0_id AND tgt.server_id = src.server_id
-            WHEN MATCHED THEN UPDATE SET
-                archetype_vector = src.embedding,
-                updated_at       = CURRENT_TIMESTAMP()
-            WHEN NOT MATCHED THEN INSERT (
-                user_id, server_id, archetype_vector
-            ) VALUES (
-                src.auth0_id, src.server_id, src.embedding
-            )
-            """,
-            {"user_id": user_id, "server_id": server_id},
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    via SNOWFLAKE.CORTEX.EMBED_TEXT_768 into USER_VECTORS, and join the server.
+    A no-op on storage without Cortex embedding.
+    """
+    storage = get_storage()
+    if storage.supports_embedding:
+        storage.embed_archetype(user_id, server_id)
 
 
 # ── Upsert User Archetype (Legacy 50-dim) ────────────────────────────────
@@ -130,91 +79,109 @@ def upsert_archetype(
     vector_dict: dict,
     reputation_score: float = 0.0,
 ) -> None:
-    """Write or update a user's archetype vector in Snowflake."""
+    """
+    Write or update a user's archetype vector (MERGE on user_id) and make
+    them a member of server_id. The vector is stored once per user, so it
+    changes on every server they belong to.
+    """
     scores = vector_dict["scores"]
     evidence = vector_dict.get("evidence", {})
     ordered_vector = scores_to_vector(scores)
 
-    conn = _get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            MERGE INTO USER_ARCHETYPES tgt
-            USING (SELECT
-                %(user_id)s                    AS user_id,
-                %(server_id)s                  AS server_id,
-                PARSE_JSON(%(vector)s)::VECTOR(FLOAT, 50)  AS archetype_vector,
-                PARSE_JSON(%(scores)s)         AS scores_json,
-                PARSE_JSON(%(evidence)s)       AS evidence_json,
-                %(reputation)s                 AS reputation_score,
-                %(confidence)s                 AS confidence,
-                %(msg_count)s                  AS message_count_used
-            ) src
-            ON tgt.user_id = src.user_id AND tgt.server_id = src.server_id
-            WHEN MATCHED THEN UPDATE SET
-                archetype_vector   = src.archetype_vector,
-                scores_json        = src.scores_json,
-                evidence_json      = src.evidence_json,
-                reputation_score   = src.reputation_score,
-                confidence         = src.confidence,
-                message_count_used = src.message_count_used,
-                updated_at         = CURRENT_TIMESTAMP()
-            WHEN NOT MATCHED THEN INSERT (
-                user_id, server_id, archetype_vector, scores_json,
-                evidence_json, reputation_score, confidence, message_count_used
-            ) VALUES (
-                src.user_id, src.server_id, src.archetype_vector, src.scores_json,
-                src.evidence_json, src.reputation_score, src.confidence,
-                src.message_count_used
-            )
-            """,
-            {
-                "user_id": user_id,
-                "server_id": server_id,
-                "vector": json.dumps(ordered_vector),
-                "scores": json.dumps(scores),
-                "evidence": json.dumps(evidence),
-                "reputation": reputation_score,
-                "confidence": vector_dict.get("confidence", "unknown"),
-                "msg_count": vector_dict.get("message_count_used", 0),
-            },
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    storage = get_storage()
+    storage.upsert_archetype(
+        user_id, server_id, ordered_vector, scores, evidence,
+        reputation=reputation_score,
+        confidence=vector_dict.get("confidence", "unknown"),
+        message_count=vector_dict.get("message_count_used", 0),
+    )
+
+    for sid in _cached_servers(user_id, server_id):
+        _match_store.invalidate(sid, user_id)
+        if sid in _team_states or sid in _candidate_indexes:
+            active = storage.is_eligible(user_id, sid)
+            _update_team_state(sid, user_id, {"scores": scores, "evidence": {}} if active else None)
+            _update_candidate_index(sid, user_id, vector_dict if active else None, reputation_score)
+
+
+def _cached_servers(user_id: str, server_id: Optional[str] = None) -> set[str]:
+    """server_id plus every server whose cached index or team state holds the user."""
+    with _candidate_indexes_lock:
+        servers = {sid for sid, index in _candidate_indexes.items() if user_id in index}
+    with _team_states_lock:
+        servers.update(sid for sid, state in _team_states.items() if user_id in state)
+    if server_id is not None:
+        servers.add(server_id)
+    return servers
+
+
+def bulk_upsert_archetypes(rows: list[dict]) -> dict:
+    """
+    Write many (user, server) archetypes with a single staged MERGE instead
+    of one MERGE + commit per row. Each user's vector is written once (the
+    last row for a user wins); every row's server becomes a membership.
+
+    Each row needs user_id, server_id and scores. Optional:
+      - vector: 50 floats as they should be stored (defaults to the scores in
+        DIMENSION_ORDER; pass it when the caller has its own dimension order)
+      - evidence, reputation_score, confidence, message_count_used: omitted
+        fields keep the stored value on update and the defaults on insert
+
+    Cached candidate indexes and team states of the touched servers, and of
+    any other server holding a touched user, are dropped and rebuilt with
+    one bulk query on next use.
+    """
+    normalized = []
+    for row in rows:
+        vector = row.get("vector")
+        vector = [float(x) for x in vector] if vector is not None else scores_to_vector(row["scores"])
+        assert len(vector) == len(DIMENSION_ORDER), \
+            f"{row['user_id']}@{row['server_id']}: vector needs {len(DIMENSION_ORDER)} dims, got {len(vector)}"
+        normalized.append({
+            "user_id":            row["user_id"],
+            "server_id":          row["server_id"],
+            "vector":             vector,
+            "scores":             row["scores"],
+            "evidence":           row.get("evidence"),
+            "reputation_score":   row.get("reputation_score"),
+            "confidence":         row.get("confidence"),
+            "message_count_used": row.get("message_count_used"),
+        })
+
+    report = get_storage().bulk_upsert_archetypes(normalized)
+
+    written = {row["server_id"] for row in normalized}
+    servers = set(written)
+    for user_id in {row["user_id"] for row in normalized}:
+        servers |= _cached_servers(user_id)
+    for row in normalized:
+        for sid in servers:
+            _match_store.invalidate(sid, row["user_id"])
+    with _candidate_indexes_lock:
+        for server_id in servers:
+            _candidate_indexes.pop(server_id, None)
+    with _team_states_lock:
+        for server_id in servers:
+            _team_states.pop(server_id, None)
+    return {**report, "servers": sorted(written)}
 
 
 # ── Phase 1a: Cortex Search (768-dim, unified with frontend) ─────────────────
 
-CORTEX_SERVICE = os.environ.get("CORTEX_SEARCH_SERVICE_NAME", "ARCHETYPE_MATCH_SERVICE")
-CORTEX_VECTOR_INDEX = os.environ.get("CORTEX_SEARCH_VECTOR_INDEX", "archetype_vector")
-VECTOR_DIM_768 = 768
+# Hybrid Cortex matching over-fetches Cortex candidates for the 50-dim
+# re-rank: CORTEX_OVERFETCH x top_n, scaled up by how many candidates on this
+# server usually turn out rankable (eligible and with 50-dim scores), capped
+# at CORTEX_MAX_CANDIDATES.
+CORTEX_OVERFETCH = float(os.environ.get("CORTEX_OVERFETCH", "2"))
+CORTEX_MAX_CANDIDATES = int(os.environ.get("CORTEX_MAX_CANDIDATES", "200"))
+CORTEX_USABLE_DECAY = 0.8           # EWMA weight on the previous usable fraction
+
+_cortex_usable: dict[str, float] = {}   # server_id -> EWMA of usable/fetched
 
 
 def get_user_embedding_768(auth0_id: str, server_id: str = "general") -> list[float] | None:
-    """Fetch the user's 768-dim embedding from Snowflake (unified user_archetypes table)."""
-    conn = _get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT archetype_vector::ARRAY AS emb
-            FROM user_archetypes
-            WHERE user_id = %(auth0_id)s AND server_id = %(server_id)s
-            LIMIT 1
-            """,
-            {"auth0_id": auth0_id, "server_id": server_id},
-        )
-        row = cur.fetchone()
-        if not row:
-            return None
-        raw = row[0]
-        if not raw or len(raw) != VECTOR_DIM_768:
-            return None
-        return [float(x) for x in raw]
-    finally:
-        conn.close()
+    """Fetch the user's 768-dim embedding from Snowflake (USER_VECTORS, if a member of server_id)."""
+    return get_storage().user_embedding_768(auth0_id, server_id)
 
 
 def _fetch_candidates_cortex(
@@ -227,92 +194,176 @@ def _fetch_candidates_cortex(
     Phase 1 via Snowflake Cortex Search (same as frontend).
     Returns list of {"auth0_id": str, "score": float} for matching.
     """
-    query_payload = {
-        "multi_index_query": {
-            CORTEX_VECTOR_INDEX: [{"vector": user_vector_768}],
-        },
-        "filter": {
-            "@and": [
-                {"@eq": {"server_id": server_id}},
-                {"@eq": {"is_flagged": False}},
-            ],
-        },
-        "columns": ["user_id"],
-        "limit": limit,
-    }
-    query_json = json.dumps(query_payload)
-
-    conn = _get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT PARSE_JSON(SNOWFLAKE.CORTEX.SEARCH_PREVIEW(%s, %s))['results'] AS results
-            """,
-            (CORTEX_SERVICE, query_json),
-        )
-        row = cur.fetchone()
-        raw = row[0] if row else None
-        if not raw or not isinstance(raw, (list, str)):
-            return []
-        if isinstance(raw, str):
-            raw = json.loads(raw)
-        results = []
-        for r in raw:
-            aid = r.get("user_id") or r.get("USER_ID") or r.get("auth0_id") or r.get("AUTH0_ID")
-            if not aid or aid == exclude_auth0_id:
-                continue
-            score = float(r.get("score", r.get("SCORE", 0.0)))
-            results.append({"auth0_id": aid, "score": score})
-        return results[:limit]
-    finally:
-        conn.close()
+    return get_storage().cortex_search(user_vector_768, server_id, exclude_auth0_id, limit)
+
+
+def _cortex_limit(server_id: str, top_n: int) -> int:
+    """Cortex over-fetch for top_n, adapted to the server's usable-candidate rate."""
+    usable = max(_cortex_usable.get(server_id, 1.0), 0.05)
+    return max(top_n, min(CORTEX_MAX_CANDIDATES, int(np.ceil(top_n * CORTEX_OVERFETCH / usable))))
+
+
+def _observe_cortex_usable(server_id: str, usable: int, fetched: int) -> None:
+    if fetched:
+        rate = usable / fetched
+        prev = _cortex_usable.get(server_id, rate)
+        _cortex_usable[server_id] = CORTEX_USABLE_DECAY * prev + (1 - CORTEX_USABLE_DECAY) * rate
+
+
+def _fetch_scores_for(server_id: str, user_ids: list[str]) -> dict[str, dict]:
+    """
+    One batched lookup of SCORES_JSON + reputation for these users:
+    {user_id: {"scores", "reputation", "eligible"}}. Users without 50-dim
+    scores (Cortex-only rows) are left out.
+    """
+    return get_storage().scores_for(server_id, user_ids)
 
 
 # ── Phase 1b: Legacy 50-dim Vector Candidate Retrieval ──────────────────────
 
 def _fetch_candidates(
-    user_vector: list[float],
+    user_vector: dict,
     server_id: str,
     user_id: str,
+    context: str,
     limit: int = 20,
-) -> list[dict]:
+    after: Optional[tuple[float, str]] = None,
+) -> CandidateSet:
     """
-    Legacy SQL phase: VECTOR_COSINE_SIMILARITY on 50-dim USER_ARCHETYPES,
-    server-scoped, flagged users excluded. Use Cortex path when 768-dim available.
-    """
-    conn = _get_connection()
-    try:
-        cur = conn.cursor(snowflake.connector.DictCursor)
-        cur.execute(
-            """
-            SELECT
-                ua.user_id,
-                VECTOR_COSINE_SIMILARITY(
-                    ua.archetype_vector,
-                    PARSE_JSON(%(query_vec)s)::VECTOR(FLOAT, 50)
-                ) AS cosine_score,
-                ua.scores_json,
-                ua.evidence_json,
-                ua.reputation_score
-            FROM USER_ARCHETYPES ua
-            WHERE ua.server_id = %(server_id)s
-              AND ua.user_id != %(user_id)s
-              AND ua.status = 'active'
-              AND ua.abandonment_count < 3
-            ORDER BY cosine_score DESC
-            LIMIT %(lim)s
-            """,
-            {
-                "query_vec": json.dumps(user_vector),
-                "server_id": server_id,
-                "user_id": user_id,
-                "lim": limit,
-            },
-        )
-        return cur.fetchall()
-    finally:
-        conn.close()
+    Legacy SQL phase: one page of the server's members' 50-dim USER_VECTORS
+    by score_upper_bound (computed in the warehouse), flagged members
+    excluded. Use Cortex path when 768-dim available.
+    """
+    return get_storage().bounded_candidates(user_vector["scores"], server_id, user_id, context, limit, after)
+
+
+# ── Phase 1c: In-process Candidate Index ────────────────────────────────────
+
+# get_matches() retrieves from a per-server CandidateIndex instead of scanning
+# Snowflake per request. A background poller applies rows whose updated_at
+# moved (looking back CANDIDATE_INDEX_POLL_OVERLAP_SECONDS so rows committed
+# late with an older timestamp aren't missed), and rebuilds an index from
+# scratch once it is CANDIDATE_INDEX_REBUILD_SECONDS old to drop deleted rows.
+CANDIDATE_INDEX_ENABLED = os.environ.get("CANDIDATE_INDEX_ENABLED", "1") == "1"
+CANDIDATE_INDEX_POLL_SECONDS = float(os.environ.get("CANDIDATE_INDEX_POLL_SECONDS", "5"))
+CANDIDATE_INDEX_POLL_OVERLAP_SECONDS = float(os.environ.get("CANDIDATE_INDEX_POLL_OVERLAP_SECONDS", "10"))
+CANDIDATE_INDEX_REBUILD_SECONDS = float(os.environ.get("CANDIDATE_INDEX_REBUILD_SECONDS", "900"))
+
+_candidate_indexes: dict[str, CandidateIndex] = {}
+_candidate_indexes_lock = threading.Lock()              # the dicts and _index_poller; never held for I/O
+_candidate_index_builds: dict[str, threading.Lock] = {}  # one bootstrap at a time per server
+_index_poller: Optional[threading.Thread] = None
+
+
+def _index_rows(server_id: str, since=None) -> ArchetypeRows:
+    """
+    A server's memberships joined to USER_VECTORS for its index: every eligible
+    member when `since` is None, otherwise every row (eligible or not) whose
+    vector or membership was updated since then.
+    """
+    return get_storage().archetype_rows(server_id, since, CANDIDATE_INDEX_POLL_OVERLAP_SECONDS)
+
+
+def _apply_index_rows(index: CandidateIndex, rows: ArchetypeRows) -> None:
+    with index.lock:
+        if len(index) == 0 and rows.eligible.all():
+            index.load(rows.user_ids, rows.vectors, rows.reputation)
+        else:
+            for i, user_id in enumerate(rows.user_ids):
+                if rows.eligible[i]:
+                    index.upsert(user_id, rows.vectors[i], rows.reputation[i])
+                else:
+                    index.remove(user_id)
+        index.advance(rows.updated_at)
+        index.polled_at = time.time()
+
+
+def _build_candidate_index(server_id: str) -> CandidateIndex:
+    index = CandidateIndex(server_id)
+    _apply_index_rows(index, _index_rows(server_id))
+    return index
+
+
+def _poll_candidate_indexes() -> None:
+    """Poller thread: keep every cached index in step with USER_VECTORS and SERVER_MEMBERSHIPS."""
+    while True:
+        time.sleep(CANDIDATE_INDEX_POLL_SECONDS)
+        with _candidate_indexes_lock:
+            indexes = list(_candidate_indexes.values())
+        for index in indexes:
+            try:
+                stale = time.time() - index.built_at > CANDIDATE_INDEX_REBUILD_SECONDS
+                if stale or index.watermark is None:
+                    fresh = _build_candidate_index(index.server_id)
+                    with _candidate_indexes_lock:
+                        _candidate_indexes[index.server_id] = fresh
+                else:
+                    _apply_index_rows(index, _index_rows(index.server_id, since=index.watermark))
+            except Exception as e:
+                logger.warning("Candidate index poll failed for %s: %s", index.server_id, e)
+
+
+def _candidate_index(server_id: str) -> CandidateIndex:
+    """
+    The server's CandidateIndex, bootstrapped with one bulk query on first use.
+    The query and load run under that server's own build lock and the result
+    is swapped in, so requests for other servers don't wait for them.
+    """
+    global _index_poller
+    with _candidate_indexes_lock:
+        index = _candidate_indexes.get(server_id)
+        build_lock = _candidate_index_builds.setdefault(server_id, threading.Lock())
+    if index is None:
+        with build_lock:
+            with _candidate_indexes_lock:
+                index = _candidate_indexes.get(server_id)
+            if index is None:
+                index = _build_candidate_index(server_id)
+                with _candidate_indexes_lock:
+                    _candidate_indexes[server_id] = index
+
+    with _candidate_indexes_lock:
+        start_poller = _index_poller is None
+        if start_poller:
+            _index_poller = threading.Thread(
+                target=_poll_candidate_indexes, name="candidate-index-poller", daemon=True
+            )
+    if start_poller:
+        _index_poller.start()
+    _start_precompute()
+    return index
+
+
+def _index_candidates(
+    user_vector: dict,
+    server_id: str,
+    user_id: str,
+    context: str,
+    limit: int = 20,
+    after: Optional[tuple[float, str]] = None,
+) -> CandidateSet:
+    """Phase 1 from the in-process index; same candidates and order as _fetch_candidates."""
+    index = _candidate_index(server_id)
+    with index.lock:
+        return index.search(scores_to_vector(user_vector["scores"]), user_id, context, limit, after)
+
+
+def _update_candidate_index(server_id: str, user_id: str, vector_dict: dict | None,
+                            reputation: float = 0.0) -> None:
+    """Apply a local write to a cached index right away (vector_dict=None removes)."""
+    index = _candidate_indexes.get(server_id)
+    if index is None:
+        return
+    with index.lock:
+        if vector_dict is None:
+            index.remove(user_id)
+        else:
+            index.upsert(user_id, scores_to_vector(vector_dict["scores"]), reputation)
+
+
+def _fetch_evidence(server_id: str, user_ids: list[str]) -> dict[str, dict]:
+    """EVIDENCE_JSON for just these users, in one query (only blurbs need it)."""
+    return get_storage().evidence(server_id, user_ids)
 
 
 # ── Phase 2: Python Re-ranking ──────────────────────────────────────────────
@@ -332,28 +383,32 @@ class MatchCandidate:
     reputation_score: float
 
 
-def _parse_variant(val) -> dict:
-    """Snowflake VARIANT comes back as str or dict depending on driver version."""
-    if isinstance(val, str):
-        return json.loads(val)
-    return val if val is not None else {}
-
-
 def _rerank_candidates(
     query_vector_dict: dict,
-    candidates: list[dict],
+    candidates: CandidateSet,
     context: str,
     include_red_flags: bool = True,
+    limit: Optional[int] = None,
 ) -> list[MatchCandidate]:
     """
-    Run compute_match() on each candidate — full weighted scoring
-    with clash/bonus rules, optional red flag analysis.
+    Score every candidate in one compute_match_many() batch, then build the
+    full compute_match() breakdown + optional red flags for the best `limit`
+    (all of them when limit is None). Candidates the store already scored
+    (pushdown) keep the store's weighted score and order.
     """
+    if candidates.weighted is not None:
+        weighted = np.round(candidates.weighted, 4)
+    else:
+        weighted = compute_match_many(query_vector_dict, candidates.vectors, context).score
+
+    # Stable descending order: ties keep the Phase 1 order
+    order = np.argsort(-weighted, kind="stable")
+    if limit is not None:
+        order = order[:limit]
+
     results = []
-    for cand in candidates:
-        cand_scores = _parse_variant(cand["SCORES_JSON"])
-        cand_evidence = _parse_variant(cand.get("EVIDENCE_JSON"))
-        cand_vector_dict = _reconstruct_vector_dict(cand_scores, cand_evidence)
+    for idx in order.tolist():
+        cand_vector_dict = _reconstruct_vector_dict(candidates.scores(idx), None)
 
         match_result = compute_match(query_vector_dict, cand_vector_dict, context)
         match_data = result_to_dict(match_result)
@@ -363,9 +418,9 @@ def _rerank_candidates(
             red_flags = red_flag_radar(query_vector_dict, cand_vector_dict, context)
 
         results.append(MatchCandidate(
-            user_id=cand["USER_ID"],
-            cosine_score=float(cand["COSINE_SCORE"]),
-            weighted_score=match_data["score"],
+            user_id=candidates.user_ids[idx],
+            cosine_score=float(candidates.cosine[idx]),
+            weighted_score=float(weighted[idx]),
             grade=match_data["grade"],
             dimension_scores=match_data["dimension_scores"],
             top_strengths=match_data["top_strengths"],
@@ -373,10 +428,9 @@ def _rerank_candidates(
             clash_penalties=match_data["clash_penalties"],
             bonuses=match_data["bonuses"],
             red_flags=red_flags,
-            reputation_score=float(cand.get("REPUTATION_SCORE", 0)),
+            reputation_score=float(candidates.reputation[idx]),
         ))
 
-    results.sort(key=lambda m: m.weighted_score, reverse=True)
     return results
 
 
@@ -427,62 +481,193 @@ def _detect_dangerous_deltas(
     return alerts
 
 
-# ── Main API: get_matches() ─────────────────────────────────────────────────
+# ── Phase 1 Paging: Adaptive Over-fetch ───────────────────────────────────
 
-def get_matches(
-    user_id: str,
+# get_matches() fetches Phase 1 candidates in descending score_upper_bound
+# order, MATCH_INITIAL_OVERFETCH x top_n first, each further page as large
+# as everything fetched so far, until the re-ranked top_n provably can't
+# change or MATCH_MAX_CANDIDATES is reached. Pages are keyed on the last
+# (bound, user_id) seen, so no row is fetched twice.
+MATCH_INITIAL_OVERFETCH = int(os.environ.get("MATCH_INITIAL_OVERFETCH", "2"))
+MATCH_MAX_CANDIDATES = int(os.environ.get("MATCH_MAX_CANDIDATES", "400"))
+BOUND_SLACK = 1e-9      # float error allowance between the bound and the score
+
+
+def _top_positions(scores: np.ndarray, top_n: int) -> np.ndarray:
+    return np.argsort(-scores, kind="stable")[:top_n]
+
+
+def _adaptive_candidates(
+    fetch,
     user_vector: dict,
-    context: str,
     server_id: str,
-    top_n: int = 10,
-    include_blurbs: bool = False,
-    api_key: Optional[str] = None,
-) -> dict:
+    user_id: str,
+    context: str,
+    top_n: int,
+) -> tuple[CandidateSet, dict]:
     """
-    Full matching pipeline.
+    Phase 1 in growing pages, best score_upper_bound first. Fetching stops when:
+      - a page came back short (every eligible user has been scored), or
+      - the last bound fetched, rounded like a score, is below the current
+        top_n-th weighted score: everyone further down scores less, so
+        nobody can enter (or tie into) the top_n.
+    Otherwise the next page is fetched, up to MATCH_MAX_CANDIDATES in total.
+
+    Returns (candidates, recall report). recall["confidence"] is 1.0 when
+    the top_n is proven. When the cap stops the search it is an estimate of
+    the share of the top_n that is right: the rate at which the newest page
+    still produced top_n members, extrapolated over the users never fetched
+    (None if the pool size is unknown).
+    """
+    limit = min(MATCH_MAX_CANDIDATES, max(top_n, top_n * MATCH_INITIAL_OVERFETCH))
+    pages, page_scores = [], []
+    fetched_before, after = 0, None
+    while True:
+        page = fetch(user_vector=user_vector, server_id=server_id, user_id=user_id,
+                     context=context, limit=limit, after=after)
+        pages.append(page)
+        page_scores.append(compute_match_many(user_vector, page.vectors, context).score
+                           if len(page) else np.zeros(0))
+        scores = np.concatenate(page_scores)
+        fetched = fetched_before + len(page)
+
+        bound = kth = None
+        if len(page) < limit:
+            proven, reason = True, "exhausted"
+        else:
+            kth = float(np.sort(scores)[::-1][top_n - 1]) if len(scores) >= top_n else None
+            bound = float(page.bound[-1])
+            proven = kth is not None and round(bound + BOUND_SLACK, 4) < kth
+            reason = "bound" if proven else "cap"
+        if proven or fetched >= MATCH_MAX_CANDIDATES:
+            break
+        fetched_before, after = fetched, (bound, page.user_ids[-1])
+        limit = min(MATCH_MAX_CANDIDATES - fetched, fetched)
+
+    candidates = CandidateSet.concat(pages)
+    confidence = 1.0 if proven else None
+    if not proven and candidates.pool_size is not None:
+        top = _top_positions(scores, top_n)
+        new_hits = int((top >= fetched_before).sum())
+        unseen = max(candidates.pool_size - len(candidates), 0)
+        displaced = min(len(top), new_hits / (len(candidates) - fetched_before) * unseen)
+        confidence = round(1.0 - displaced / len(top), 4) if len(top) else 1.0
+    return candidates, {
+        "proven":     proven,
+        "reason":     reason,
+        "confidence": confidence,
+        "pages":      len(pages),
+        "scored":     len(candidates),
+        "pool_size":  candidates.pool_size,
+        "kth_score":  kth,
+        "bound":      round(bound, 4) if bound is not None else None,
+    }
 
-    Phase 1 (SQL):    VECTOR_COSINE_SIMILARITY scan, server-scoped, flag-filtered
-    Phase 2 (Python): compute_match() re-rank with clash/bonus rules
-    Phase 3:          Dangerous delta annotation + optional Gemini blurbs
 
-    Returns a JSON-serializable dict ready for the frontend.
+# ── Phase 1+2 Pushdown: Whole-pool Re-rank in the Warehouse ─────────────────
+
+# With pushdown, the storage backend scores every eligible user on the server
+# (WEIGHTED_RERANK_SCORE + generated clash/bonus SQL, see rerank_sql) and
+# returns only the top_n; Python then builds the breakdowns for those rows.
+MATCH_RERANK_PUSHDOWN = os.environ.get("MATCH_RERANK_PUSHDOWN", "0") == "1"
+PUSHDOWN_PARITY_TOLERANCE = 1e-4    # one unit in the 4th decimal (both sides are rounded)
+
+
+def _pushdown_candidates(user_vector: dict, server_id: str, user_id: str, context: str,
+                         top_n: int) -> tuple[CandidateSet, dict]:
+    """The exact top_n from the store, with a recall report shaped like _adaptive_candidates'."""
+    candidates = get_storage().reranked_candidates(user_vector["scores"], server_id, user_id, context, top_n)
+    return candidates, {
+        "proven":     True,
+        "reason":     "pushdown",
+        "confidence": 1.0,
+        "pages":      1,
+        "scored":     candidates.pool_size or 0,
+        "pool_size":  candidates.pool_size,
+        "kth_score":  None,
+        "bound":      None,
+    }
+
+
+def check_pushdown_parity(server_id: str, user_id: str, context: str = "hackathon",
+                          top_n: int = 10) -> dict:
     """
-    assert context in ("hackathon", "romantic", "friendship")
+    Check the pushdown re-rank against compute_match() for one user:
+      - every returned row's store-side score vs compute_match() on its scores_json;
+      - the returned top_n scores vs a Python re-rank of the whole server pool.
+    report["ok"] is True when both agree to PUSHDOWN_PARITY_TOLERANCE.
+    """
+    storage = get_storage()
+    query = storage.scores_for(server_id, [user_id]).get(user_id)
+    assert query is not None, f"No 50-dim scores for {user_id} on {server_id}"
+    query_vector = {"scores": query["scores"]}
+
+    pushed = storage.reranked_candidates(query["scores"], server_id, user_id, context, top_n)
+    stored = storage.scores_for(server_id, pushed.user_ids)
+    rows = [
+        {
+            "user_id":       uid,
+            "pushdown":      round(float(pushed.weighted[i]), 4),
+            "compute_match": compute_match(query_vector, {"scores": stored[uid]["scores"]}, context).score,
+        }
+        for i, uid in enumerate(pushed.user_ids)
+    ]
+    max_delta = max((abs(r["pushdown"] - r["compute_match"]) for r in rows), default=0.0)
 
-    ordered_vector = scores_to_vector(user_vector["scores"])
+    pool = storage.archetype_rows(server_id)
+    others = np.array([uid != user_id for uid in pool.user_ids], dtype=bool)
+    python_top = np.sort(compute_match_many(query_vector, pool.vectors[others], context).score)[::-1][:top_n]
+    pushdown_top = np.array([r["pushdown"] for r in rows])
+    same_top = len(python_top) == len(pushdown_top) and \
+        bool(np.all(np.abs(python_top - pushdown_top) <= PUSHDOWN_PARITY_TOLERANCE + 1e-9))
 
-    # Phase 1: Snowflake vector search — fetch 2x for re-ranking headroom
-    candidates = _fetch_candidates(
-        user_vector=ordered_vector,
-        server_id=server_id,
-        user_id=user_id,
-        limit=top_n * 2,
-    )
+    return {
+        "server_id":       server_id,
+        "user_id":         user_id,
+        "context":         context,
+        "top_n":           top_n,
+        "pool_size":       pushed.pool_size,
+        "rows":            rows,
+        "max_score_delta": round(max_delta, 6),
+        "python_top":      python_top.round(4).tolist(),
+        "same_top_n":      same_top,
+        "ok":              max_delta <= PUSHDOWN_PARITY_TOLERANCE + 1e-9 and same_top,
+    }
 
-    if not candidates:
-        return {
-            "user_id": user_id,
-            "context": context,
-            "server_id": server_id,
-            "matches": [],
-            "candidate_pool_size": 0,
-        }
 
+# ── Main API: get_matches() ─────────────────────────────────────────────────
+
+def _ranked_matches(
+    user_vector: dict,
+    candidates: CandidateSet,
+    context: str,
+    server_id: str,
+    top_n: int,
+    include_blurbs: bool = False,
+    api_key: Optional[str] = None,
+) -> list[dict]:
+    """
+    Phase 2 (compute_match() re-rank) and Phase 3 (dangerous deltas, optional
+    blurbs) over a CandidateSet; the best top_n as response match dicts.
+    """
     # Phase 2: Python re-ranking with full weighted scoring
-    ranked = _rerank_candidates(
+    final_matches = _rerank_candidates(
         query_vector_dict=user_vector,
         candidates=candidates,
         context=context,
         include_red_flags=True,
+        limit=top_n,
     )
 
-    final_matches = ranked[:top_n]
-
     # Phase 3: Annotate with dangerous deltas + optional blurbs
+    position = {uid: i for i, uid in enumerate(candidates.user_ids)}
+    evidence = {}
+    if include_blurbs and api_key:
+        evidence = _fetch_evidence(server_id, [m.user_id for m in final_matches])
     output = []
     for match in final_matches:
-        cand_row = next(c for c in candidates if c["USER_ID"] == match.user_id)
-        cand_scores = _parse_variant(cand_row["SCORES_JSON"])
+        row = position[match.user_id]
+        cand_scores = candidates.scores(row)
 
         dangerous = _detect_dangerous_deltas(
             user_vector["scores"], cand_scores, match.cosine_score
@@ -491,8 +676,7 @@ def get_matches(
         blurb = None
         if include_blurbs and api_key:
             try:
-                cand_evidence = _parse_variant(cand_row.get("EVIDENCE_JSON"))
-                cand_dict = _reconstruct_vector_dict(cand_scores, cand_evidence)
+                cand_dict = _reconstruct_vector_dict(cand_scores, evidence.get(match.user_id))
                 blurb = gemini_blurb(
                     user_vector, cand_dict, context, api_key=api_key
                 )
@@ -515,6 +699,73 @@ def get_matches(
             "blurb": blurb,
         })
 
+    return output
+
+
+def get_matches(
+    user_id: str,
+    user_vector: dict,
+    context: str,
+    server_id: str,
+    top_n: int = 10,
+    include_blurbs: bool = False,
+    api_key: Optional[str] = None,
+    pushdown: Optional[bool] = None,
+) -> dict:
+    """
+    Full matching pipeline.
+
+    Phase 1:          candidates by score_upper_bound from the server's
+                      CandidateIndex (or the warehouse), server-scoped,
+                      flag-filtered, in keyset pages until the top_n is
+                      proven (see "recall")
+    Phase 2 (Python): compute_match() re-rank with clash/bonus rules
+    Phase 3:          Dangerous delta annotation + optional Gemini blurbs
+                      (evidence is fetched for the final matches only, and
+                      only when blurbs are requested)
+
+    Without blurbs, a fresh precomputed result (see precompute_matches) is
+    returned instead, marked source="precomputed" with its computed_at.
+
+    pushdown=True (default: MATCH_RERANK_PUSHDOWN) replaces Phases 1-2 with
+    a whole-pool re-rank in the storage backend that returns just the top_n.
+
+    Returns a JSON-serializable dict ready for the frontend.
+    """
+    assert context in ("hackathon", "romantic", "friendship")
+
+    if pushdown is None:
+        pushdown = MATCH_RERANK_PUSHDOWN
+
+    # Precomputed matches, while fresh (blurbs are always generated live,
+    # an explicit pushdown=True always re-ranks in the warehouse)
+    if MATCH_PRECOMPUTE_ENABLED and CANDIDATE_INDEX_ENABLED and not include_blurbs and not pushdown:
+        served = _serve_precomputed(user_id, user_vector, context, server_id, top_n)
+        if served is not None:
+            return served
+
+    if pushdown:
+        # Phases 1-2 in the warehouse: exact top_n over the whole pool
+        candidates, recall = _pushdown_candidates(user_vector, server_id, user_id, context, top_n)
+    else:
+        # Phase 1: bound-ordered pages (in-process index, or Snowflake) until the top_n is proven
+        fetch = _index_candidates if CANDIDATE_INDEX_ENABLED else _fetch_candidates
+        candidates, recall = _adaptive_candidates(fetch, user_vector, server_id, user_id, context, top_n)
+
+    if len(candidates) == 0:
+        return {
+            "user_id": user_id,
+            "context": context,
+            "server_id": server_id,
+            "matches": [],
+            "candidate_pool_size": 0,
+            "recall": recall,
+        }
+
+    # Phase 2 + 3: re-rank, annotate, optional blurbs
+    output = _ranked_matches(user_vector, candidates, context, server_id,
+                             top_n, include_blurbs, api_key)
+
     _record_match_history(user_id, output, server_id, context)
 
     return {
@@ -522,7 +773,26 @@ def get_matches(
         "context": context,
         "server_id": server_id,
         "matches": output,
-        "candidate_pool_size": len(candidates),
+        "candidate_pool_size": recall["scored"],
+        "recall": recall,
+    }
+
+
+def _cortex_only_match(candidate: dict) -> dict:
+    return {
+        "user_id": candidate["auth0_id"],
+        "cosine_score": round(candidate["score"], 4),
+        "weighted_score": None,
+        "grade": None,
+        "dimension_scores": None,
+        "top_strengths": None,
+        "top_tensions": None,
+        "clash_penalties": None,
+        "bonuses": None,
+        "red_flags": None,
+        "dangerous_deltas": None,
+        "reputation_score": None,
+        "blurb": None,
     }
 
 
@@ -533,11 +803,17 @@ def get_matches_cortex(
     top_n: int = 10,
     include_blurbs: bool = False,
     api_key: Optional[str] = None,
+    rerank: bool = True,
 ) -> dict:
     """
-    Matching pipeline using Snowflake Cortex Search only (same vector comparison
-    as the frontend). No 50-dim data or Python re-rank; vector comparison is
-    entirely in Snowflake.
+    Matching pipeline using Snowflake Cortex Search for Phase 1 (same vector
+    comparison as the frontend).
+
+    rerank=False returns the Cortex results as-is (cosine only). rerank=True
+    (hybrid) over-fetches Cortex candidates, loads their 50-dim scores in one
+    batched query and runs the same compute_match_many() re-rank, red flags,
+    dangerous deltas and blurbs as get_matches(). Candidates without 50-dim
+    scores only fill in after the re-ranked ones, cosine-only.
     """
     assert context in ("hackathon", "romantic", "friendship")
 
@@ -552,30 +828,69 @@ def get_matches_cortex(
             "source": "cortex",
         }
 
-    candidates = _fetch_candidates_cortex(
-        user_vector_768=embedding,
-        server_id=server_id,
-        exclude_auth0_id=auth0_id,
-        limit=top_n,
+    if not rerank:
+        candidates = _fetch_candidates_cortex(
+            user_vector_768=embedding,
+            server_id=server_id,
+            exclude_auth0_id=auth0_id,
+            limit=top_n,
+        )
+        return {
+            "user_id": auth0_id,
+            "context": context,
+            "server_id": server_id,
+            "matches": [_cortex_only_match(c) for c in candidates],
+            "candidate_pool_size": len(candidates),
+            "source": "cortex",
+        }
+
+    # Phase 1: Cortex, over-fetched; grow the page once if too few were rankable
+    limit = _cortex_limit(server_id, top_n)
+    while True:
+        candidates = _fetch_candidates_cortex(
+            user_vector_768=embedding,
+            server_id=server_id,
+            exclude_auth0_id=auth0_id,
+            limit=limit,
+        )
+        lookup = _fetch_scores_for(server_id, [auth0_id] + [c["auth0_id"] for c in candidates])
+        usable = [c for c in candidates if lookup.get(c["auth0_id"], {}).get("eligible")]
+        _observe_cortex_usable(server_id, len(usable), len(candidates))
+        if len(usable) >= top_n or len(candidates) < limit or limit >= CORTEX_MAX_CANDIDATES:
+            break
+        limit = min(CORTEX_MAX_CANDIDATES, 2 * limit)
+
+    own = lookup.get(auth0_id)
+    if own is None:
+        # No 50-dim profile for the query user: nothing to re-rank against
+        return {
+            "user_id": auth0_id,
+            "context": context,
+            "server_id": server_id,
+            "matches": [_cortex_only_match(c) for c in candidates[:top_n]],
+            "candidate_pool_size": len(candidates),
+            "source": "cortex",
+        }
+
+    user_vector = {"scores": own["scores"], "evidence": {}}
+    ranked = CandidateSet(
+        user_ids=[c["auth0_id"] for c in usable],
+        cosine=np.array([c["score"] for c in usable], dtype=np.float64),
+        vectors=np.array(
+            [scores_to_vector(lookup[c["auth0_id"]]["scores"]) for c in usable], dtype=np.float64
+        ).reshape(len(usable), len(DIMENSION_ORDER)),
+        reputation=np.array([lookup[c["auth0_id"]]["reputation"] for c in usable], dtype=np.float64),
     )
 
+    # Phase 2 + 3: same re-rank and annotation as get_matches()
     output = []
-    for c in candidates:
-        output.append({
-            "user_id": c["auth0_id"],
-            "cosine_score": round(c["score"], 4),
-            "weighted_score": None,
-            "grade": None,
-            "dimension_scores": None,
-            "top_strengths": None,
-            "top_tensions": None,
-            "clash_penalties": None,
-            "bonuses": None,
-            "red_flags": None,
-            "dangerous_deltas": None,
-            "reputation_score": None,
-            "blurb": None,
-        })
+    if len(ranked):
+        output = _ranked_matches(user_vector, ranked, context, server_id,
+                                 top_n, include_blurbs, api_key)
+        _record_match_history(auth0_id, output, server_id, context)
+
+    unscored = [c for c in candidates if c["auth0_id"] not in lookup]
+    output += [_cortex_only_match(c) for c in unscored[:top_n - len(output)]]
 
     return {
         "user_id": auth0_id,
@@ -583,50 +898,269 @@ def get_matches_cortex(
         "server_id": server_id,
         "matches": output,
         "candidate_pool_size": len(candidates),
-        "source": "cortex",
+        "reranked": len(usable),
+        "cortex_limit": limit,
+        "source": "cortex+rerank",
+    }
+
+
+# ── Precomputed Matches ─────────────────────────────────────────────────────
+
+# A background refresher precomputes top-N matches for every user of each
+# server the candidate index holds, in all three contexts, from one snapshot
+# of the index. get_matches() serves those while they are younger than
+# MATCH_STORE_MAX_AGE_SECONDS (and were computed for the caller's vector).
+MATCH_PRECOMPUTE_ENABLED = os.environ.get("MATCH_PRECOMPUTE_ENABLED", "0") == "1"
+MATCH_PRECOMPUTE_TOP_N = int(os.environ.get("MATCH_PRECOMPUTE_TOP_N", "10"))
+MATCH_PRECOMPUTE_INTERVAL_SECONDS = float(os.environ.get("MATCH_PRECOMPUTE_INTERVAL_SECONDS", "600"))
+MATCH_PRECOMPUTE_WORKERS = int(os.environ.get("MATCH_PRECOMPUTE_WORKERS", "4"))
+MATCH_STORE_MAX_AGE_SECONDS = float(os.environ.get("MATCH_STORE_MAX_AGE_SECONDS", "900"))
+
+_match_store = MatchStore(max_age=MATCH_STORE_MAX_AGE_SECONDS)
+_precompute_thread: Optional[threading.Thread] = None
+_precompute_lock = threading.Lock()
+
+
+def _precompute_user(
+    i: int,
+    ids: list[str],
+    vectors: np.ndarray,
+    unit: np.ndarray,
+    reputation: np.ndarray,
+    server_id: str,
+    top_n: int,
+) -> dict[str, dict]:
+    """One user's entries for every context: {context: entry}."""
+    cosine = unit @ unit[i]
+    cosine[i] = -np.inf
+    user_vector = {"scores": dict(zip(DIMENSION_ORDER, vectors[i].tolist())), "evidence": {}}
+    computed_at = time.time()
+    entries = {}
+    for context in CONTEXTS:
+        score = compute_match_many(vectors[i], vectors, context).score
+        score[i] = -np.inf
+        # Weighted score first, ties in cosine order like the live path
+        top = np.lexsort((-cosine, -score))[:top_n + 1]
+        top = top[top != i][:top_n]
+        candidates = CandidateSet(
+            user_ids=[ids[j] for j in top.tolist()],
+            cosine=cosine[top].astype(np.float64),
+            vectors=vectors[top],
+            reputation=reputation[top],
+        )
+        entries[context] = {
+            "matches":     _ranked_matches(user_vector, candidates, context, server_id, top_n),
+            "vector":      vectors[i],
+            "complete":    len(top) == len(ids) - 1,
+            "computed_at": computed_at,
+        }
+    return entries
+
+
+def precompute_matches(
+    server_id: str,
+    top_n: int = MATCH_PRECOMPUTE_TOP_N,
+    workers: int = MATCH_PRECOMPUTE_WORKERS,
+) -> dict:
+    """
+    Batch job: top_n matches for every eligible user of a server in every
+    context, scored against one snapshot of the server's CandidateIndex
+    (users split across `workers` threads), then swapped into the store.
+    """
+    started = time.time()
+    index = _candidate_index(server_id)
+    with index.lock:
+        ids, vectors, unit, reputation = index.snapshot()
+
+    def run(chunk: range) -> dict[str, dict]:
+        return {ids[i]: _precompute_user(i, ids, vectors, unit, reputation, server_id, top_n)
+                for i in chunk}
+
+    step = max(1, -(-len(ids) // max(1, workers)))
+    chunks = [range(start, min(start + step, len(ids))) for start in range(0, len(ids), step)]
+    entries: dict[str, dict] = {}
+    if len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="match-precompute") as pool:
+            for part in pool.map(run, chunks):
+                entries.update(part)
+    else:
+        for chunk in chunks:
+            entries.update(run(chunk))
+
+    report = {
+        "server_id":       server_id,
+        "users":           len(ids),
+        "top_n":           top_n,
+        "started_at":      started,
+        "elapsed_seconds": round(time.time() - started, 3),
+    }
+    _match_store.replace_server(server_id, entries, report)
+    return report
+
+
+def _refresh_precomputed() -> None:
+    """Refresher thread: re-run precompute_matches() for each indexed server once due."""
+    while True:
+        with _candidate_indexes_lock:
+            servers = list(_candidate_indexes)
+        for server_id in servers:
+            last = _match_store.last_refresh(server_id)
+            if last is not None and time.time() - last["started_at"] < MATCH_PRECOMPUTE_INTERVAL_SECONDS:
+                continue
+            try:
+                precompute_matches(server_id)
+            except Exception as e:
+                logger.warning("Match precompute failed for %s: %s", server_id, e)
+        time.sleep(CANDIDATE_INDEX_POLL_SECONDS)
+
+
+def _start_precompute() -> None:
+    global _precompute_thread
+    if not MATCH_PRECOMPUTE_ENABLED:
+        return
+    with _precompute_lock:
+        if _precompute_thread is not None:
+            return
+        _precompute_thread = threading.Thread(
+            target=_refresh_precomputed, name="match-precompute", daemon=True
+        )
+    _precompute_thread.start()
+
+
+def _serve_precomputed(user_id: str, user_vector: dict, context: str, server_id: str,
+                       top_n: int) -> Optional[dict]:
+    # Compared as stored (float32, snapped back like the snapshot's vectors)
+    stored = stored_scores(np.asarray(scores_to_vector(user_vector["scores"]), dtype=np.float32))
+    entry = _match_store.get(server_id, user_id, context, stored, top_n)
+    if entry is None:
+        return None
+    # Only users still in the server's index (i.e. still eligible): someone
+    # flagged after the refresh started may be back in the swapped-in lists
+    with _candidate_indexes_lock:
+        index = _candidate_indexes.get(server_id)
+    matches = [m for m in entry["matches"] if index is not None and m["user_id"] in index]
+    if len(matches) < top_n and not entry["complete"]:
+        return None
+    output = matches[:top_n]
+    _record_match_history(user_id, output, server_id, context)
+    return {
+        "user_id": user_id,
+        "context": context,
+        "server_id": server_id,
+        "matches": output,
+        "candidate_pool_size": (_match_store.last_refresh(server_id) or {}).get("users", 0) - 1,
+        "recall": {"proven": True, "reason": "precomputed", "confidence": 1.0},
+        "source": "precomputed",
+        "computed_at": entry["computed_at"],
+        "age_seconds": round(time.time() - entry["computed_at"], 1),
     }
 
 
 # ── Group Match (Snowflake-accelerated) ─────────────────────────────────────
 
+# Per-server team search state, kept current by upsert_archetype() and
+# increment_abandonment() and rebuilt from Snowflake once it is this old
+# (catches writes from other processes, e.g. the reputation sync worker).
+TEAM_STATE_TTL_SECONDS = float(os.environ.get("TEAM_STATE_TTL_SECONDS", "300"))
+
+_team_states: dict[str, TeamSearchState] = {}
+_team_states_lock = threading.Lock()            # guards the two dicts only
+_team_state_builds: dict[str, threading.Lock] = {}  # one build at a time per server
+
+
+def _active_group_pool(server_id: str) -> tuple[list[str], list[dict]]:
+    """(user_ids, vectors) of a server's active users, best reputation first."""
+    names, vectors = get_storage().group_pool(server_id)
+    return names, [{"scores": vector_to_scores(row), "evidence": {}} for row in vectors.tolist()]
+
+
+def _fresh_team_state(server_id: str) -> Optional[TeamSearchState]:
+    with _team_states_lock:
+        state = _team_states.get(server_id)
+    if state is None or time.time() - state.built_at > TEAM_STATE_TTL_SECONDS:
+        return None
+    return state
+
+
+def _team_state(server_id: str) -> TeamSearchState:
+    """
+    The server's TeamSearchState, built from Snowflake if missing or stale.
+    The pool query and the O(n²) matrix are built under that server's own
+    build lock, so other servers' requests don't wait for them; concurrent
+    callers for the same server wait for the one build and share it.
+    """
+    state = _fresh_team_state(server_id)
+    if state is not None:
+        return state
+    with _team_states_lock:
+        build_lock = _team_state_builds.setdefault(server_id, threading.Lock())
+    with build_lock:
+        state = _fresh_team_state(server_id)
+        if state is None:
+            names, vectors = _active_group_pool(server_id)
+            state = TeamSearchState(names, vectors, "hackathon")
+            with _team_states_lock:
+                _team_states[server_id] = state
+        return state
+
+
+def _update_team_state(server_id: str, user_id: str, vector_dict: dict | None) -> None:
+    """Apply one user's change to a cached server state (vector_dict=None removes them)."""
+    state = _team_states.get(server_id)
+    if state is None:
+        return
+    with state.lock:
+        if vector_dict is None:
+            state.remove(user_id)
+        else:
+            state.upsert(user_id, vector_dict)
+
+
 def get_group_match(
     server_id: str,
     team_size: int = 4,
+    mode: str = "exhaustive",
+    objective: str = "total",
+    control: Optional[SearchControl] = None,
 ) -> dict:
     """
     Find optimal hackathon teams from all active users in a server.
     Pulls vectors from Snowflake, then uses the Python group_match()
-    for full weighted scoring with role coverage.
-    """
-    conn = _get_connection()
-    try:
-        cur = conn.cursor(snowflake.connector.DictCursor)
-        cur.execute(
-            """
-            SELECT user_id, scores_json, evidence_json
-            FROM USER_ARCHETYPES
-            WHERE server_id = %(sid)s
-              AND status = 'active'
-              AND abandonment_count < 3
-            ORDER BY reputation_score DESC
-            """,
-            {"sid": server_id},
-        )
-        rows = cur.fetchall()
-
-        if len(rows) < team_size:
-            return {"error": f"Need at least {team_size} active users, found {len(rows)}"}
-
-        vectors = []
-        names = []
-        for row in rows:
-            scores = _parse_variant(row["SCORES_JSON"])
-            vectors.append({"scores": scores, "evidence": {}})
-            names.append(row["USER_ID"])
-
-        return group_match(vectors, names, team_size)
-    finally:
-        conn.close()
+    for full weighted scoring with role coverage. mode="exhaustive" scores
+    every combination (sharded across TEAM_SEARCH_WORKERS processes); use
+    mode="exact" for mid-sized servers and mode="heuristic" for very large
+    ones; mode="partition" places every active user in a team (see partition_teams).
+
+    The server's pairwise matrix and best teams live in a TeamSearchState
+    that joins, upserts and flags update incrementally, so repeat calls
+    only redo the work those changes require. `control` (see team_jobs)
+    reports progress and can cancel or time-box the search.
+    """
+    assert mode in GROUP_MODES, f"Invalid mode: {mode}. Choose from {GROUP_MODES}"
+    state = _team_state(server_id)
+    exact = mode == "exact"
+    # Only the snapshot is taken under the lock: a search can run for minutes,
+    # and upsert_archetype() / increment_abandonment() update the same state
+    with state.lock:
+        if len(state) < team_size:
+            return {"error": f"Need at least {team_size} active users, found {len(state)}"}
+        if mode in ("exact", "heuristic") and not state.needs_search(team_size, exact=exact):
+            scored, search = state.top_teams(team_size, exact=exact, control=control)
+            return team_report(state.vector_dicts, state.ids, state.matrix, scored, search)
+        snapshot = state.snapshot()
+
+    if mode == "partition":
+        return partition_teams(snapshot.vector_dicts, snapshot.ids, team_size, objective,
+                               matrix=snapshot.matrix, control=control)
+    if control is not None:
+        control.labels = snapshot.ids
+    if mode == "exhaustive":
+        scored, search = search_teams(snapshot.matrix, team_size, "exhaustive", control=control)
+    else:
+        scored, search = snapshot.top_teams(team_size, exact=exact, control=control)
+        with state.lock:
+            state.adopt(snapshot, team_size)
+    return team_report(snapshot.vector_dicts, snapshot.ids, snapshot.matrix, scored, search)
 
 
 # ── Match History Recording ─────────────────────────────────────────────────
@@ -637,62 +1171,19 @@ def _record_match_history(
     server_id: str,
     context: str,
 ) -> None:
-    """Batch-insert match results into MATCH_HISTORY for analytics."""
-    conn = _get_connection()
-    try:
-        cur = conn.cursor()
-        for m in matches:
-            cur.execute(
-                """
-                INSERT INTO MATCH_HISTORY (
-                    user_a_id, user_b_id, server_id, context,
-                    cosine_score, weighted_score, grade,
-                    red_flags_json, blurb_json
-                ) VALUES (
-                    %(a)s, %(b)s, %(sid)s, %(ctx)s,
-                    %(cos)s, %(ws)s, %(g)s,
-                    PARSE_JSON(%(rf)s), PARSE_JSON(%(bl)s)
-                )
-                """,
-                {
-                    "a": user_id,
-                    "b": m["user_id"],
-                    "sid": server_id,
-                    "ctx": context,
-                    "cos": m["cosine_score"],
-                    "ws": m["weighted_score"],
-                    "g": m["grade"],
-                    "rf": json.dumps(m.get("red_flags")),
-                    "bl": json.dumps(m.get("blurb")),
-                },
-            )
-        conn.commit()
-    except Exception as e:
-        logger.error("Failed to record match history: %s", e)
-    finally:
-        conn.close()
+    """Queue match results for MATCH_HISTORY; the write-behind writer batches the INSERTs."""
+    get_history_writer().enqueue([history_row(user_id, m, server_id, context) for m in matches])
 
 
 # ── Abandonment Tracking ────────────────────────────────────────────────────
 
 def increment_abandonment(user_id: str, server_id: str) -> None:
     """Increment abandonment counter. Auto-flags user at threshold (>= 3)."""
-    conn = _get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            UPDATE USER_ARCHETYPES
-            SET abandonment_count = abandonment_count + 1,
-                status = CASE
-                    WHEN abandonment_count + 1 >= 3 THEN 'flagged'
-                    ELSE status
-                END,
-                updated_at = CURRENT_TIMESTAMP()
-            WHERE user_id = %(uid)s AND server_id = %(sid)s
-            """,
-            {"uid": user_id, "sid": server_id},
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    storage = get_storage()
+    storage.increment_abandonment(user_id, server_id)
+
+    if not storage.is_eligible(user_id, server_id):
+        _match_store.evict(server_id, user_id)
+        if server_id in _team_states or server_id in _candidate_indexes:
+            _update_team_state(server_id, user_id, None)
+            _update_candidate_index(server_id, user_id, None)
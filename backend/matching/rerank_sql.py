@@ -0,0 +1,276 @@
+"""
+rerank_sql.py
+=============
+The /v2/match re-rank as Snowflake SQL, generated from matching.py's config.
+
+pushdown_query(context) scores every eligible member of a server (its
+SERVER_MEMBERSHIPS joined to USER_VECTORS) inside the warehouse and returns
+only the best `top_n` rows:
+
+  base  = WEIGHTED_RERANK_SCORE(query scores, candidate scores, context)
+          (the schema's UDF over DIMENSION_INDEX)
+  clash = CLASH_RULES active in the context, one CASE term per rule
+  bonus = BONUS_RULES active in the context, likewise
+  final = LEAST(1, GREATEST(0, base + clash + bonus))
+
+Rows are ordered by the final score rounded to 4 dp, then cosine — the
+order get_matches() produces in Python.
+
+bound_query(context) pages through the same pool by score_upper_bound()
+(base + bonus, no clash terms) for get_matches()' non-pushdown path, keyed
+on (score_bound, user_id) so each page starts after the previous one. The rule terms are compiled from
+the ScoringPlan's RuleSets on every call, so rebuild_scoring_plans() edits
+flow straight through; DIMENSION_INDEX has to be kept in step with
+VARIABLE_CONFIG by hand (check_pushdown_parity() catches drift).
+
+check_rules_parity() checks the generated rule terms offline: it runs them
+through sqlite (scores_json lookups rewritten to json_extract) for random
+score pairs and compares them with the ScoringPlan's clash and bonus totals.
+
+Parity checks from the command line:
+
+    python rerank_sql.py <server_id> <user_id> [context] [top_n]   # against Snowflake
+    python rerank_sql.py --rules [samples]                          # offline, rule terms only
+"""
+
+import re
+import sys
+import json
+import random
+import sqlite3
+
+import numpy as np
+
+from matching import CONTEXTS, DIMENSION_ORDER, compute_match, get_plan, RuleSet
+
+_VARIABLE = re.compile(r"^[a-z_]+$")
+
+
+def _score(alias: str, variable: str) -> str:
+    """One variable from a scores_json VARIANT, 0.5 when missing (like scores.get(var, 0.5))."""
+    assert _VARIABLE.match(variable), f"Unsafe variable name for SQL: {variable!r}"
+    return f"COALESCE({alias}['{variable}']::FLOAT, 0.5)"
+
+
+def _compare(value: str, greater: bool, threshold: float) -> str:
+    return f"{value} {'>' if greater else '<'} {threshold!r}"
+
+
+def rules_sql(rules: RuleSet, variables: list[str], a: str, b: str) -> str:
+    """
+    Sum of a RuleSet's fired amounts as one SQL expression, terms added in
+    rule order. `a` / `b` are the query and candidate scores_json aliases.
+    """
+    terms = []
+    for _, col_a, a_greater, thresh_a, col_b, b_greater, thresh_b, is_gap, amount in rules.rules:
+        if amount == 0.0:
+            continue
+        val_a, val_b = _score(a, variables[col_a]), _score(b, variables[col_b])
+        if is_gap:
+            fired = f"ABS({val_a} - {val_b}) >= {thresh_a!r}"
+        else:
+            fired = f"{_compare(val_a, a_greater, thresh_a)} AND {_compare(val_b, b_greater, thresh_b)}"
+        terms.append(f"CASE WHEN {fired} THEN {amount!r} ELSE 0.0 END")
+    return "(" + "\n                 + ".join(terms) + ")" if terms else "0.0"
+
+
+def final_score_sql(context: str, a: str = "q.scores", b: str = "uv.scores_json") -> str:
+    """compute_match()'s final score for (a, b) in `context` as a SQL expression."""
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    plan = get_plan(context)
+    return (
+        f"LEAST(1.0, GREATEST(0.0,\n"
+        f"                WEIGHTED_RERANK_SCORE({a}, {b}, '{context}')\n"
+        f"                + {rules_sql(plan.clash, DIMENSION_ORDER, a, b)}\n"
+        f"                + {rules_sql(plan.bonus, DIMENSION_ORDER, a, b)}\n"
+        f"            ))"
+    )
+
+
+def bound_score_sql(context: str, a: str = "q.scores", b: str = "uv.scores_json") -> str:
+    """score_upper_bound() for (a, b) in `context` as a SQL expression."""
+    assert context in CONTEXTS, f"Invalid context: {context}"
+    plan = get_plan(context)
+    return (
+        f"LEAST(1.0, GREATEST(0.0,\n"
+        f"                WEIGHTED_RERANK_SCORE({a}, {b}, '{context}')\n"
+        f"                + {rules_sql(plan.bonus, DIMENSION_ORDER, a, b)}\n"
+        f"            ))"
+    )
+
+
+def bound_query(context: str) -> str:
+    """
+    One page of the bound-ordered pool. Parameters: query_scores (JSON
+    object), query_vec (JSON array in DIMENSION_ORDER), server_id, user_id,
+    lim, and the previous page's last (after_bound, after_user) — both NULL
+    for the first page.
+    """
+    return f"""
+        WITH q AS (SELECT PARSE_JSON(%(query_scores)s) AS scores),
+        pool AS (
+            SELECT
+                m.user_id,
+                uv.archetype_vector,
+                uv.reputation_score,
+                {bound_score_sql(context)} AS score_bound
+            FROM SERVER_MEMBERSHIPS m
+            JOIN USER_VECTORS uv
+              ON uv.user_id = m.user_id AND uv.archetype_vector IS NOT NULL
+            CROSS JOIN q
+            WHERE m.server_id = %(server_id)s
+              AND m.user_id != %(user_id)s
+              AND m.status = 'active'
+              AND m.abandonment_count < 3
+        )
+        SELECT
+            user_id,
+            VECTOR_COSINE_SIMILARITY(
+                archetype_vector,
+                PARSE_JSON(%(query_vec)s)::VECTOR(FLOAT, 50)
+            ) AS cosine_score,
+            archetype_vector,
+            reputation_score,
+            score_bound,
+            (SELECT COUNT(*) FROM pool) AS pool_size
+        FROM pool
+        WHERE %(after_bound)s IS NULL
+           OR score_bound < %(after_bound)s
+           OR (score_bound = %(after_bound)s AND user_id > %(after_user)s)
+        ORDER BY score_bound DESC, user_id
+        LIMIT %(lim)s
+    """
+
+
+def pushdown_query(context: str) -> str:
+    """
+    The full pushdown statement. Parameters: query_scores (JSON object),
+    query_vec (JSON array in DIMENSION_ORDER), server_id, user_id, lim.
+    """
+    return f"""
+        WITH q AS (SELECT PARSE_JSON(%(query_scores)s) AS scores),
+        scored AS (
+            SELECT
+                m.user_id,
+                VECTOR_COSINE_SIMILARITY(
+                    uv.archetype_vector,
+                    PARSE_JSON(%(query_vec)s)::VECTOR(FLOAT, 50)
+                ) AS cosine_score,
+                uv.archetype_vector,
+                uv.reputation_score,
+                {final_score_sql(context)} AS weighted_score
+            FROM SERVER_MEMBERSHIPS m
+            JOIN USER_VECTORS uv
+              ON uv.user_id = m.user_id AND uv.archetype_vector IS NOT NULL
+            CROSS JOIN q
+            WHERE m.server_id = %(server_id)s
+              AND m.user_id != %(user_id)s
+              AND m.status = 'active'
+              AND m.abandonment_count < 3
+        )
+        SELECT user_id, cosine_score, archetype_vector, reputation_score, weighted_score,
+               COUNT(*) OVER () AS pool_size
+        FROM scored
+        ORDER BY ROUND(weighted_score, 4) DESC, cosine_score DESC
+        LIMIT %(lim)s
+    """
+
+
+# ── OFFLINE PARITY ────────────────────────────────────────────────────────────
+
+_SCORE_LOOKUP = re.compile(r"COALESCE\((\w+)\['([a-z_]+)'\]::FLOAT, 0\.5\)")
+
+# Slack for the two sides summing the same amounts in different precision
+RULES_PARITY_TOLERANCE = 1e-9
+
+
+def _sqlite_sql(expression: str) -> str:
+    """A rules_sql() expression over sqlite JSON text columns instead of VARIANTs."""
+    rewritten = _SCORE_LOOKUP.sub(r"COALESCE(json_extract(\1, '$.\2'), 0.5)", expression)
+    assert "::" not in rewritten and "[" not in rewritten, f"Untranslated SQL: {rewritten}"
+    return rewritten
+
+
+def _random_scores(rng: random.Random, thresholds: list[float]) -> dict:
+    """
+    A scores dict with some variables missing (0.5 in both SQL and Python)
+    and some sitting exactly on a rule threshold, where > / < / >= matter.
+    """
+    scores = {}
+    for var in DIMENSION_ORDER:
+        roll = rng.random()
+        if roll < 0.1:
+            continue
+        scores[var] = rng.choice(thresholds) if roll < 0.3 and thresholds else round(rng.random(), 6)
+    return scores
+
+
+def check_rules_parity(samples: int = 500, seed: int = 0) -> dict:
+    """
+    Evaluate rules_sql() for every context's clash and bonus RuleSet on
+    `samples` random score pairs in sqlite, and compare each with
+      - the vectorized RuleSet.total(RuleSet.hits()) that compute_match_many()
+        and score_upper_bound() use, and
+      - the clash_penalties / bonuses compute_match() reports (the scalar
+        RuleSet.fired() walk of the same rule tuples).
+    report["ok"] is True when all three agree for every pair.
+    """
+    rng = random.Random(seed)
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE pairs (id INTEGER, a TEXT, b TEXT)")
+
+    report = {"samples": samples, "contexts": {}, "ok": True}
+    for context in CONTEXTS:
+        plan = get_plan(context)
+        thresholds = sorted({t for rules in (plan.clash, plan.bonus)
+                             for rule in rules.rules for t in (rule[3], rule[6])})
+        pairs = [(_random_scores(rng, thresholds), _random_scores(rng, thresholds)) for _ in range(samples)]
+        db.execute("DELETE FROM pairs")
+        db.executemany("INSERT INTO pairs VALUES (?, ?, ?)",
+                       [(i, json.dumps(a), json.dumps(b)) for i, (a, b) in enumerate(pairs)])
+
+        a = np.array([[sa.get(v, 0.5) for v in DIMENSION_ORDER] for sa, _ in pairs])
+        b = np.array([[sb.get(v, 0.5) for v in DIMENSION_ORDER] for _, sb in pairs])
+        results = [compute_match({"scores": sa}, {"scores": sb}, context) for sa, sb in pairs]
+        scalar = {
+            "clash": np.array([sum(h["penalty"] for h in r.clash_penalties) for r in results]),
+            "bonus": np.array([sum(h["bonus"] for h in r.bonuses) for r in results]),
+        }
+
+        for kind, rules in (("clash", plan.clash), ("bonus", plan.bonus)):
+            expression = _sqlite_sql(rules_sql(rules, DIMENSION_ORDER, "a", "b"))
+            in_sql = np.array([row[0] for row in db.execute(f"SELECT {expression} FROM pairs ORDER BY id")])
+            vectorized = rules.total(rules.hits(a, b))
+            delta = max(float(np.abs(in_sql - vectorized).max(initial=0.0)),
+                        float(np.abs(in_sql - scalar[kind]).max(initial=0.0)))
+            fired = int(np.count_nonzero(in_sql))
+            ok = delta <= RULES_PARITY_TOLERANCE
+            report["contexts"].setdefault(context, {})[kind] = {
+                "rules": len(rules.rules), "pairs_fired": fired, "max_delta": delta, "ok": ok,
+            }
+            report["ok"] = report["ok"] and ok
+    db.close()
+    return report
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--rules":
+        report = check_rules_parity(int(sys.argv[2]) if len(sys.argv) > 2 else 500)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["ok"] else 1)
+
+    from matching_engine import check_pushdown_parity
+
+    if len(sys.argv) < 3:
+        print("Usage: python rerank_sql.py <server_id> <user_id> [context] [top_n]")
+        print("       python rerank_sql.py --rules [samples]")
+        sys.exit(1)
+    server, user = sys.argv[1], sys.argv[2]
+    ctx = sys.argv[3] if len(sys.argv) > 3 else "hackathon"
+    n = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+
+    report = check_pushdown_parity(server, user, ctx, n)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
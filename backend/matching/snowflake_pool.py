@@ -0,0 +1,210 @@
+"""
+snowflake_pool.py
+=================
+Bounded, thread-safe Snowflake connection pool shared by matching_engine
+and the workers.
+
+A snowflake.connector.connect() handshake costs hundreds of milliseconds;
+the pool keeps authenticated sessions open and hands them out again.
+
+  - At most `max_size` connections exist; callers beyond that wait up to
+    `timeout` seconds for one to be returned.
+  - Idle connections are reused most-recently-used first and closed once
+    idle longer than `max_idle`.
+  - A connection idle longer than `health_check_after` is pinged with
+    SELECT 1 before reuse and replaced if the ping fails.
+
+get_connection() returns a PooledConnection: use it exactly like a
+connector connection — close() puts it back in the pool instead of
+closing the session.
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+import snowflake.connector
+
+logger = logging.getLogger(__name__)
+
+SNOWFLAKE_POOL_SIZE = int(os.environ.get("SNOWFLAKE_POOL_SIZE", "8"))
+SNOWFLAKE_POOL_MAX_IDLE_SECONDS = float(os.environ.get("SNOWFLAKE_POOL_MAX_IDLE_SECONDS", "600"))
+SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS = float(os.environ.get("SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS", "60"))
+SNOWFLAKE_POOL_TIMEOUT_SECONDS = float(os.environ.get("SNOWFLAKE_POOL_TIMEOUT_SECONDS", "30"))
+
+
+def connect_from_env() -> snowflake.connector.SnowflakeConnection:
+    """Open a new Snowflake session from the SNOWFLAKE_* env vars."""
+    return snowflake.connector.connect(
+        account=os.environ["SNOWFLAKE_ACCOUNT"],
+        user=os.environ["SNOWFLAKE_USER"],
+        password=os.environ["SNOWFLAKE_PASSWORD"],
+        warehouse=os.environ.get("SNOWFLAKE_WAREHOUSE", "MIRROR_WH"),
+        database=os.environ.get("SNOWFLAKE_DATABASE", "MIRROR"),
+        schema=os.environ.get("SNOWFLAKE_SCHEMA", "MATCHING"),
+        role=os.environ.get("SNOWFLAKE_ROLE", "MIRROR_APP_ROLE"),
+        client_session_keep_alive=True,
+    )
+
+
+# ── POOL ──────────────────────────────────────────────────────────────────────
+
+class PooledConnection:
+    """A borrowed connection. close() (or leaving a `with` block) returns it to the pool."""
+
+    def __init__(self, pool: "ConnectionPool", conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise RuntimeError("Connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable = connect_from_env,
+        max_size: int = SNOWFLAKE_POOL_SIZE,
+        max_idle: float = SNOWFLAKE_POOL_MAX_IDLE_SECONDS,
+        health_check_after: float = SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS,
+        timeout: float = SNOWFLAKE_POOL_TIMEOUT_SECONDS,
+    ):
+        assert max_size >= 1, "max_size must be at least 1"
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self._idle: deque = deque()     # (conn, returned_at), most recent on the right
+        self._size = 0                  # open connections, idle + borrowed
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+    def _evict_idle(self, now: float) -> list:
+        """Drop idle connections past max_idle (oldest sit on the left). Call with the lock held."""
+        expired = []
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+        return expired
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn) -> bool:
+        try:
+            if conn.is_closed():
+                return False
+            conn.cursor().execute("SELECT 1").fetchone()
+            return True
+        except Exception as e:
+            logger.warning("Dropping unhealthy Snowflake connection: %s", e)
+            return False
+
+    def acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                reuse, create = None, False
+                if self._idle:
+                    reuse, returned_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                else:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise TimeoutError(f"No Snowflake connection free after {self.timeout}s")
+                    self._cond.wait(remaining)
+            for conn in expired:
+                self._close_quietly(conn)
+
+            if create:
+                try:
+                    return PooledConnection(self, self._connect())
+                except Exception:
+                    self._discard()
+                    raise
+            if reuse is not None:
+                if now - returned_at <= self.health_check_after or self._healthy(reuse):
+                    return PooledConnection(self, reuse)
+                self._close_quietly(reuse)
+                self._discard()
+
+    def release(self, conn) -> None:
+        try:
+            closed = conn.is_closed()
+        except Exception:
+            closed = True
+        with self._cond:
+            if closed or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if closed or self._closed:
+            self._close_quietly(conn)
+
+    def _discard(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Close every idle connection; borrowed ones close when returned."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+# ── SHARED POOL ───────────────────────────────────────────────────────────────
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """The process-wide pool, created on first use and closed at exit."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def get_connection() -> PooledConnection:
+    return get_pool().acquire()
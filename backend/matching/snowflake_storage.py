@@ -0,0 +1,684 @@
+"""
+snowflake_storage.py
+====================
+MatchStorage over the production Snowflake tables (see storage.py): one
+USER_VECTORS row per user, joined to SERVER_MEMBERSHIPS for every per-server
+read (migrations/002_user_vectors.sql).
+
+Every method borrows a pooled session (snowflake_pool) and hands it back.
+Result sets that carry vectors are read as Arrow batches and decoded
+straight into numpy arrays; MATCH_HISTORY rows go in as multi-row
+INSERT ... SELECT ... FROM VALUES statements (PARSE_JSON can't appear in a
+plain VALUES list, so the JSON columns are parsed in the SELECT).
+"""
+
+import os
+import json
+import tempfile
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from matching import DIMENSION_ORDER
+from candidate_index import CandidateSet, stored_scores
+from history_writer import HISTORY_COLUMNS
+from snowflake_pool import PooledConnection, get_connection
+from storage import ABANDONMENT_LIMIT, ArchetypeRows, MatchStorage
+from rerank_sql import bound_query, pushdown_query
+
+CORTEX_SERVICE = os.environ.get("CORTEX_SEARCH_SERVICE_NAME", "ARCHETYPE_MATCH_SERVICE")
+CORTEX_VECTOR_INDEX = os.environ.get("CORTEX_SEARCH_VECTOR_INDEX", "embedding_768")
+VECTOR_DIM_768 = 768
+
+# Rows per INSERT statement (Snowflake caps a VALUES list at 16,384 rows)
+INSERT_CHUNK_ROWS = 1000
+_JSON_COLUMNS = {"red_flags_json", "blurb_json"}
+
+# A server's archetypes: its SERVER_MEMBERSHIPS rows joined to each member's one
+# USER_VECTORS row (users with only a Cortex embedding have no 50-dim vector
+# yet and are left out). A joined row has changed when either side has.
+MEMBERS = """SERVER_MEMBERSHIPS m
+            JOIN USER_VECTORS uv
+              ON uv.user_id = m.user_id AND uv.archetype_vector IS NOT NULL"""
+MEMBER_UPDATED_AT = "GREATEST(uv.updated_at, m.updated_at)"
+ELIGIBLE = f"m.status = 'active' AND m.abandonment_count < {ABANDONMENT_LIMIT}"
+
+# bulk_upsert_archetypes(): batches up to this many rows MERGE straight from
+# a multi-row VALUES list (statement text stays well under Snowflake's 1 MB);
+# bigger ones are PUT to the ARCHETYPE_LOAD temp table's stage as NDJSON and
+# COPYed in first.
+BULK_VALUES_MAX_ROWS = int(os.environ.get("BULK_UPSERT_VALUES_ROWS", "200"))
+
+# (column, SQL type, VALUES-source expression)
+_BULK_COLUMNS = (
+    ("seq",                "INT",          "column{}"),
+    ("user_id",            "VARCHAR(128)", "column{}"),
+    ("server_id",          "VARCHAR(64)",  "column{}"),
+    ("vector",             "ARRAY",        "PARSE_JSON(column{})"),
+    ("scores",             "VARIANT",      "PARSE_JSON(column{})"),
+    ("evidence",           "VARIANT",      "PARSE_JSON(column{})"),
+    ("reputation_score",   "FLOAT",        "column{}::FLOAT"),
+    ("confidence",         "VARCHAR(16)",  "column{}::VARCHAR"),
+    ("message_count_used", "INT",          "column{}::INT"),
+)
+_BULK_JSON = {"vector", "scores", "evidence"}
+
+# One row per user (the last one wins); optional fields left NULL keep the
+# stored value on update and take the default on insert
+_BULK_VECTOR_MERGE = """
+    MERGE INTO USER_VECTORS tgt
+    USING (
+        SELECT * FROM {source}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY seq DESC) = 1
+    ) src
+    ON tgt.user_id = src.user_id
+    WHEN MATCHED THEN UPDATE SET
+        archetype_vector   = src.vector::VECTOR(FLOAT, 50),
+        scores_json        = src.scores,
+        evidence_json      = COALESCE(src.evidence, tgt.evidence_json),
+        reputation_score   = COALESCE(src.reputation_score, tgt.reputation_score),
+        confidence         = COALESCE(src.confidence, tgt.confidence),
+        message_count_used = COALESCE(src.message_count_used, tgt.message_count_used),
+        updated_at         = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN INSERT (
+        user_id, archetype_vector, scores_json,
+        evidence_json, reputation_score, confidence, message_count_used
+    ) VALUES (
+        src.user_id, src.vector::VECTOR(FLOAT, 50), src.scores,
+        src.evidence, COALESCE(src.reputation_score, 0.0),
+        COALESCE(src.confidence, 'unknown'), COALESCE(src.message_count_used, 0)
+    )
+"""
+
+# New (user_id, server_id) pairs join as active members; existing memberships
+# keep their status and abandonment_count
+_MEMBERSHIP_MERGE = """
+    MERGE INTO SERVER_MEMBERSHIPS tgt
+    USING (SELECT DISTINCT user_id, server_id FROM {source}) src
+    ON tgt.user_id = src.user_id AND tgt.server_id = src.server_id
+    WHEN NOT MATCHED THEN INSERT (user_id, server_id)
+        VALUES (src.user_id, src.server_id)
+"""
+
+# embed_archetypes(): every requested user with no embedding yet, or one
+# older than their corpus (embedded_at), goes through EMBED_TEXT_768 once,
+# whatever the number of servers they were requested for.
+_EMBED_MERGE = """
+    MERGE INTO USER_VECTORS tgt
+    USING (
+        SELECT
+            r.auth0_id AS user_id,
+            SNOWFLAKE.CORTEX.EMBED_TEXT_768(
+                'snowflake-arctic-embed-m',
+                r.cleaned_corpus
+            ) AS embedding
+        FROM RAW_USER_ONBOARDING r
+        LEFT JOIN USER_VECTORS uv ON uv.user_id = r.auth0_id
+        WHERE r.auth0_id IN (SELECT user_id FROM {source})
+          AND (uv.embedded_at IS NULL OR r.updated_at > uv.embedded_at)
+    ) src
+    ON tgt.user_id = src.user_id
+    WHEN MATCHED THEN UPDATE SET
+        embedding_768 = src.embedding,
+        embedded_at   = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN INSERT (user_id, embedding_768, embedded_at)
+        VALUES (src.user_id, src.embedding, CURRENT_TIMESTAMP())
+"""
+
+
+# ── Columnar Fetch (Arrow) ──────────────────────────────────────────────────
+
+def _fetch_arrow(cur) -> Optional[pa.Table]:
+    """The executed query's result as one Arrow table (None when it has no rows)."""
+    batches = list(cur.fetch_arrow_batches())
+    return pa.concat_tables(batches) if batches else None
+
+
+def _arrow_vectors(column) -> np.ndarray:
+    """
+    A VECTOR(FLOAT, 50) column -> (N, 50) float64 array in DIMENSION_ORDER,
+    straight from the Arrow list buffers with no per-row Python objects,
+    snapped back to the stored decimals (candidate_index.stored_scores).
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        # Drivers without native VECTOR support hand the column over as JSON text
+        return stored_scores([json.loads(v) for v in column.to_pylist()]) \
+            .reshape(len(column), len(DIMENSION_ORDER))
+    values = column.flatten().to_numpy(zero_copy_only=False)
+    return stored_scores(values).reshape(len(column), len(DIMENSION_ORDER))
+
+
+def _arrow_floats(column, default: float = 0.0) -> np.ndarray:
+    return pc.fill_null(column, default).to_numpy().astype(np.float64)
+
+
+def _bulk_params(seq: int, row: dict) -> list:
+    """One VALUES row's parameters; JSON columns as text, missing fields as NULL."""
+    params = [seq]
+    for column, _, _ in _BULK_COLUMNS[1:]:
+        value = row.get(column)
+        params.append(json.dumps(value) if column in _BULK_JSON and value is not None else value)
+    return params
+
+
+def _bulk_ndjson(seq: int, row: dict) -> str:
+    """One staged NDJSON line; missing fields are left out so COPY loads them as NULL."""
+    record = {"seq": seq}
+    record.update((column, row[column]) for column, _, _ in _BULK_COLUMNS[1:] if row.get(column) is not None)
+    return json.dumps(record)
+
+
+def _bulk_values_source(n_rows: int) -> str:
+    select = ", ".join(
+        f"{expr.format(i)} AS {column}" for i, (column, _, expr) in enumerate(_BULK_COLUMNS, 1)
+    )
+    row = "(" + ", ".join(["%s"] * len(_BULK_COLUMNS)) + ")"
+    return f"(SELECT {select} FROM VALUES {', '.join([row] * n_rows)})"
+
+
+def _pairs_source(n_pairs: int) -> str:
+    """A VALUES source of (user_id, server_id) pairs, two %s parameters each."""
+    return f"(SELECT column1 AS user_id, column2 AS server_id FROM VALUES {', '.join(['(%s, %s)'] * n_pairs)})"
+
+
+def _history_insert_sql(n_rows: int) -> str:
+    select = ", ".join(
+        f"PARSE_JSON(column{i})" if col in _JSON_COLUMNS else f"column{i}"
+        for i, col in enumerate(HISTORY_COLUMNS, 1)
+    )
+    row = "(" + ", ".join(["%s"] * len(HISTORY_COLUMNS)) + ")"
+    return (
+        f"INSERT INTO MATCH_HISTORY ({', '.join(HISTORY_COLUMNS)})\n"
+        f"SELECT {select}\n"
+        f"FROM VALUES {', '.join([row] * n_rows)}"
+    )
+
+
+# ── BACKEND ───────────────────────────────────────────────────────────────────
+
+class SnowflakeStorage(MatchStorage):
+    name = "snowflake"
+    supports_embedding = True
+
+    def _connect(self) -> PooledConnection:
+        """Borrow a pooled session; conn.close() hands it back (see snowflake_pool)."""
+        return get_connection()
+
+    def _execute(self, sql: str, params, commit: bool = False):
+        """Run one statement; returns the cursor's rows (fetchall) unless committing."""
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            if commit:
+                conn.commit()
+                return None
+            return cur.fetchall()
+        finally:
+            conn.close()
+
+    def _execute_arrow(self, sql: str, params) -> Optional[pa.Table]:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return _fetch_arrow(cur)
+        finally:
+            conn.close()
+
+    # ── ingestion ──
+
+    def upsert_raw_corpus(self, user_id: str, cleaned_corpus: str) -> None:
+        self._execute(
+            """
+            MERGE INTO RAW_USER_ONBOARDING tgt
+            USING (SELECT %(user_id)s AS auth0_id, %(corpus)s AS cleaned_corpus) src
+            ON tgt.auth0_id = src.auth0_id
+            WHEN MATCHED THEN UPDATE SET
+                cleaned_corpus = src.cleaned_corpus,
+                updated_at     = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED THEN INSERT (auth0_id, cleaned_corpus)
+                VALUES (src.auth0_id, src.cleaned_corpus)
+            """,
+            {"user_id": user_id, "corpus": cleaned_corpus},
+            commit=True,
+        )
+
+    def embed_archetype(self, user_id: str, server_id: str) -> None:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                MERGE INTO USER_VECTORS tgt
+                USING (
+                    SELECT
+                        auth0_id AS user_id,
+                        SNOWFLAKE.CORTEX.EMBED_TEXT_768(
+                            'snowflake-arctic-embed-m',
+                            cleaned_corpus
+                        ) AS embedding
+                    FROM RAW_USER_ONBOARDING
+                    WHERE auth0_id = %(user_id)s
+                ) src
+                ON tgt.user_id = src.user_id
+                WHEN MATCHED THEN UPDATE SET
+                    embedding_768 = src.embedding,
+                    embedded_at   = CURRENT_TIMESTAMP()
+                WHEN NOT MATCHED THEN INSERT (user_id, embedding_768, embedded_at)
+                    VALUES (src.user_id, src.embedding, CURRENT_TIMESTAMP())
+                """,
+                {"user_id": user_id},
+            )
+            cur.execute(
+                _MEMBERSHIP_MERGE.format(source="(SELECT %(user_id)s AS user_id, %(server_id)s AS server_id)"),
+                {"user_id": user_id, "server_id": server_id},
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stale_embeddings(self, limit: int) -> list[tuple[str, str]]:
+        rows = self._execute(
+            """
+            SELECT m.user_id, m.server_id
+            FROM SERVER_MEMBERSHIPS m
+            JOIN RAW_USER_ONBOARDING r ON r.auth0_id = m.user_id
+            LEFT JOIN USER_VECTORS uv ON uv.user_id = m.user_id
+            WHERE uv.embedded_at IS NULL OR r.updated_at > uv.embedded_at
+            ORDER BY r.updated_at
+            LIMIT %(lim)s
+            """,
+            {"lim": limit},
+        )
+        return [(user_id, server_id) for user_id, server_id in rows]
+
+    def embed_archetypes(self, pairs: list[tuple[str, str]]) -> int:
+        pairs = list(dict.fromkeys(pairs))
+        if not pairs:
+            return 0
+        params = [p for pair in pairs for p in pair]
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(_EMBED_MERGE.format(source=_pairs_source(len(pairs))), params)
+            inserted, updated = cur.fetchone()[:2]
+            cur.execute(_MEMBERSHIP_MERGE.format(source=_pairs_source(len(pairs))), params)
+            conn.commit()
+        finally:
+            conn.close()
+        return inserted + updated
+
+    def upsert_archetype(self, user_id: str, server_id: str, vector: list[float], scores: dict,
+                         evidence: dict, reputation: float, confidence: str,
+                         message_count: int) -> None:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                MERGE INTO USER_VECTORS tgt
+                USING (SELECT
+                    %(user_id)s                    AS user_id,
+                    PARSE_JSON(%(vector)s)::VECTOR(FLOAT, 50)  AS archetype_vector,
+                    PARSE_JSON(%(scores)s)         AS scores_json,
+                    PARSE_JSON(%(evidence)s)       AS evidence_json,
+                    %(reputation)s                 AS reputation_score,
+                    %(confidence)s                 AS confidence,
+                    %(msg_count)s                  AS message_count_used
+                ) src
+                ON tgt.user_id = src.user_id
+                WHEN MATCHED THEN UPDATE SET
+                    archetype_vector   = src.archetype_vector,
+                    scores_json        = src.scores_json,
+                    evidence_json      = src.evidence_json,
+                    reputation_score   = src.reputation_score,
+                    confidence         = src.confidence,
+                    message_count_used = src.message_count_used,
+                    updated_at         = CURRENT_TIMESTAMP()
+                WHEN NOT MATCHED THEN INSERT (
+                    user_id, archetype_vector, scores_json,
+                    evidence_json, reputation_score, confidence, message_count_used
+                ) VALUES (
+                    src.user_id, src.archetype_vector, src.scores_json,
+                    src.evidence_json, src.reputation_score, src.confidence,
+                    src.message_count_used
+                )
+                """,
+                {
+                    "user_id": user_id,
+                    "vector": json.dumps(vector),
+                    "scores": json.dumps(scores),
+                    "evidence": json.dumps(evidence),
+                    "reputation": reputation,
+                    "confidence": confidence,
+                    "msg_count": message_count,
+                },
+            )
+            cur.execute(
+                _MEMBERSHIP_MERGE.format(source="(SELECT %(user_id)s AS user_id, %(server_id)s AS server_id)"),
+                {"user_id": user_id, "server_id": server_id},
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def bulk_upsert_archetypes(self, rows: list[dict]) -> dict:
+        if not rows:
+            return {"rows": 0, "inserted": 0, "updated": 0, "memberships": 0}
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            if len(rows) <= BULK_VALUES_MAX_ROWS:
+                params = [p for seq, row in enumerate(rows) for p in _bulk_params(seq, row)]
+                cur.execute(_BULK_VECTOR_MERGE.format(source=_bulk_values_source(len(rows))), params)
+                inserted, updated = cur.fetchone()[:2]
+                pairs = list(dict.fromkeys((row["user_id"], row["server_id"]) for row in rows))
+                cur.execute(_MEMBERSHIP_MERGE.format(source=_pairs_source(len(pairs))),
+                            [p for pair in pairs for p in pair])
+            else:
+                self._stage_bulk_rows(cur, rows)
+                cur.execute(_BULK_VECTOR_MERGE.format(source="ARCHETYPE_LOAD"))
+                inserted, updated = cur.fetchone()[:2]
+                cur.execute(_MEMBERSHIP_MERGE.format(source="ARCHETYPE_LOAD"))
+            memberships = cur.fetchone()[0]
+            conn.commit()
+        finally:
+            conn.close()
+        return {"rows": inserted + updated, "inserted": inserted, "updated": updated,
+                "memberships": memberships}
+
+    def _stage_bulk_rows(self, cur, rows: list[dict]) -> None:
+        """Load rows into this session's ARCHETYPE_LOAD temp table via PUT + COPY."""
+        columns = ", ".join(f"{column} {sql_type}" for column, sql_type, _ in _BULK_COLUMNS)
+        cur.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS ARCHETYPE_LOAD ({columns})")
+        # Pooled sessions outlive a call, so the temp table may hold an earlier batch
+        cur.execute("TRUNCATE TABLE ARCHETYPE_LOAD")
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            for seq, row in enumerate(rows):
+                f.write(_bulk_ndjson(seq, row) + "\n")
+        try:
+            cur.execute(f"PUT 'file://{f.name}' @%ARCHETYPE_LOAD AUTO_COMPRESS = TRUE OVERWRITE = TRUE")
+            cur.execute(
+                """
+                COPY INTO ARCHETYPE_LOAD
+                FROM @%ARCHETYPE_LOAD
+                FILE_FORMAT = (TYPE = JSON)
+                MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+                PURGE = TRUE
+                """
+            )
+        finally:
+            os.remove(f.name)
+
+    def increment_abandonment(self, user_id: str, server_id: str) -> None:
+        self._execute(
+            f"""
+            UPDATE SERVER_MEMBERSHIPS
+            SET abandonment_count = abandonment_count + 1,
+                status = CASE
+                    WHEN abandonment_count + 1 >= {ABANDONMENT_LIMIT} THEN 'flagged'
+                    ELSE status
+                END,
+                updated_at = CURRENT_TIMESTAMP()
+            WHERE user_id = %(uid)s AND server_id = %(sid)s
+            """,
+            {"uid": user_id, "sid": server_id},
+            commit=True,
+        )
+
+    def insert_match_history(self, rows: list[dict]) -> None:
+        """One multi-row INSERT per INSERT_CHUNK_ROWS, committed together."""
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+                chunk = rows[start:start + INSERT_CHUNK_ROWS]
+                params = [row[col] for row in chunk for col in HISTORY_COLUMNS]
+                cur.execute(_history_insert_sql(len(chunk)), params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ── reads ──
+
+    def is_eligible(self, user_id: str, server_id: str) -> bool:
+        rows = self._execute(
+            f"""
+            SELECT COUNT(*) FROM {MEMBERS}
+            WHERE m.user_id = %(uid)s AND m.server_id = %(sid)s
+              AND {ELIGIBLE}
+            """,
+            {"uid": user_id, "sid": server_id},
+        )
+        return rows[0][0] > 0
+
+    def cosine_candidates(self, query_vector: list[float], server_id: str, exclude_user_id: str,
+                          limit: int) -> CandidateSet:
+        table = self._execute_arrow(
+            f"""
+            SELECT
+                m.user_id,
+                VECTOR_COSINE_SIMILARITY(
+                    uv.archetype_vector,
+                    PARSE_JSON(%(query_vec)s)::VECTOR(FLOAT, 50)
+                ) AS cosine_score,
+                uv.archetype_vector,
+                uv.reputation_score,
+                COUNT(*) OVER () AS pool_size
+            FROM {MEMBERS}
+            WHERE m.server_id = %(server_id)s
+              AND m.user_id != %(user_id)s
+              AND {ELIGIBLE}
+            ORDER BY cosine_score DESC
+            LIMIT %(lim)s
+            """,
+            {
+                "query_vec": json.dumps(query_vector),
+                "server_id": server_id,
+                "user_id": exclude_user_id,
+                "lim": limit,
+            },
+        )
+        if table is None:
+            return CandidateSet.empty()
+        return CandidateSet(
+            user_ids=table["USER_ID"].to_pylist(),
+            cosine=_arrow_floats(table["COSINE_SCORE"]),
+            vectors=_arrow_vectors(table["ARCHETYPE_VECTOR"]),
+            reputation=_arrow_floats(table["REPUTATION_SCORE"]),
+            pool_size=table["POOL_SIZE"][0].as_py(),
+        )
+
+    def bounded_candidates(self, query_scores: dict, server_id: str, exclude_user_id: str,
+                           context: str, limit: int,
+                           after: Optional[tuple[float, str]] = None) -> CandidateSet:
+        """One keyset page of the pool by score bound, computed in the warehouse (rerank_sql)."""
+        query = [float(query_scores.get(dim, 0.5)) for dim in DIMENSION_ORDER]
+        after_bound, after_user = after if after is not None else (None, None)
+        table = self._execute_arrow(
+            bound_query(context),
+            {
+                "query_scores": json.dumps(query_scores),
+                "query_vec": json.dumps(query),
+                "server_id": server_id,
+                "user_id": exclude_user_id,
+                "lim": limit,
+                "after_bound": after_bound,
+                "after_user": after_user,
+            },
+        )
+        if table is None:
+            return CandidateSet.empty()
+        return CandidateSet(
+            user_ids=table["USER_ID"].to_pylist(),
+            cosine=_arrow_floats(table["COSINE_SCORE"]),
+            vectors=_arrow_vectors(table["ARCHETYPE_VECTOR"]),
+            reputation=_arrow_floats(table["REPUTATION_SCORE"]),
+            pool_size=table["POOL_SIZE"][0].as_py(),
+            bound=_arrow_floats(table["SCORE_BOUND"]),
+        )
+
+    def reranked_candidates(self, query_scores: dict, server_id: str, exclude_user_id: str,
+                            context: str, limit: int) -> CandidateSet:
+        """The whole-pool re-rank in the warehouse; only the best `limit` rows come back."""
+        query = [float(query_scores.get(dim, 0.5)) for dim in DIMENSION_ORDER]
+        table = self._execute_arrow(
+            pushdown_query(context),
+            {
+                "query_scores": json.dumps(query_scores),
+                "query_vec": json.dumps(query),
+                "server_id": server_id,
+                "user_id": exclude_user_id,
+                "lim": limit,
+            },
+        )
+        if table is None:
+            return CandidateSet.empty()
+        return CandidateSet(
+            user_ids=table["USER_ID"].to_pylist(),
+            cosine=_arrow_floats(table["COSINE_SCORE"]),
+            vectors=_arrow_vectors(table["ARCHETYPE_VECTOR"]),
+            reputation=_arrow_floats(table["REPUTATION_SCORE"]),
+            pool_size=table["POOL_SIZE"][0].as_py(),
+            weighted=_arrow_floats(table["WEIGHTED_SCORE"]),
+        )
+
+    def archetype_rows(self, server_id: str, since: Optional[datetime] = None,
+                       overlap: float = 0.0) -> ArchetypeRows:
+        where = f"AND {ELIGIBLE}" if since is None else \
+            f"AND {MEMBER_UPDATED_AT} >= DATEADD(second, -%(overlap)s, %(since)s)"
+        table = self._execute_arrow(
+            f"""
+            SELECT m.user_id, uv.archetype_vector, uv.reputation_score,
+                   {MEMBER_UPDATED_AT} AS updated_at,
+                   ({ELIGIBLE}) AS eligible
+            FROM {MEMBERS}
+            WHERE m.server_id = %(sid)s
+              {where}
+            """,
+            {"sid": server_id, "since": since, "overlap": overlap},
+        )
+        if table is None:
+            return ArchetypeRows.empty()
+        return ArchetypeRows(
+            user_ids=table["USER_ID"].to_pylist(),
+            vectors=_arrow_vectors(table["ARCHETYPE_VECTOR"]),
+            reputation=_arrow_floats(table["REPUTATION_SCORE"]),
+            eligible=np.array(table["ELIGIBLE"].to_pylist(), dtype=bool),
+            updated_at=pc.max(table["UPDATED_AT"]).as_py(),
+        )
+
+    def group_pool(self, server_id: str) -> tuple[list[str], np.ndarray]:
+        table = self._execute_arrow(
+            f"""
+            SELECT m.user_id, uv.archetype_vector
+            FROM {MEMBERS}
+            WHERE m.server_id = %(sid)s
+              AND {ELIGIBLE}
+            ORDER BY uv.reputation_score DESC
+            """,
+            {"sid": server_id},
+        )
+        if table is None:
+            return [], np.zeros((0, len(DIMENSION_ORDER)))
+        return table["USER_ID"].to_pylist(), _arrow_vectors(table["ARCHETYPE_VECTOR"])
+
+    def scores_for(self, server_id: str, user_ids: list[str]) -> dict[str, dict]:
+        if not user_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        rows = self._execute(
+            f"""
+            SELECT m.user_id, uv.scores_json, uv.reputation_score,
+                   ({ELIGIBLE}) AS eligible
+            FROM {MEMBERS}
+            WHERE m.server_id = %s
+              AND m.user_id IN ({placeholders})
+              AND uv.scores_json IS NOT NULL
+            """,
+            [server_id, *user_ids],
+        )
+        return {
+            uid: {
+                "scores":     json.loads(scores) if isinstance(scores, str) else scores,
+                "reputation": float(reputation or 0.0),
+                "eligible":   bool(eligible),
+            }
+            for uid, scores, reputation, eligible in rows
+        }
+
+    def evidence(self, server_id: str, user_ids: list[str]) -> dict[str, dict]:
+        if not user_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        rows = self._execute(
+            f"""
+            SELECT m.user_id, uv.evidence_json
+            FROM {MEMBERS}
+            WHERE m.server_id = %s
+              AND m.user_id IN ({placeholders})
+            """,
+            [server_id, *user_ids],
+        )
+        return {
+            uid: (json.loads(evidence) if isinstance(evidence, str) else evidence or {})
+            for uid, evidence in rows
+        }
+
+    def user_embedding_768(self, user_id: str, server_id: str) -> Optional[list[float]]:
+        rows = self._execute(
+            """
+            SELECT uv.embedding_768::ARRAY AS emb
+            FROM USER_VECTORS uv
+            JOIN SERVER_MEMBERSHIPS m ON m.user_id = uv.user_id
+            WHERE m.user_id = %(auth0_id)s AND m.server_id = %(server_id)s
+            LIMIT 1
+            """,
+            {"auth0_id": user_id, "server_id": server_id},
+        )
+        raw = rows[0][0] if rows else None
+        if not raw or len(raw) != VECTOR_DIM_768:
+            return None
+        return [float(x) for x in raw]
+
+    def cortex_search(self, vector_768: list[float], server_id: str, exclude_user_id: str,
+                      limit: int) -> list[dict]:
+        query_payload = {
+            "multi_index_query": {
+                CORTEX_VECTOR_INDEX: [{"vector": vector_768}],
+            },
+            "filter": {
+                "@and": [
+                    {"@eq": {"server_id": server_id}},
+                    {"@eq": {"is_flagged": False}},
+                ],
+            },
+            "columns": ["user_id"],
+            "limit": limit,
+        }
+        rows = self._execute(
+            """
+            SELECT PARSE_JSON(SNOWFLAKE.CORTEX.SEARCH_PREVIEW(%s, %s))['results'] AS results
+            """,
+            (CORTEX_SERVICE, json.dumps(query_payload)),
+        )
+        raw = rows[0][0] if rows else None
+        if not raw or not isinstance(raw, (list, str)):
+            return []
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+        results = []
+        for r in raw:
+            aid = r.get("user_id") or r.get("USER_ID") or r.get("auth0_id") or r.get("AUTH0_ID")
+            if not aid or aid == exclude_user_id:
+                continue
+            score = float(r.get("score", r.get("SCORE", 0.0)))
+            results.append({"auth0_id": aid, "score": score})
+        return results[:limit]
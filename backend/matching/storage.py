@@ -0,0 +1,478 @@
+"""
+storage.py
+==========
+The data interface behind matching_engine, with a pluggable backend.
+
+matching_engine never talks to a database directly; every read and write of
+USER_VECTORS, SERVER_MEMBERSHIPS, RAW_USER_ONBOARDING and MATCH_HISTORY goes
+through a MatchStorage:
+
+  - SnowflakeStorage (snowflake_storage.py): the production tables via the
+    shared connection pool.
+  - LocalStorage: the same operations over in-process tables, for
+    benchmarking and load-testing the v2 paths on a laptop with no
+    Snowflake account.
+
+Both honour the same semantics (migrations/002_user_vectors.sql):
+
+  - a user's vector, scores, evidence and reputation are stored once, in
+    USER_VECTORS; SERVER_MEMBERSHIPS holds one lightweight row per
+    (user_id, server_id) with that server's status and abandonment_count;
+  - every archetype read is scoped to one server_id, i.e. its memberships
+    joined to USER_VECTORS, and a row's updated_at is the later of the two;
+  - a user is eligible for matching on a server while the membership has
+    status = 'active' and abandonment_count < 3 (the third abandonment
+    flags them there, not on their other servers);
+  - candidates come back in descending cosine similarity of the float32
+    stored vectors, ties in membership order;
+  - upsert_archetype() MERGEs the user's vector (keeping created_at, bumping
+    updated_at) and adds the server membership if it is missing; an
+    existing membership keeps its status and abandonment_count. The new
+    vector applies on every server the user belongs to.
+
+MATCH_STORAGE_BACKEND=snowflake|local picks the process-wide backend
+returned by get_storage(). The Cortex operations (EMBED_TEXT_768, Cortex
+Search) only exist in Snowflake: a backend offers them when its
+supports_embedding is True. LocalStorage has no 768-dim embeddings, so
+embedding jobs skip it and get_matches_cortex() finds no query vector there
+and returns no matches.
+"""
+
+import os
+import abc
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from matching import DIMENSION_ORDER, compute_match_many, score_upper_bound
+from candidate_index import CandidateSet, bound_page, stored_scores
+
+MATCH_STORAGE_BACKEND = os.environ.get("MATCH_STORAGE_BACKEND", "snowflake")
+
+N_DIMS = len(DIMENSION_ORDER)
+ABANDONMENT_LIMIT = 3
+
+
+# ── ROWS ──────────────────────────────────────────────────────────────────────
+
+@dataclass
+class ArchetypeRows:
+    """A server's memberships joined to USER_VECTORS, as parallel arrays (index builds and polls)."""
+    user_ids: list[str]
+    vectors: np.ndarray         # (n, 50) float64 in DIMENSION_ORDER
+    reputation: np.ndarray      # (n,)
+    eligible: np.ndarray        # (n,) bool: active and under the abandonment limit
+    updated_at: Optional[datetime] = None   # newest updated_at among the rows
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @classmethod
+    def empty(cls) -> "ArchetypeRows":
+        return cls([], np.zeros((0, N_DIMS)), np.zeros(0), np.zeros(0, dtype=bool))
+
+
+# ── INTERFACE ─────────────────────────────────────────────────────────────────
+
+class MatchStorage(abc.ABC):
+    """
+    Operations matching_engine needs from its store. See the module docstring
+    for semantics. Backends implement every abstract method; the Cortex
+    embedding methods are optional and only called when supports_embedding
+    is True (their defaults here embed and find nothing).
+    """
+
+    name = "abstract"
+    supports_embedding = False
+
+    # ── ingestion ──
+
+    @abc.abstractmethod
+    def upsert_raw_corpus(self, user_id: str, cleaned_corpus: str) -> None:
+        ...
+
+    def embed_archetype(self, user_id: str, server_id: str) -> None:
+        """Embed the user's raw corpus into USER_VECTORS.embedding_768 (Cortex) and join the server."""
+
+    @abc.abstractmethod
+    def stale_embeddings(self, limit: int) -> list[tuple[str, str]]:
+        """
+        Up to `limit` (user_id, server_id) memberships whose RAW_USER_ONBOARDING
+        corpus has no embedding yet or was updated after it (USER_VECTORS.embedded_at),
+        oldest corpus first.
+        """
+
+    def embed_archetypes(self, pairs: list[tuple[str, str]]) -> int:
+        """
+        embed_archetype() for many (user_id, server_id) pairs: each stale
+        corpus embedded once into USER_VECTORS in one MERGE, and the pairs'
+        memberships added. Users whose embedding is already newer than the
+        corpus are skipped. Returns the number of USER_VECTORS rows written.
+        """
+        return 0
+
+    @abc.abstractmethod
+    def upsert_archetype(self, user_id: str, server_id: str, vector: list[float], scores: dict,
+                         evidence: dict, reputation: float, confidence: str,
+                         message_count: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    def bulk_upsert_archetypes(self, rows: list[dict]) -> dict:
+        """
+        upsert_archetype() for many rows: one MERGE into USER_VECTORS and one
+        into SERVER_MEMBERSHIPS. Rows carry user_id, server_id, vector, scores,
+        evidence, reputation_score, confidence and message_count_used; a None
+        optional field keeps the stored value on update (and takes the column
+        default on insert). The last row for a user_id wins its vector; every
+        row's server becomes a membership. Returns {"rows", "inserted",
+        "updated"} counting USER_VECTORS rows, plus "memberships" added.
+        """
+
+    @abc.abstractmethod
+    def increment_abandonment(self, user_id: str, server_id: str) -> None:
+        """Count one abandonment; the ABANDONMENT_LIMIT-th flags the user."""
+
+    @abc.abstractmethod
+    def insert_match_history(self, rows: list[dict]) -> None:
+        """Append MATCH_HISTORY rows (see history_writer.history_row)."""
+
+    # ── reads ──
+
+    @abc.abstractmethod
+    def is_eligible(self, user_id: str, server_id: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def cosine_candidates(self, query_vector: list[float], server_id: str, exclude_user_id: str,
+                          limit: int) -> CandidateSet:
+        """Eligible users other than `exclude_user_id`, most cosine-similar first, with pool_size."""
+
+    def bounded_candidates(self, query_scores: dict, server_id: str, exclude_user_id: str,
+                           context: str, limit: int,
+                           after: Optional[tuple[float, str]] = None) -> CandidateSet:
+        """
+        The next `limit` eligible users by score_upper_bound() against
+        `query_scores`, ordered by (bound DESC, user_id) after the keyset
+        `after`, with `bound` and pool_size filled in. This default bounds the
+        pool in Python; SnowflakeStorage computes the bound in the warehouse.
+        """
+        query = [float(query_scores.get(dim, 0.5)) for dim in DIMENSION_ORDER]
+        pool = self.cosine_candidates(query, server_id, exclude_user_id, limit=2**31 - 1)
+        if len(pool) == 0 or limit <= 0:
+            return CandidateSet.empty()
+        bound = score_upper_bound(np.asarray(query), pool.vectors, context)
+        top = bound_page(bound, pool.user_ids, after, limit)
+        return CandidateSet(
+            user_ids=[pool.user_ids[i] for i in top.tolist()],
+            cosine=pool.cosine[top],
+            vectors=pool.vectors[top],
+            reputation=pool.reputation[top],
+            pool_size=pool.pool_size,
+            bound=bound[top],
+        )
+
+    def reranked_candidates(self, query_scores: dict, server_id: str, exclude_user_id: str,
+                            context: str, limit: int) -> CandidateSet:
+        """
+        The best `limit` eligible users by compute_match() final score against
+        the whole server pool (ties by cosine), with `weighted` filled in.
+        This default scores the pool in Python; SnowflakeStorage pushes it
+        into the warehouse (see rerank_sql).
+        """
+        query = [float(query_scores.get(dim, 0.5)) for dim in DIMENSION_ORDER]
+        pool = self.cosine_candidates(query, server_id, exclude_user_id, limit=2**31 - 1)
+        if len(pool) == 0 or limit <= 0:
+            return CandidateSet.empty()
+        weighted = compute_match_many(np.asarray(query), pool.vectors, context).score
+        top = np.argsort(-weighted, kind="stable")[:limit]
+        return CandidateSet(
+            user_ids=[pool.user_ids[i] for i in top.tolist()],
+            cosine=pool.cosine[top],
+            vectors=pool.vectors[top],
+            reputation=pool.reputation[top],
+            pool_size=pool.pool_size,
+            weighted=weighted[top],
+        )
+
+    @abc.abstractmethod
+    def archetype_rows(self, server_id: str, since: Optional[datetime] = None,
+                       overlap: float = 0.0) -> ArchetypeRows:
+        """
+        Every eligible user when `since` is None, otherwise every row (eligible
+        or not) updated at or after `since` minus `overlap` seconds.
+        """
+
+    @abc.abstractmethod
+    def group_pool(self, server_id: str) -> tuple[list[str], np.ndarray]:
+        """(user_ids, (n, 50) vectors) of the eligible users, best reputation first."""
+
+    @abc.abstractmethod
+    def scores_for(self, server_id: str, user_ids: list[str]) -> dict[str, dict]:
+        """{user_id: {"scores", "reputation", "eligible"}} for users that have 50-dim scores."""
+
+    @abc.abstractmethod
+    def evidence(self, server_id: str, user_ids: list[str]) -> dict[str, dict]:
+        ...
+
+    def user_embedding_768(self, user_id: str, server_id: str) -> Optional[list[float]]:
+        return None
+
+    def cortex_search(self, vector_768: list[float], server_id: str, exclude_user_id: str,
+                      limit: int) -> list[dict]:
+        """[{"auth0_id", "score"}] from Cortex Search, best first."""
+        return []
+
+
+# ── LOCAL BACKEND ─────────────────────────────────────────────────────────────
+
+class LocalStorage(MatchStorage):
+    """
+    In-process tables with Snowflake's semantics. Vectors are kept as float32
+    like VECTOR(FLOAT, 50), so cosine scores and orderings match the
+    Snowflake path. Thread-safe.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self.raw_onboarding: dict[str, dict] = {}               # auth0_id -> row
+        self.vectors: dict[str, dict] = {}                      # user_id -> USER_VECTORS row
+        self.memberships: dict[tuple[str, str], dict] = {}      # (user_id, server_id) -> row
+        self.match_history: list[dict] = []
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _eligible(membership: dict) -> bool:
+        return membership["status"] == "active" and membership["abandonment_count"] < ABANDONMENT_LIMIT
+
+    def _server_rows(self, server_id: str) -> list[dict]:
+        """
+        A server's memberships joined to their vectors, in membership insertion
+        order (Snowflake's tie order for the join). Each row carries both
+        tables' columns; updated_at is the later of the two.
+        """
+        rows = []
+        for (user_id, sid), membership in self.memberships.items():
+            vector = self.vectors.get(user_id)
+            if sid == server_id and vector is not None and vector.get("archetype_vector") is not None:
+                rows.append(self._join(membership, vector))
+        return rows
+
+    @staticmethod
+    def _join(membership: dict, vector: dict) -> dict:
+        return {**vector, **membership, "updated_at": max(vector["updated_at"], membership["updated_at"])}
+
+    def _member(self, user_id: str, server_id: str) -> Optional[dict]:
+        """The joined row for one membership, None without one (or without a 50-dim vector)."""
+        membership = self.memberships.get((user_id, server_id))
+        vector = self.vectors.get(user_id)
+        if membership is None or vector is None or vector.get("archetype_vector") is None:
+            return None
+        return self._join(membership, vector)
+
+    def _join_server(self, user_id: str, server_id: str, now: datetime) -> bool:
+        """Add a membership if the user has none on this server; True when added."""
+        if (user_id, server_id) in self.memberships:
+            return False
+        self.memberships[(user_id, server_id)] = {
+            "user_id": user_id, "server_id": server_id, "status": "active",
+            "abandonment_count": 0, "created_at": now, "updated_at": now,
+        }
+        return True
+
+    @staticmethod
+    def _vectors(rows: list[dict]) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, N_DIMS))
+        return stored_scores(np.stack([row["archetype_vector"] for row in rows]))
+
+    # ── ingestion ──
+
+    def upsert_raw_corpus(self, user_id: str, cleaned_corpus: str) -> None:
+        now = datetime.now()
+        with self._lock:
+            row = self.raw_onboarding.setdefault(user_id, {"auth0_id": user_id, "created_at": now})
+            row["cleaned_corpus"] = cleaned_corpus
+            row["updated_at"] = now
+
+    def stale_embeddings(self, limit: int) -> list[tuple[str, str]]:
+        with self._lock:
+            stale = []
+            for key, membership in self.memberships.items():
+                raw = self.raw_onboarding.get(key[0])
+                embedded_at = self.vectors.get(key[0], {}).get("embedded_at")
+                if raw is not None and (embedded_at is None or raw["updated_at"] > embedded_at):
+                    stale.append((raw["updated_at"], key))
+        stale.sort(key=lambda item: item[0])
+        return [key for _, key in stale[:limit]]
+
+    def upsert_archetype(self, user_id: str, server_id: str, vector: list[float], scores: dict,
+                         evidence: dict, reputation: float, confidence: str,
+                         message_count: int) -> None:
+        assert len(vector) == N_DIMS, f"archetype_vector needs {N_DIMS} dims, got {len(vector)}"
+        now = datetime.now()
+        with self._lock:
+            row = self.vectors.setdefault(user_id, {"user_id": user_id, "created_at": now})
+            row.update({
+                "archetype_vector":   np.asarray(vector, dtype=np.float32),
+                # Round-trip through JSON like PARSE_JSON, so callers can't alias stored state
+                "scores_json":        json.loads(json.dumps(scores)),
+                "evidence_json":      json.loads(json.dumps(evidence)),
+                "reputation_score":   float(reputation),
+                "confidence":         confidence,
+                "message_count_used": message_count,
+                "updated_at":         now,
+            })
+            self._join_server(user_id, server_id, now)
+
+    def bulk_upsert_archetypes(self, rows: list[dict]) -> dict:
+        latest = {row["user_id"]: row for row in rows}
+        inserted = 0
+        with self._lock:
+            before = len(self.memberships)
+            for user_id, row in latest.items():
+                existing = self.vectors.get(user_id) or {}
+                inserted += not existing
+
+                def keep(field: str, column: str, default):
+                    return row[field] if row.get(field) is not None else existing.get(column, default)
+
+                self.upsert_archetype(
+                    user_id, row["server_id"], row["vector"], row["scores"],
+                    evidence=keep("evidence", "evidence_json", None),
+                    reputation=keep("reputation_score", "reputation_score", 0.0),
+                    confidence=keep("confidence", "confidence", "unknown"),
+                    message_count=keep("message_count_used", "message_count_used", 0),
+                )
+            now = datetime.now()
+            for row in rows:
+                self._join_server(row["user_id"], row["server_id"], now)
+            memberships = len(self.memberships) - before
+        return {"rows": len(latest), "inserted": inserted, "updated": len(latest) - inserted,
+                "memberships": memberships}
+
+    def increment_abandonment(self, user_id: str, server_id: str) -> None:
+        with self._lock:
+            membership = self.memberships.get((user_id, server_id))
+            if membership is None:
+                return
+            membership["abandonment_count"] += 1
+            if membership["abandonment_count"] >= ABANDONMENT_LIMIT:
+                membership["status"] = "flagged"
+            membership["updated_at"] = datetime.now()
+
+    def insert_match_history(self, rows: list[dict]) -> None:
+        now = datetime.now()
+        with self._lock:
+            self.match_history.extend({**row, "created_at": now} for row in rows)
+
+    # ── reads ──
+
+    def is_eligible(self, user_id: str, server_id: str) -> bool:
+        with self._lock:
+            row = self._member(user_id, server_id)
+            return row is not None and self._eligible(row)
+
+    def cosine_candidates(self, query_vector: list[float], server_id: str, exclude_user_id: str,
+                          limit: int) -> CandidateSet:
+        with self._lock:
+            rows = [row for row in self._server_rows(server_id)
+                    if row["user_id"] != exclude_user_id and self._eligible(row)]
+            stored = np.stack([row["archetype_vector"] for row in rows]) if rows else None
+        if stored is None or limit <= 0:
+            return CandidateSet.empty()
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(stored, axis=1) * np.linalg.norm(query)
+        cosine = np.divide(stored @ query, norms, out=np.zeros(len(rows), dtype=np.float32),
+                           where=norms > 0)
+        top = np.argsort(-cosine, kind="stable")[:limit]
+        return CandidateSet(
+            user_ids=[rows[i]["user_id"] for i in top.tolist()],
+            cosine=cosine[top].astype(np.float64),
+            vectors=stored_scores(stored[top]),
+            reputation=np.array([rows[i]["reputation_score"] for i in top.tolist()], dtype=np.float64),
+            pool_size=len(rows),
+        )
+
+    def archetype_rows(self, server_id: str, since: Optional[datetime] = None,
+                       overlap: float = 0.0) -> ArchetypeRows:
+        with self._lock:
+            rows = self._server_rows(server_id)
+            if since is None:
+                rows = [row for row in rows if self._eligible(row)]
+            else:
+                cutoff = since - timedelta(seconds=overlap)
+                rows = [row for row in rows if row["updated_at"] >= cutoff]
+            if not rows:
+                return ArchetypeRows.empty()
+            return ArchetypeRows(
+                user_ids=[row["user_id"] for row in rows],
+                vectors=self._vectors(rows),
+                reputation=np.array([row["reputation_score"] for row in rows], dtype=np.float64),
+                eligible=np.array([self._eligible(row) for row in rows], dtype=bool),
+                updated_at=max(row["updated_at"] for row in rows),
+            )
+
+    def group_pool(self, server_id: str) -> tuple[list[str], np.ndarray]:
+        with self._lock:
+            rows = [row for row in self._server_rows(server_id) if self._eligible(row)]
+            rows.sort(key=lambda row: -row["reputation_score"])
+            return [row["user_id"] for row in rows], self._vectors(rows)
+
+    def scores_for(self, server_id: str, user_ids: list[str]) -> dict[str, dict]:
+        with self._lock:
+            found = {}
+            for uid in user_ids:
+                row = self._member(uid, server_id)
+                if row is not None and row.get("scores_json") is not None:
+                    found[uid] = {
+                        "scores":     dict(row["scores_json"]),
+                        "reputation": row["reputation_score"],
+                        "eligible":   self._eligible(row),
+                    }
+            return found
+
+    def evidence(self, server_id: str, user_ids: list[str]) -> dict[str, dict]:
+        with self._lock:
+            found = {}
+            for uid in user_ids:
+                row = self._member(uid, server_id)
+                if row is not None:
+                    found[uid] = dict(row["evidence_json"] or {})
+            return found
+
+
+# ── SHARED BACKEND ────────────────────────────────────────────────────────────
+
+_storage: Optional[MatchStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> MatchStorage:
+    """The process-wide backend named by MATCH_STORAGE_BACKEND, created on first use."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if MATCH_STORAGE_BACKEND == "local":
+                _storage = LocalStorage()
+            elif MATCH_STORAGE_BACKEND == "snowflake":
+                # Imported lazily so the local backend runs without the Snowflake connector
+                from snowflake_storage import SnowflakeStorage
+                _storage = SnowflakeStorage()
+            else:
+                raise ValueError(f"Unknown MATCH_STORAGE_BACKEND: {MATCH_STORAGE_BACKEND!r}")
+        return _storage
+
+
+def set_storage(storage: MatchStorage) -> MatchStorage:
+    """Swap the process-wide backend (e.g. a seeded LocalStorage for a benchmark run)."""
+    global _storage
+    with _storage_lock:
+        _storage = storage
+    return storage
@@ -0,0 +1,178 @@
+"""
+team_jobs.py
+============
+Background team-search jobs, so long group searches don't hold an HTTP
+worker (or hit proxy timeouts) for their whole run.
+
+A job wraps one search function that takes a team_search.SearchControl.
+It runs on a small thread pool, publishes progress (best team so far,
+work evaluated, ETA) as the search checkpoints, and can be cancelled or
+given a time budget — either way it finishes with the best teams found.
+
+Read a job by polling snapshot() or by streaming job_events() as
+server-sent events.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+from team_search import SearchControl
+
+TEAM_JOB_WORKERS = int(os.environ.get("TEAM_JOB_WORKERS", "2"))
+TEAM_JOB_RETENTION_SECONDS = float(os.environ.get("TEAM_JOB_RETENTION_SECONDS", "3600"))
+
+TERMINAL_STATUSES = ("done", "cancelled", "failed")
+
+_executor = ThreadPoolExecutor(max_workers=TEAM_JOB_WORKERS, thread_name_prefix="team-search")
+_jobs: dict[str, "TeamSearchJob"] = {}
+_jobs_lock = threading.Lock()
+
+
+# ── JOB ───────────────────────────────────────────────────────────────────────
+
+class TeamSearchJob:
+    """One submitted search: status, live progress and (eventually) its result."""
+
+    def __init__(self, search: Callable[[SearchControl], dict], params: dict,
+                 time_budget: Optional[float] = None):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.time_budget = time_budget
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = {"evaluated": 0, "done": 0.0, "eta_seconds": None, "best_team": None, "best_score": None}
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.version = 0
+        self._search = search
+        self._control = SearchControl(time_budget, on_progress=self._on_progress)
+        self._changed = threading.Condition()
+
+    def _touch(self) -> None:
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def _on_progress(self, evaluated: int, done: float, best: list[tuple]) -> None:
+        elapsed = time.time() - (self.started_at or self.created_at)
+        labels = self._control.labels
+        best_team, best_score = (best[0] if best else (None, None))
+        if best_team is not None and labels is not None:
+            best_team = [labels[i] for i in best_team]
+        self.progress = {
+            "evaluated":   evaluated,
+            "done":        round(done, 4),
+            "eta_seconds": round(elapsed * (1 - done) / done, 1) if done > 0 else None,
+            "best_team":   list(best_team) if best_team is not None else None,
+            "best_score":  best_score,
+        }
+        self._touch()
+
+    def run(self) -> None:
+        with self._changed:
+            # Cancelled while queued: cancel() already finished the job
+            if self.status != "queued":
+                return
+            self.status = "running"
+            self.started_at = time.time()
+            # The time budget counts from here, not from submission
+            self._control.start()
+            self._touch()
+        try:
+            self.result = self._search(self._control)
+            self.status = "cancelled" if self._control.stopped == "cancelled" else "done"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+        self.finished_at = time.time()
+        if self.status == "done":
+            self.progress = {**self.progress, "done": 1.0, "eta_seconds": 0.0}
+        self._touch()
+
+    def cancel(self) -> None:
+        with self._changed:
+            self._control.cancel()
+            if self.status == "queued":
+                # Still waiting for a worker: finished now, run() returns at once
+                self.status = "cancelled"
+                self.finished_at = time.time()
+                self._touch()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id":      self.id,
+            "status":      self.status,
+            "params":      self.params,
+            "time_budget": self.time_budget,
+            "created_at":  self.created_at,
+            "started_at":  self.started_at,
+            "finished_at": self.finished_at,
+            "progress":    self.progress,
+            "result":      self.result,
+            "error":       self.error,
+        }
+
+    def wait(self, after_version: int, timeout: float) -> int:
+        """Block until the job changes past `after_version` (or timeout); returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > after_version, timeout)
+            return self.version
+
+
+# ── REGISTRY ──────────────────────────────────────────────────────────────────
+
+def _evict_finished() -> None:
+    cutoff = time.time() - TEAM_JOB_RETENTION_SECONDS
+    for job_id in [j.id for j in _jobs.values() if j.finished and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def submit_job(search: Callable[[SearchControl], dict], params: dict,
+               time_budget: Optional[float] = None) -> TeamSearchJob:
+    """Queue search(control) on the job pool and return its job right away."""
+    job = TeamSearchJob(search, params, time_budget)
+    with _jobs_lock:
+        _evict_finished()
+        _jobs[job.id] = job
+    _executor.submit(job.run)
+    return job
+
+
+def get_job(job_id: str) -> Optional[TeamSearchJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def cancel_job(job_id: str) -> Optional[TeamSearchJob]:
+    job = get_job(job_id)
+    if job is not None:
+        job.cancel()
+    return job
+
+
+def job_events(job: TeamSearchJob, heartbeat: float = 15.0) -> Iterator[str]:
+    """Server-sent events: a "progress" event per change, then one final "result" event."""
+    version = -1
+    while True:
+        current = job.wait(version, heartbeat)
+        if current == version:
+            yield ": keep-alive\n\n"
+            continue
+        version = current
+        snapshot = job.snapshot()
+        if job.finished:
+            yield f"event: result\ndata: {json.dumps(snapshot)}\n\n"
+            return
+        snapshot.pop("result")
+        yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
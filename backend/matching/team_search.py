@@ -0,0 +1,1046 @@
+"""
+team_search.py
+==============
+Team search engine behind features.group_match().
+
+Every pair in the pool is scored once into a PairwiseMatrix (vectorized
+blocks via matching.pairwise_scores); team scoring then reads pair scores
+by index instead of calling compute_match() per pair per combination.
+A 40-person pool costs 780 pair scores instead of ~550k.
+
+Search modes: exhaustive (optionally sharded across processes), exact
+branch-and-bound, heuristic beam + local search, and whole-pool partitioning.
+"""
+
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import cached_property
+from itertools import combinations, islice
+from math import comb
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from matching import pairwise_row, pairwise_scores, scores_matrix, DIMENSION_ORDER
+
+# ── ROLE COVERAGE ─────────────────────────────────────────────────────────────
+
+# Key hackathon roles and the score that counts as "covered" by someone on the team
+TEAM_ROLE_THRESHOLDS = {
+    "execution_bias":     0.65,   # someone who ships
+    "systems_thinking":   0.65,   # someone who architects
+    "detail_orientation": 0.60,   # someone who catches bugs
+    "leadership_drive":   0.65,   # someone who drives
+    "novelty_seeking":    0.60,   # creative thinker (proxy for creativity)
+}
+COVERAGE_BONUS_PER_ROLE = 0.02
+
+
+def _coverage_bonus_table() -> list[float]:
+    """Bonus by number of covered roles, accumulated one role at a time like the original loop."""
+    table, bonus = [0.0], 0.0
+    for _ in TEAM_ROLE_THRESHOLDS:
+        bonus += COVERAGE_BONUS_PER_ROLE
+        table.append(bonus)
+    return table
+
+
+COVERAGE_BONUS = _coverage_bonus_table()
+
+# Pools up to this size get their pair scores copied into nested lists
+ROW_LIST_LIMIT = 2000
+
+
+# ── PAIRWISE MATRIX ───────────────────────────────────────────────────────────
+
+class PairwiseMatrix:
+    """
+    Pool-wide hackathon pair scores plus per-person role coverage.
+
+    scores[i, j] == compute_match(pool[i], pool[j], context).score for i < j
+    (mirrored below the diagonal). role_masks[i] has bit r set when person i
+    covers the r-th role in TEAM_ROLE_THRESHOLDS.
+    """
+
+    def __init__(self, vectors: list[dict], context: str = "hackathon"):
+        self.context = context
+        self.vectors = scores_matrix(vectors)
+        self.scores = pairwise_scores(self.vectors, context)
+        self.role_masks = self._role_masks(self.vectors)
+        self._masks = self.role_masks.tolist()
+
+    @classmethod
+    def from_arrays(cls, scores: np.ndarray, role_masks: np.ndarray, context: str = "hackathon") -> "PairwiseMatrix":
+        """Wrap already-computed pair scores and role masks (e.g. in a worker process)."""
+        matrix = cls.__new__(cls)
+        matrix.context = context
+        matrix.vectors = None
+        matrix.scores = scores
+        matrix.role_masks = role_masks
+        matrix._masks = role_masks.tolist()
+        return matrix
+
+    def copy(self) -> "PairwiseMatrix":
+        """An independent copy (set_member() rescores rows in place)."""
+        matrix = self.from_arrays(self.scores.copy(), self.role_masks.copy(), self.context)
+        matrix.vectors = None if self.vectors is None else self.vectors.copy()
+        return matrix
+
+    @cached_property
+    def _rows(self):
+        """
+        Row access for the scalar team loops. Nested lists index ~3x faster
+        than an ndarray, but cost a Python float per pair, so large pools
+        keep reading the ndarray.
+        """
+        if len(self) <= ROW_LIST_LIMIT:
+            return self.scores.tolist()
+        return self.scores
+
+    @staticmethod
+    def _role_masks(vectors: np.ndarray) -> np.ndarray:
+        masks = np.zeros(vectors.shape[0], dtype=np.int64)
+        for bit, (role_var, threshold) in enumerate(TEAM_ROLE_THRESHOLDS.items()):
+            covered = vectors[:, DIMENSION_ORDER.index(role_var)] >= threshold
+            masks |= covered.astype(np.int64) << bit
+        return masks
+
+    def __len__(self) -> int:
+        return self.scores.shape[0]
+
+    def set_member(self, i: int, vector: dict) -> None:
+        """
+        Replace pool member i, or append a new member when i == len(self).
+        Only row/column i is rescored.
+        """
+        row_vector = scores_matrix([vector])
+        appending = i == len(self)
+        if appending:
+            self.vectors = np.vstack([self.vectors, row_vector])
+            self.scores = np.pad(self.scores, ((0, 1), (0, 1)))
+            self.role_masks = np.append(self.role_masks, 0)
+            self._masks.append(0)
+        else:
+            self.vectors[i] = row_vector[0]
+
+        row = pairwise_row(self.vectors, i, self.context)
+        self.scores[i, :] = row
+        self.scores[:, i] = row
+        mask = int(self._role_masks(row_vector)[0])
+        self.role_masks[i] = mask
+        self._masks[i] = mask
+
+        rows = self.__dict__.get("_rows")
+        if isinstance(rows, list):
+            values = row.tolist()
+            if appending:
+                for j, r in enumerate(rows):
+                    r.append(values[j])
+                rows.append(values)
+            else:
+                for j, r in enumerate(rows):
+                    r[i] = values[j]
+                rows[i] = values
+        else:
+            self.__dict__.pop("_rows", None)
+
+    def remove_member(self, i: int) -> None:
+        """Drop pool member i; everyone after it shifts down one index."""
+        self.vectors = np.delete(self.vectors, i, axis=0)
+        self.scores = np.delete(np.delete(self.scores, i, axis=0), i, axis=1)
+        self.role_masks = np.delete(self.role_masks, i)
+        del self._masks[i]
+
+        rows = self.__dict__.get("_rows")
+        if isinstance(rows, list):
+            del rows[i]
+            for r in rows:
+                del r[i]
+        else:
+            self.__dict__.pop("_rows", None)
+
+    def pair(self, i: int, j: int) -> float:
+        return self._rows[i][j]
+
+    def team_score(self, team) -> float:
+        """
+        Pairwise average + role coverage bonus for a team of pool indices,
+        listed in pool order. Pair scores are summed in combinations() order.
+        """
+        rows, masks = self._rows, self._masks
+        pair_scores = [rows[i][j] for i, j in combinations(team, 2)]
+        covered = 0
+        for i in team:
+            covered |= masks[i]
+        avg_pairwise = float(sum(pair_scores) / len(pair_scores))
+        return round(avg_pairwise + COVERAGE_BONUS[bin(covered).count("1")], 4)
+
+    def pairwise_breakdown(self, team, names: list[str]) -> dict:
+        """{"A × B": score} for every pair in the team, in combinations() order."""
+        return {
+            f"{names[i]} × {names[j]}": float(self._rows[i][j])
+            for i, j in combinations(team, 2)
+        }
+
+
+# ── SEARCH CONTROL ────────────────────────────────────────────────────────────
+
+class SearchControl:
+    """
+    Progress reporting, cancellation and a time budget for one team search.
+
+    Searches call checkpoint() every so often with how much work is done and
+    a callable returning the best [(team, score)] so far; it forwards that to
+    `on_progress` (at most every `interval` seconds) and tells the search
+    whether to keep going. A stopped search returns the best teams it found.
+    """
+
+    def __init__(self, time_budget: Optional[float] = None, on_progress=None, interval: float = 0.5):
+        self.time_budget = time_budget
+        self.start()
+        self.on_progress = on_progress
+        self.interval = interval
+        self.labels: Optional[list[str]] = None    # pool names, set by the caller for progress reports
+        self.evaluated = 0
+        self.stopped: Optional[str] = None         # None | "cancelled" | "time_budget"
+        self._cancelled = threading.Event()
+        self._last_report = 0.0
+
+    def start(self) -> None:
+        """Restart the clock, e.g. when a queued search finally gets a worker."""
+        self.started = time.monotonic()
+        self.deadline = self.started + self.time_budget if self.time_budget else None
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def checkpoint(self, evaluated: int, done: float, best) -> bool:
+        """
+        evaluated: teams/nodes scored so far; done: fraction of the search
+        space covered (0-1); best: callable returning [(team, score)].
+        Returns False when the search should stop.
+        """
+        self.evaluated = evaluated
+        now = time.monotonic()
+        if self.cancelled:
+            self.stopped = "cancelled"
+        elif self.deadline is not None and now >= self.deadline:
+            self.stopped = "time_budget"
+        if self.on_progress is not None and (self.stopped or now - self._last_report >= self.interval):
+            self._last_report = now
+            self.on_progress(evaluated, done, best())
+        return self.stopped is None
+
+    def summary(self) -> dict:
+        return {
+            "complete":        self.stopped is None,
+            "stopped":         self.stopped,
+            "elapsed_seconds": round(time.monotonic() - self.started, 3),
+        }
+
+
+# ── TOP-K ENUMERATION ─────────────────────────────────────────────────────────
+
+# Combinations scored between SearchControl checkpoints
+CHECKPOINT_EVERY = 4096
+
+# Best team + 3 runner-ups
+TOP_K_TEAMS = 4
+
+
+def _team_key(team: tuple, score: float) -> tuple:
+    """
+    Heap ordering for teams: higher score first, then earlier in combinations()
+    order — the same ranking as a stable descending sort of every combination.
+    """
+    return (score, tuple(-i for i in team))
+
+
+class TeamHeap:
+    """
+    Bounded min-heap of the k best (team, score) pairs seen so far, ranked by
+    _team_key. Pushing a team that is already held is a no-op, so seeded or
+    merged results can overlap safely.
+    """
+
+    def __init__(self, k: int = TOP_K_TEAMS):
+        self.k = k
+        self._heap: list[tuple] = []
+        self._teams: set = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def full(self) -> bool:
+        return len(self._heap) >= self.k
+
+    @property
+    def kth_score(self) -> float:
+        """Score a team must reach to enter (-inf while not full)."""
+        return self._heap[0][0][0] if self.full else float("-inf")
+
+    def push(self, team: tuple, score: float) -> None:
+        if team in self._teams:
+            return
+        entry = (_team_key(team, score), team)
+        if not self.full:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            self._teams.discard(heapq.heappushpop(self._heap, entry)[1])
+        else:
+            return
+        self._teams.add(team)
+
+    def results(self) -> list[tuple]:
+        """[(team, score)], best first."""
+        return [(team, key[0]) for key, team in sorted(self._heap, reverse=True)]
+
+
+def top_k_teams(
+    matrix: PairwiseMatrix,
+    team_size: int,
+    k: int = TOP_K_TEAMS,
+    control: Optional[SearchControl] = None,
+) -> list[tuple]:
+    """
+    Stream every combination of `team_size` pool indices through a bounded
+    min-heap and return the k best as [(team, score)], best first.
+    Memory is O(k) regardless of pool size.
+    """
+    heap = TeamHeap(k)
+    total = comb(len(matrix), team_size)
+    combos = combinations(range(len(matrix)), team_size)
+    evaluated = 0
+    while chunk := list(islice(combos, CHECKPOINT_EVERY)):
+        for team in chunk:
+            score = matrix.team_score(team)
+            if score >= heap.kth_score:
+                heap.push(team, score)
+        evaluated += len(chunk)
+        if control is not None and not control.checkpoint(evaluated, evaluated / total, heap.results):
+            break
+    return heap.results()
+
+
+# ── SHARDED ENUMERATION ───────────────────────────────────────────────────────
+
+# Worker processes for exhaustive search; 1 keeps it in-process
+TEAM_SEARCH_WORKERS = int(os.environ.get("TEAM_SEARCH_WORKERS", "1"))
+
+# Per-worker state, set once by _attach_worker
+_worker_matrix: PairwiseMatrix = None
+_worker_shm: shared_memory.SharedMemory = None
+
+
+def _attach_worker(shm_name: str, n: int, role_masks: list[int], context: str) -> None:
+    """Process-pool initializer: map the parent's pair-score matrix without copying it."""
+    global _worker_matrix, _worker_shm
+    # Workers share the parent's resource tracker, so the parent's unlink() covers this attach too
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    scores = np.ndarray((n, n), dtype=np.float64, buffer=_worker_shm.buf)
+    _worker_matrix = PairwiseMatrix.from_arrays(scores, np.array(role_masks, dtype=np.int64), context)
+
+
+def _first_member_top_k(matrix: PairwiseMatrix, team_size: int, first: int, k: int) -> list[tuple]:
+    """Top-k over the shard of combinations whose lowest pool index is `first`."""
+    heap = TeamHeap(k)
+    for rest in combinations(range(first + 1, len(matrix)), team_size - 1):
+        team = (first,) + rest
+        score = matrix.team_score(team)
+        if score >= heap.kth_score:
+            heap.push(team, score)
+    return heap.results()
+
+
+def _run_shard(args: tuple) -> list[tuple]:
+    team_size, first, k = args
+    return _first_member_top_k(_worker_matrix, team_size, first, k)
+
+
+def sharded_top_k_teams(
+    matrix: PairwiseMatrix,
+    team_size: int,
+    workers: int = TEAM_SEARCH_WORKERS,
+    k: int = TOP_K_TEAMS,
+    control: Optional[SearchControl] = None,
+) -> list[tuple]:
+    """
+    top_k_teams() spread across a process pool. The combination space is
+    sharded by first member index; workers read the pair-score matrix from
+    shared memory and each shard's top-k is merged into one heap. The merge
+    ranks by _team_key, so results are identical for any worker count.
+    """
+    if workers <= 1:
+        return top_k_teams(matrix, team_size, k, control)
+
+    n = len(matrix)
+    shm = shared_memory.SharedMemory(create=True, size=matrix.scores.nbytes)
+    try:
+        np.ndarray(matrix.scores.shape, dtype=np.float64, buffer=shm.buf)[:] = matrix.scores
+        heap = TeamHeap(k)
+        total, evaluated = comb(n, team_size), 0
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach_worker,
+            initargs=(shm.name, n, matrix.role_masks.tolist(), matrix.context),
+        ) as pool:
+            shards = {
+                pool.submit(_run_shard, (team_size, first, k)): comb(n - 1 - first, team_size - 1)
+                for first in range(n - team_size + 1)
+            }
+            for future in as_completed(shards):
+                for team, score in future.result():
+                    heap.push(team, score)
+                evaluated += shards[future]
+                if control is not None and not control.checkpoint(evaluated, evaluated / total, heap.results):
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    break
+        return heap.results()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# ── HEURISTIC SEARCH ──────────────────────────────────────────────────────────
+
+BEAM_WIDTH     = 64
+MAX_SWAP_ITERS = 500
+
+
+def _coverage_bonus_by_mask() -> np.ndarray:
+    """Coverage bonus for every possible role bitmask."""
+    return np.array([COVERAGE_BONUS[bin(m).count("1")] for m in range(1 << len(TEAM_ROLE_THRESHOLDS))])
+
+
+def team_upper_bound(matrix: PairwiseMatrix, team_size: int) -> float:
+    """
+    Score no team of `team_size` from this pool can exceed.
+
+    Each member contributes at most its (team_size - 1) strongest pair scores,
+    so the pair total is at most half the sum of the team_size largest such
+    row sums; coverage is capped by the roles anyone in the pool covers.
+    """
+    n = len(matrix)
+    pairs = team_size * (team_size - 1) // 2
+    kth = n - (team_size - 1)
+    row_best = np.partition(matrix.scores, kth, axis=1)[:, kth:].sum(axis=1)
+    pair_total = np.partition(row_best, n - team_size)[n - team_size:].sum() / 2
+    pool_mask = int(np.bitwise_or.reduce(matrix.role_masks))
+    return round(float(pair_total / pairs) + COVERAGE_BONUS[bin(pool_mask).count("1")], 4)
+
+
+def _beam_search(matrix: PairwiseMatrix, team_size: int, beam_width: int, bonus: np.ndarray) -> list[tuple]:
+    """
+    Grow teams one member at a time, keeping the `beam_width` best partial
+    teams (pairwise average + coverage so far) at every size.
+    Returns the final beam as sorted index tuples.
+    """
+    scores, masks = matrix.scores, matrix.role_masks
+    n = len(matrix)
+
+    # Seed with the people who have the strongest (team_size - 1) pair scores
+    kth = n - (team_size - 1)
+    potential = np.partition(scores, kth, axis=1)[:, kth:].sum(axis=1)
+    seeds = np.argsort(-potential, kind="stable")[:beam_width]
+    beam = [((int(i),), 0.0, int(masks[i]), scores[i].copy()) for i in seeds]
+
+    for size in range(2, team_size + 1):
+        pairs = size * (size - 1) // 2
+        expanded = {}
+        for team, pair_sum, mask, col_sum in beam:
+            value = (pair_sum + col_sum) / pairs + bonus[mask | masks]
+            value[list(team)] = -np.inf
+            take = min(beam_width, n - len(team))
+            for j in np.argpartition(-value, take - 1)[:take]:
+                grown = tuple(sorted(team + (int(j),)))
+                if grown not in expanded or value[j] > expanded[grown][0]:
+                    expanded[grown] = (float(value[j]), team, pair_sum, mask, col_sum, int(j))
+        ranked = sorted(expanded.items(), key=lambda kv: (-kv[1][0], kv[0]))[:beam_width]
+        beam = [
+            (grown, pair_sum + col_sum[j], mask | int(masks[j]), col_sum + scores[j])
+            for grown, (_, _, pair_sum, mask, col_sum, j) in ranked
+        ]
+    return [team for team, _, _, _ in beam]
+
+
+def _swap_improve(matrix: PairwiseMatrix, team: tuple, bonus: np.ndarray, max_iters: int) -> tuple[tuple, int]:
+    """
+    Best-improvement local search: repeatedly swap the one member for the one
+    outsider that raises the team score most, until no swap helps.
+    Returns (team, swaps made).
+    """
+    scores, masks = matrix.scores, matrix.role_masks
+    team = list(team)
+    pairs = len(team) * (len(team) - 1) // 2
+    iters = 0
+    while iters < max_iters:
+        col_sum = scores[team].sum(axis=0)
+        pair_sum = col_sum[team].sum() / 2
+        current = pair_sum / pairs + bonus[np.bitwise_or.reduce(masks[team])]
+        best_gain, best_swap = 1e-12, None
+        for pos, out in enumerate(team):
+            others = team[:pos] + team[pos + 1:]
+            others_mask = int(np.bitwise_or.reduce(masks[others]))
+            value = (pair_sum - col_sum[out] + col_sum - scores[out]) / pairs + bonus[others_mask | masks]
+            value[team] = -np.inf
+            j = int(np.argmax(value))
+            if value[j] - current > best_gain:
+                best_gain, best_swap = value[j] - current, (pos, j)
+        if best_swap is None:
+            break
+        team[best_swap[0]] = best_swap[1]
+        iters += 1
+    return tuple(sorted(team)), iters
+
+
+def heuristic_top_teams(
+    matrix: PairwiseMatrix,
+    team_size: int,
+    k: int = TOP_K_TEAMS,
+    beam_width: int = BEAM_WIDTH,
+    max_iters: int = MAX_SWAP_ITERS,
+    control: Optional[SearchControl] = None,
+) -> tuple[list[tuple], dict]:
+    """
+    Approximate top-k teams for pools too large to enumerate: beam search
+    over the pairwise matrix, then swap-based local search on the best
+    beam teams. Returns ([(team, score)], search report).
+    """
+    bonus = _coverage_bonus_by_mask()
+    beam = _beam_search(matrix, team_size, beam_width, bonus)
+    beam.sort(key=lambda team: _team_key(team, matrix.team_score(team)), reverse=True)
+
+    def ranked() -> list[tuple]:
+        return sorted(
+            ((team, matrix.team_score(team)) for team in candidates),
+            key=lambda ts: _team_key(*ts),
+            reverse=True,
+        )[:k]
+
+    candidates, iterations = set(beam), 0
+    to_improve = beam[:2 * k]
+    for done, team in enumerate(to_improve, 1):
+        improved, iters = _swap_improve(matrix, team, bonus, max_iters)
+        candidates.add(improved)
+        iterations += iters
+        if control is not None and not control.checkpoint(len(candidates), done / len(to_improve), ranked):
+            break
+
+    scored = ranked()
+    best_score = scored[0][1]
+    upper_bound = team_upper_bound(matrix, team_size)
+    report = {
+        "mode":        "heuristic",
+        "best_score":  best_score,
+        "iterations":  iterations,
+        "evaluated":   len(candidates),
+        "upper_bound": upper_bound,
+        "gap":         round(max(upper_bound - best_score, 0.0), 4),
+    }
+    return scored, report
+
+
+# ── EXACT BRANCH-AND-BOUND ────────────────────────────────────────────────────
+
+# Slack on pruning comparisons: covers rounding scores to 4 places plus the
+# float error between bound arithmetic and team_score()'s summation order.
+PRUNE_SLACK = 1e-4
+
+# Branch-and-bound nodes expanded between SearchControl checkpoints
+CHECKPOINT_NODES = 1024
+
+
+def exact_top_teams(
+    matrix: PairwiseMatrix,
+    team_size: int,
+    k: int = TOP_K_TEAMS,
+    control: Optional[SearchControl] = None,
+) -> tuple[list[tuple], dict]:
+    """
+    Exact top-k teams by branch-and-bound. Returns the same [(team, score)]
+    as top_k_teams(), plus a search report.
+
+    Teams grow one member at a time in pool order. A partial team is pruned
+    when its best possible score — current pair sum, plus each candidate's
+    pair scores to the team and half its strongest pair scores overall
+    (for pairs among the members still to add), plus the coverage bonus of
+    every role still reachable — falls short of the current k-th best.
+    The heap is seeded with the heuristic's teams so pruning bites early.
+    Progress counts a first member's whole subtree as done once it is closed.
+    """
+    scores, masks = matrix.scores, matrix.role_masks
+    n = len(matrix)
+    bonus = _coverage_bonus_by_mask()
+    pairs = team_size * (team_size - 1) // 2
+
+    # half_best[q][j]: half the sum of person j's q strongest pair scores
+    ordered = -np.sort(-scores, axis=1)
+    half_best = [np.zeros(n)] + [ordered[:, :q].sum(axis=1) / 2 for q in range(1, team_size)]
+    # reachable[i]: roles covered by anyone at pool index >= i
+    reachable = np.bitwise_or.accumulate(masks[::-1])[::-1].tolist() + [0]
+
+    heap = TeamHeap(k)
+    seeded, _ = heuristic_top_teams(matrix, team_size, k)
+    for team, score in seeded:
+        heap.push(team, score)
+
+    stats = {"nodes": 0, "pruned": 0, "evaluated": 0}
+
+    total, covered = comb(n, team_size), 0
+
+    def expand(team: tuple, pair_sum: float, mask: int, col_sum: np.ndarray) -> None:
+        stats["nodes"] += 1
+        if control is not None and (control.stopped or (
+                stats["nodes"] % CHECKPOINT_NODES == 0
+                and not control.checkpoint(stats["nodes"], covered / total, heap.results))):
+            return
+        remaining = team_size - len(team)
+        lo = team[-1] + 1
+        if remaining == 1:
+            # Last member: score every candidate at once, then confirm exactly
+            approx = (pair_sum + col_sum[lo:]) / pairs + bonus[mask | masks[lo:]]
+            for j in np.flatnonzero(approx >= heap.kth_score - PRUNE_SLACK):
+                grown = team + (lo + int(j),)
+                heap.push(grown, matrix.team_score(grown))
+                stats["evaluated"] += 1
+            return
+
+        gains = col_sum[lo:] + half_best[remaining - 1][lo:]
+        best_gain = np.partition(gains, len(gains) - remaining)[len(gains) - remaining:].sum()
+        upper = (pair_sum + best_gain) / pairs + COVERAGE_BONUS[bin(mask | reachable[lo]).count("1")]
+        if upper < heap.kth_score - PRUNE_SLACK:
+            stats["pruned"] += 1
+            return
+
+        for j in range(lo, n - remaining + 1):
+            expand(team + (j,), pair_sum + col_sum[j], mask | int(masks[j]), col_sum + scores[j])
+
+    for i in range(n - team_size + 1):
+        expand((i,), 0.0, int(masks[i]), scores[i])
+        covered += comb(n - 1 - i, team_size - 1)
+        if control is not None and not control.checkpoint(stats["nodes"], covered / total, heap.results):
+            break
+
+    return heap.results(), {"mode": "exact", **stats}
+
+
+# ── WHOLE-POOL PARTITIONING ───────────────────────────────────────────────────
+
+PARTITION_OBJECTIVES = ("total", "min")
+MAX_PARTITION_PASSES = 30
+
+
+class _Partition:
+    """
+    Mutable assignment of every pool index to a team, with the running
+    per-team sums needed to price a member swap in O(n):
+    col_sums[t, j] is the sum of pair scores between person j and team t.
+    """
+
+    def __init__(self, matrix: PairwiseMatrix, teams: list[list[int]], bonus: np.ndarray):
+        self.scores, self.masks, self.bonus = matrix.scores, matrix.role_masks, bonus
+        self.teams = [list(team) for team in teams]
+        self.team_of = np.empty(len(matrix), dtype=np.intp)
+        self.col_sums = np.zeros((len(teams), len(matrix)))
+        self.pair_sums = np.zeros(len(teams))
+        self.pairs = np.array([len(t) * (len(t) - 1) // 2 for t in teams], dtype=float)
+        self.others_mask = np.zeros(len(matrix), dtype=np.int64)
+        self.team_mask = np.zeros(len(teams), dtype=np.int64)
+        for t in range(len(teams)):
+            self._refresh(t)
+
+    def _refresh(self, t: int) -> None:
+        team = self.teams[t]
+        self.team_of[team] = t
+        self.col_sums[t] = self.scores[team].sum(axis=0)
+        self.pair_sums[t] = self.col_sums[t, team].sum() / 2
+        self.team_mask[t] = np.bitwise_or.reduce(self.masks[team])
+        for pos, i in enumerate(team):
+            self.others_mask[i] = np.bitwise_or.reduce(self.masks[team[:pos] + team[pos + 1:]]) if len(team) > 1 else 0
+
+    def values(self) -> np.ndarray:
+        return self.pair_sums / self.pairs + self.bonus[self.team_mask]
+
+    def swap_values(self, a: int) -> tuple[np.ndarray, np.ndarray]:
+        """New scores of (a's team, the other team) if a swapped with each person."""
+        s, A, idx = self.scores, self.team_of[a], self.team_of
+        cross = s[a]
+        everyone = np.arange(len(idx))
+        new_a = (self.pair_sums[A] - self.col_sums[A, a] + self.col_sums[A] - cross) / self.pairs[A] \
+            + self.bonus[self.others_mask[a] | self.masks]
+        new_b = (self.pair_sums[idx] - self.col_sums[idx, everyone] + self.col_sums[idx, a] - cross) / self.pairs[idx] \
+            + self.bonus[self.others_mask | self.masks[a]]
+        return new_a, new_b
+
+    def swap(self, a: int, b: int) -> None:
+        A, B = self.team_of[a], self.team_of[b]
+        self.teams[A][self.teams[A].index(a)] = b
+        self.teams[B][self.teams[B].index(b)] = a
+        self._refresh(A)
+        self._refresh(B)
+
+
+def _greedy_teams(matrix: PairwiseMatrix, team_size: int, objective: str, bonus: np.ndarray) -> list[list[int]]:
+    """
+    Seed a partition. "total": fill one team at a time around the strongest
+    remaining person. "min": snake-draft — every team gets a seed, then the
+    weakest team picks the best remaining person each turn.
+    Leftovers (pool size not divisible by team_size) join the team they raise
+    most, at most one per team; when there are more leftovers than teams
+    they form one smaller team of their own instead.
+    """
+    scores, masks = matrix.scores, matrix.role_masks
+    n = len(matrix)
+    n_teams = n // team_size
+    free = np.ones(n, dtype=bool)
+    kth = n - (team_size - 1)
+    potential = np.partition(scores, kth, axis=1)[:, kth:].sum(axis=1)
+
+    def best_addition(team: list[int]) -> int:
+        pairs = len(team) * (len(team) + 1) // 2
+        col_sum = scores[team].sum(axis=0)
+        pair_sum = col_sum[team].sum() / 2
+        value = (pair_sum + col_sum) / pairs + bonus[np.bitwise_or.reduce(masks[team]) | masks]
+        value[~free] = -np.inf
+        return int(np.argmax(value))
+
+    def value(team: list[int]) -> float:
+        pairs = max(len(team) * (len(team) - 1), 1)
+        return scores[team][:, team].sum() / pairs + bonus[np.bitwise_or.reduce(masks[team])]
+
+    def take(i: int) -> int:
+        free[i] = False
+        return i
+
+    by_potential = np.argsort(-potential, kind="stable").tolist()
+    if objective == "total":
+        teams = []
+        for _ in range(n_teams):
+            team = [take(next(i for i in by_potential if free[i]))]
+            while len(team) < team_size:
+                team.append(take(best_addition(team)))
+            teams.append(team)
+    else:
+        teams = [[take(i)] for i in by_potential[:n_teams]]
+        for _ in range(team_size - 1):
+            for t in np.argsort([value(team) for team in teams], kind="stable"):
+                teams[t].append(take(best_addition(teams[t])))
+
+    leftovers = np.flatnonzero(free).tolist()
+    if len(leftovers) > n_teams:
+        # e.g. 7 people in teams of 4: a team of 4 and a team of 3
+        teams.append([take(i) for i in leftovers])
+    else:
+        open_teams = list(range(n_teams))
+        for i in leftovers:
+            t = max(open_teams, key=lambda t: value(teams[t] + [i]) - value(teams[t]))
+            teams[t].append(take(i))
+            open_teams.remove(t)
+    assert not free.any() and all(len(team) >= 2 for team in teams), \
+        f"Could not split {n} people into teams of {team_size}"
+    return [sorted(team) for team in teams]
+
+
+def partition_pool(
+    matrix: PairwiseMatrix,
+    team_size: int,
+    objective: str = "total",
+    max_passes: int = MAX_PARTITION_PASSES,
+    control: Optional[SearchControl] = None,
+) -> tuple[list[tuple], dict]:
+    """
+    Split the whole pool into disjoint teams of `team_size`. When the pool
+    doesn't divide evenly a few teams get one extra member, or, with more
+    leftovers than teams, the leftovers form one smaller team.
+
+    objective="total" maximizes the sum of team scores; "min" maximizes the
+    weakest team's score. Greedy seeding, then passes of pairwise member
+    swaps between teams until no swap improves the objective.
+    Returns ([(team, score)] best first, search report).
+    """
+    assert objective in PARTITION_OBJECTIVES, f"Invalid objective: {objective}. Choose from {PARTITION_OBJECTIVES}"
+    assert len(matrix) >= team_size, f"Need at least {team_size} people in the pool"
+    bonus = _coverage_bonus_by_mask()
+    part = _Partition(matrix, _greedy_teams(matrix, team_size, objective, bonus), bonus)
+
+    def ranked() -> list[tuple]:
+        return sorted(
+            ((tuple(sorted(team)), matrix.team_score(sorted(team))) for team in part.teams),
+            key=lambda ts: _team_key(*ts),
+            reverse=True,
+        )
+
+    passes = swaps = 0
+    while passes < max_passes and len(part.teams) > 1:
+        passes += 1
+        improved = False
+        for a in range(len(matrix)):
+            new_a, new_b = part.swap_values(a)
+            current = part.values()
+            cur_a, cur_b = current[part.team_of[a]], current[part.team_of]
+            if objective == "total":
+                gain = new_a + new_b - cur_a - cur_b
+            else:
+                gain = np.minimum(new_a, new_b) - np.minimum(cur_a, cur_b)
+            gain[part.team_of == part.team_of[a]] = -np.inf
+            b = int(np.argmax(gain))
+            if gain[b] > 1e-9:
+                part.swap(a, b)
+                swaps += 1
+                improved = True
+        if not improved:
+            break
+        if control is not None and not control.checkpoint(swaps, passes / max_passes, ranked):
+            break
+
+    scored = ranked()
+    team_scores = [score for _, score in scored]
+    report = {
+        "mode":        "partition",
+        "objective":   objective,
+        "teams":       len(scored),
+        "passes":      passes,
+        "swaps":       swaps,
+        "total_score": round(sum(team_scores), 4),
+        "min_score":   min(team_scores),
+        "mean_score":  round(sum(team_scores) / len(team_scores), 4),
+    }
+    if control is not None:
+        report.update(control.summary())
+    return scored, report
+
+
+# ── INCREMENTAL STATE ─────────────────────────────────────────────────────────
+
+# Best teams kept per team size, so a removal can promote the next ones
+TEAM_STATE_BUFFER = 4 * TOP_K_TEAMS
+
+
+class TeamSearchState:
+    """
+    Persistent team search for one pool (e.g. a server's active users): the
+    pairwise matrix plus a buffer of the best teams for each team size.
+
+    When one user joins, changes or leaves, only their matrix row/column is
+    rescored and only the buffered teams they touch are repaired — O(n) per
+    affected team instead of rebuilding the matrix and redoing the search.
+
+    A removal keeps an exact buffer exact: the surviving teams are still the
+    best ones left, and repaired teams rank below them. A join or score change
+    can create better teams anywhere, so it only patches the buffer (swap the
+    user into each buffered team, grow a team around them) and marks it
+    inexact; top_teams(exact=True) then re-runs branch-and-bound on the
+    already-updated matrix. Not thread-safe on its own — hold `lock`. Long
+    searches run on a snapshot() outside the lock; adopt() then keeps their
+    buffer if no update came in meanwhile.
+    """
+
+    def __init__(self, ids: list[str], vectors: list[dict], context: str = "hackathon",
+                 buffer: int = TEAM_STATE_BUFFER):
+        assert len(ids) == len(vectors)
+        self.ids = list(ids)
+        self.vector_dicts = list(vectors)
+        self.matrix = PairwiseMatrix(vectors, context)
+        self.buffer = buffer
+        self.lock = threading.RLock()
+        self.built_at = time.time()
+        self.updates = 0
+        self._index = {uid: i for i, uid in enumerate(self.ids)}
+        self._teams: dict[int, list[tuple]] = {}    # team_size -> buffered teams as id tuples
+        self._exact_depth: dict[int, int] = {}      # team_size -> leading buffer entries known exact
+        self._reports: dict[int, tuple] = {}        # team_size -> (search report, updates when it ran)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._index
+
+    def _team(self, member_ids: tuple) -> tuple:
+        return tuple(sorted(self._index[uid] for uid in member_ids))
+
+    def _store(self, team_size: int, teams) -> None:
+        heap = TeamHeap(self.buffer)
+        for team in teams:
+            heap.push(team, self.matrix.team_score(team))
+        self._teams[team_size] = [tuple(self.ids[i] for i in team) for team, _ in heap.results()]
+
+    def _complete(self, members: list[int], team_size: int) -> tuple:
+        """Greedily fill a partial team with whoever raises its score most."""
+        scores, masks = self.matrix.scores, self.matrix.role_masks
+        bonus = _coverage_bonus_by_mask()
+        members = list(members)
+        while len(members) < team_size:
+            pairs = len(members) * (len(members) + 1) // 2
+            col_sum = scores[members].sum(axis=0)
+            value = (col_sum[members].sum() / 2 + col_sum) / pairs \
+                + bonus[int(np.bitwise_or.reduce(masks[members])) | masks]
+            value[members] = -np.inf
+            members.append(int(np.argmax(value)))
+        return tuple(sorted(members))
+
+    def snapshot(self) -> "TeamSearchState":
+        """A copy of the pool, matrix and buffers to search without holding `lock`."""
+        state = TeamSearchState.__new__(TeamSearchState)
+        state.ids = list(self.ids)
+        state.vector_dicts = list(self.vector_dicts)
+        state.matrix = self.matrix.copy()
+        state.buffer = self.buffer
+        state.lock = threading.RLock()
+        state.built_at = self.built_at
+        state.updates = self.updates
+        state._index = dict(self._index)
+        state._teams = dict(self._teams)
+        state._exact_depth = dict(self._exact_depth)
+        state._reports = dict(self._reports)
+        return state
+
+    def adopt(self, snapshot: "TeamSearchState", team_size: int) -> bool:
+        """
+        Take a snapshot's buffer for team_size after searching it, unless this
+        state was updated since the snapshot was taken (then the search's
+        teams may be stale; the next call searches again). Hold `lock`.
+        """
+        if snapshot.updates != self.updates or team_size not in snapshot._teams:
+            return False
+        self._teams[team_size] = snapshot._teams[team_size]
+        self._exact_depth[team_size] = snapshot._exact_depth[team_size]
+        self._reports[team_size] = snapshot._reports[team_size]
+        return True
+
+    def needs_search(self, team_size: int, k: int = TOP_K_TEAMS, exact: bool = True) -> bool:
+        """Whether top_teams() would search rather than serve the buffer."""
+        return team_size not in self._teams or (exact and self._exact_depth[team_size] < k)
+
+    def top_teams(self, team_size: int, k: int = TOP_K_TEAMS, exact: bool = True,
+                  control: Optional[SearchControl] = None) -> tuple[list[tuple], dict]:
+        """
+        Best k teams as [(team, score)] with pool indices, plus a report:
+        the report of the search that filled the buffer (its best_score,
+        gap, pruned nodes, ...) with the buffer's own state on top.
+        exact=True guarantees the same teams as exhaustive search, re-running
+        branch-and-bound only when updates since the last search require it
+        (and the search isn't cut short through `control`).
+        exact=False serves the incrementally maintained buffer as-is.
+        """
+        assert len(self) >= team_size, f"Need at least {team_size} people in the pool"
+        searched = False
+        if self.needs_search(team_size, k, exact):
+            if exact:
+                scored, search = exact_top_teams(self.matrix, team_size, self.buffer, control)
+                self._exact_depth[team_size] = len(scored) if control is None or control.stopped is None else 0
+            else:
+                scored, search = heuristic_top_teams(self.matrix, team_size, self.buffer, control=control)
+                self._exact_depth[team_size] = 0
+            self._teams[team_size] = [tuple(self.ids[i] for i in team) for team, _ in scored]
+            self._reports[team_size] = (search, self.updates)
+            searched = True
+
+        teams = [self._team(member_ids) for member_ids in self._teams[team_size][:k]]
+        scored = [(team, self.matrix.team_score(team)) for team in teams]
+        search, searched_at = self._reports[team_size]
+        report = {
+            **search,
+            "exact":                self._exact_depth[team_size] >= k,
+            "searched":             searched,
+            "updates":              self.updates,
+            "updates_since_search": self.updates - searched_at,
+            "pool":                 len(self),
+        }
+        if control is not None:
+            report.update(control.summary())
+        return scored, report
+
+    def upsert(self, user_id: str, vector: dict) -> None:
+        """Add a user to the pool, or refresh their scores."""
+        i = self._index.get(user_id)
+        if i is None:
+            i = len(self.ids)
+            self.ids.append(user_id)
+            self.vector_dicts.append(vector)
+            self._index[user_id] = i
+        else:
+            self.vector_dicts[i] = vector
+        self.matrix.set_member(i, vector)
+        self.updates += 1
+
+        for team_size, buffered in self._teams.items():
+            teams = [self._team(member_ids) for member_ids in buffered]
+            candidates = list(teams)
+            for team in teams:
+                if i not in team:
+                    candidates += [tuple(sorted(team[:pos] + team[pos + 1:] + (i,))) for pos in range(team_size)]
+            candidates.append(self._complete([i], team_size))
+            self._store(team_size, candidates)
+            self._exact_depth[team_size] = 0
+
+    def remove(self, user_id: str) -> None:
+        """Drop a user (left the server or got flagged) and repair their teams."""
+        i = self._index.get(user_id)
+        if i is None:
+            return
+        self.matrix.remove_member(i)
+        del self.ids[i]
+        del self.vector_dicts[i]
+        self._index = {uid: j for j, uid in enumerate(self.ids)}
+        self.updates += 1
+
+        for team_size in list(self._teams):
+            if len(self) < team_size:
+                del self._teams[team_size], self._exact_depth[team_size], self._reports[team_size]
+                continue
+            buffered = self._teams[team_size]
+            depth = self._exact_depth[team_size]
+            kept = [self._team(ids) for ids in buffered if user_id not in ids]
+            repaired = [
+                self._complete([self._index[uid] for uid in ids if uid != user_id], team_size)
+                for ids in buffered if user_id in ids
+            ]
+            self._exact_depth[team_size] = depth - sum(user_id in ids for ids in buffered[:depth])
+            self._store(team_size, kept + repaired)
+
+
+# ── DISPATCH ──────────────────────────────────────────────────────────────────
+
+SEARCH_MODES = ("exhaustive", "exact", "heuristic")
+# What the group endpoints accept: a top-k search mode, or "partition"
+GROUP_MODES = SEARCH_MODES + ("partition",)
+
+
+def search_teams(
+    matrix: PairwiseMatrix,
+    team_size: int,
+    mode: str = "exhaustive",
+    workers: Optional[int] = None,
+    control: Optional[SearchControl] = None,
+) -> tuple[list[tuple], dict]:
+    """
+    Top teams as [(team, score)] best first, plus a report of how they were found.
+    `workers` > 1 shards exhaustive search across a process pool
+    (default: TEAM_SEARCH_WORKERS). `control` adds progress reporting,
+    cancellation and a time budget; the report then says whether it finished.
+    """
+    workers = TEAM_SEARCH_WORKERS if workers is None else workers
+    assert mode in SEARCH_MODES, f"Invalid mode: {mode}. Choose from {SEARCH_MODES}"
+    if mode == "exact":
+        scored, report = exact_top_teams(matrix, team_size, control=control)
+    elif mode == "heuristic":
+        scored, report = heuristic_top_teams(matrix, team_size, control=control)
+    else:
+        scored = sharded_top_k_teams(matrix, team_size, workers, control=control)
+        evaluated = comb(len(matrix), team_size)
+        if control is not None and control.stopped:
+            evaluated = control.evaluated
+        report = {"mode": "exhaustive", "evaluated": evaluated, "workers": max(workers, 1)}
+    if control is not None:
+        report.update(control.summary())
+    return scored, report
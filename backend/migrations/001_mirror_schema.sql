@@ -228,6 +228,8 @@ $$;
 -- ============================================================================
 -- Context-Weighted Re-ranking UDF
 -- ============================================================================
+-- A variable missing from either scores_json counts as 0.5, like
+-- scores.get(var, 0.5) in matching.py.
 
 CREATE OR REPLACE FUNCTION WEIGHTED_RERANK_SCORE(
     query_scores     VARIANT,
@@ -242,16 +244,16 @@ $$
         SELECT SUM(
             CASE
                 WHEN d.match_mode = 'similarity'
-                THEN (1.0 - ABS(query_scores[d.variable_name]::FLOAT -
-                                candidate_scores[d.variable_name]::FLOAT))
+                THEN (1.0 - ABS(COALESCE(query_scores[d.variable_name]::FLOAT, 0.5) -
+                                COALESCE(candidate_scores[d.variable_name]::FLOAT, 0.5)))
                      * CASE match_context
                          WHEN 'hackathon'  THEN d.weight_hackathon
                          WHEN 'romantic'   THEN d.weight_romantic
                          WHEN 'friendship' THEN d.weight_friendship
                        END
                 WHEN d.match_mode = 'complement'
-                THEN ABS(query_scores[d.variable_name]::FLOAT -
-                         candidate_scores[d.variable_name]::FLOAT)
+                THEN ABS(COALESCE(query_scores[d.variable_name]::FLOAT, 0.5) -
+                         COALESCE(candidate_scores[d.variable_name]::FLOAT, 0.5))
                      * CASE match_context
                          WHEN 'hackathon'  THEN d.weight_hackathon
                          WHEN 'romantic'   THEN d.weight_romantic
@@ -0,0 +1,154 @@
+-- ============================================================================
+-- Mirror: Snowflake Schema Migration 002 — one vector per user
+-- ============================================================================
+-- Run after 001 in a Snowflake SQL Worksheet (Snowsight). Safe to re-run.
+--
+-- USER_ARCHETYPES kept a full copy of a user's vector, scores and evidence
+-- for every server they joined. This splits it in two:
+--
+--   USER_VECTORS        one row per user: the 50-dim archetype vector, its
+--                       scores / evidence, reputation and the 768-dim Cortex
+--                       embedding
+--   SERVER_MEMBERSHIPS  one lightweight row per (user, server): that
+--                       server's status and abandonment_count
+--
+-- Existing USER_ARCHETYPES rows are copied over once (each user's most
+-- recently updated row supplies their vector) and the table is renamed to
+-- USER_ARCHETYPES_V1. Two read-only views sit over the join:
+--
+--   SERVER_MEMBERS      every membership, including users that so far only
+--                       have a Cortex embedding (ARCHETYPE_MATCH_SERVICE
+--                       indexes these)
+--   USER_ARCHETYPES     the members with a 50-dim vector, in the old table's
+--                       shape, so FIND_VECTOR_CANDIDATES, FIND_OPTIMAL_TEAM
+--                       and ad-hoc queries keep working
+--
+-- Writes go to the two tables. Re-running 001 afterwards fails on the view:
+-- drop it first.
+-- ============================================================================
+
+USE DATABASE MIRROR;
+USE SCHEMA MATCHING;
+
+-- ── Per-user Vectors ───────────────────────────────────────────────────────
+-- archetype_vector / scores_json are NULL for users that so far only have a
+-- Cortex embedding; they are left out of matching until they get a vector.
+-- embedded_at is when embedding_768 was last computed: a corpus updated after
+-- it is stale (updated_at moves with every vector write, so it can't tell).
+
+CREATE TABLE IF NOT EXISTS USER_VECTORS (
+    user_id             VARCHAR(128)       NOT NULL,
+    archetype_vector    VECTOR(FLOAT, 50),
+    scores_json         VARIANT,
+    evidence_json       VARIANT,
+    reputation_score    FLOAT              DEFAULT 0.0,
+    confidence          VARCHAR(16)        DEFAULT 'unknown',
+    message_count_used  INT                DEFAULT 0,
+    embedding_768       VECTOR(FLOAT, 768),
+    embedded_at         TIMESTAMP_NTZ,
+    created_at          TIMESTAMP_NTZ      DEFAULT CURRENT_TIMESTAMP(),
+    updated_at          TIMESTAMP_NTZ      DEFAULT CURRENT_TIMESTAMP(),
+    PRIMARY KEY (user_id)
+);
+
+-- Tables created by an earlier run of this script: add the column, and take
+-- each existing embedding's row time as its embedding time
+ALTER TABLE USER_VECTORS ADD COLUMN IF NOT EXISTS embedded_at TIMESTAMP_NTZ;
+
+UPDATE USER_VECTORS
+SET embedded_at = updated_at
+WHERE embedding_768 IS NOT NULL AND embedded_at IS NULL;
+
+
+-- ── Server Memberships ─────────────────────────────────────────────────────
+-- A member is eligible for matching on the server while status = 'active'
+-- and abandonment_count < 3.
+
+CREATE TABLE IF NOT EXISTS SERVER_MEMBERSHIPS (
+    user_id             VARCHAR(128)      NOT NULL,
+    server_id           VARCHAR(64)       NOT NULL,
+    status              VARCHAR(16)       DEFAULT 'active',
+    abandonment_count   INT               DEFAULT 0,
+    created_at          TIMESTAMP_NTZ     DEFAULT CURRENT_TIMESTAMP(),
+    updated_at          TIMESTAMP_NTZ     DEFAULT CURRENT_TIMESTAMP(),
+    PRIMARY KEY (user_id, server_id)
+);
+
+
+-- ── One-time Backfill from USER_ARCHETYPES ─────────────────────────────────
+
+EXECUTE IMMEDIATE $$
+BEGIN
+    IF (EXISTS (
+        SELECT 1 FROM INFORMATION_SCHEMA.TABLES
+        WHERE table_schema = 'MATCHING'
+          AND table_name = 'USER_ARCHETYPES'
+          AND table_type = 'BASE TABLE'
+    )) THEN
+        INSERT INTO USER_VECTORS (
+            user_id, archetype_vector, scores_json, evidence_json, reputation_score,
+            confidence, message_count_used, created_at, updated_at
+        )
+        SELECT
+            user_id, archetype_vector, scores_json, evidence_json, reputation_score,
+            confidence, message_count_used,
+            MIN(created_at) OVER (PARTITION BY user_id),
+            updated_at
+        FROM USER_ARCHETYPES
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY updated_at DESC) = 1;
+
+        INSERT INTO SERVER_MEMBERSHIPS (
+            user_id, server_id, status, abandonment_count, created_at, updated_at
+        )
+        SELECT user_id, server_id, status, abandonment_count, created_at, updated_at
+        FROM USER_ARCHETYPES;
+
+        ALTER TABLE USER_ARCHETYPES RENAME TO USER_ARCHETYPES_V1;
+    END IF;
+END;
+$$;
+
+
+-- ── Member Views ───────────────────────────────────────────────────────────
+-- The old per-(user, server) shape over the join. A row has changed when
+-- either its vector or its membership has.
+
+CREATE OR REPLACE VIEW SERVER_MEMBERS AS
+SELECT
+    m.user_id,
+    m.server_id,
+    uv.archetype_vector,
+    uv.scores_json,
+    uv.evidence_json,
+    uv.reputation_score,
+    m.abandonment_count,
+    uv.confidence,
+    uv.message_count_used,
+    m.status,
+    m.status = 'flagged'                       AS is_flagged,
+    uv.embedding_768,
+    m.created_at,
+    GREATEST(uv.updated_at, m.updated_at)      AS updated_at
+FROM SERVER_MEMBERSHIPS m
+JOIN USER_VECTORS uv ON uv.user_id = m.user_id;
+
+CREATE OR REPLACE VIEW USER_ARCHETYPES AS
+SELECT *
+FROM SERVER_MEMBERS
+WHERE archetype_vector IS NOT NULL;
+
+
+-- ── Cortex Search Service ──────────────────────────────────────────────────
+-- Nearest neighbours by the 768-dim Cortex embedding (embedding_768, the
+-- index SnowflakeStorage.cortex_search queries), filterable by server_id and
+-- is_flagged. Members without an embedding yet are left out.
+
+CREATE OR REPLACE CORTEX SEARCH SERVICE ARCHETYPE_MATCH_SERVICE
+    VECTOR INDEXES embedding_768
+    ATTRIBUTES server_id, is_flagged
+    WAREHOUSE = MIRROR_WH
+    TARGET_LAG = '5 minutes'
+AS
+    SELECT user_id, server_id, is_flagged, embedding_768
+    FROM SERVER_MEMBERS
+    WHERE embedding_768 IS NOT NULL;
@@ -8,16 +8,20 @@ Creates 5 test users so the matching flow has data to work with.
 import os
 import json
 import random
+import sys
 import requests
-import snowflake.connector
 from dotenv import load_dotenv
 
 load_dotenv()
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "frontend", ".env"))
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "frontend", ".env.local"))
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "matching"))
+from matching_engine import bulk_upsert_archetypes
+
 SUPABASE_URL = os.environ.get("NEXT_PUBLIC_SUPABASE_URL", "").rstrip("/")
 SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
+SEED_SERVER_IDS = ["general", "hackathon", "friend", "cofounder"]
 
 TEST_USERS = [
     {
@@ -214,68 +218,30 @@ def seed_supabase():
 
 
 def seed_snowflake():
+    """All test users on every SEED_SERVER_IDS server, in one bulk MERGE."""
+    rows = [
+        {
+            "user_id": u["id"],
+            "server_id": server_id,
+            # This script's own DIMENSION_ORDER, not the matching engine's
+            "vector": [float(u["scores"].get(dim, 0.5)) for dim in DIMENSION_ORDER],
+            "scores": u["scores"],
+            "evidence": {},
+            "confidence": "high",
+            "message_count_used": 100,
+        }
+        for u in TEST_USERS
+        for server_id in SEED_SERVER_IDS
+    ]
     try:
-        conn = snowflake.connector.connect(
-            account=os.environ["SNOWFLAKE_ACCOUNT"],
-            user=os.environ["SNOWFLAKE_USER"],
-            password=os.environ["SNOWFLAKE_PASSWORD"],
-            warehouse=os.environ.get("SNOWFLAKE_WAREHOUSE", "MIRROR_WH"),
-            database=os.environ.get("SNOWFLAKE_DATABASE", "MIRROR"),
-            schema=os.environ.get("SNOWFLAKE_SCHEMA", "MATCHING"),
-            role=os.environ.get("SNOWFLAKE_ROLE", "MIRROR_APP_ROLE"),
-        )
+        report = bulk_upsert_archetypes(rows)
     except Exception as e:
-        print(f"ERROR connecting to Snowflake: {e}")
+        print(f"  Snowflake ✗ bulk upsert failed: {e}")
         return False
 
-    cur = conn.cursor()
     for u in TEST_USERS:
-        vector = [float(u["scores"].get(dim, 0.5)) for dim in DIMENSION_ORDER]
-
-        for server_id in ["general", "hackathon", "friend", "cofounder"]:
-            try:
-                cur.execute(
-                    """
-                    MERGE INTO USER_ARCHETYPES tgt
-                    USING (SELECT
-                        %(uid)s AS user_id,
-                        %(sid)s AS server_id,
-                        PARSE_JSON(%(vec)s)::VECTOR(FLOAT, 50) AS archetype_vector,
-                        PARSE_JSON(%(scores)s) AS scores_json,
-                        PARSE_JSON(%(evidence)s) AS evidence_json,
-                        0.0 AS reputation_score,
-                        'high' AS confidence,
-                        100 AS message_count_used
-                    ) src
-                    ON tgt.user_id = src.user_id AND tgt.server_id = src.server_id
-                    WHEN MATCHED THEN UPDATE SET
-                        archetype_vector = src.archetype_vector,
-                        scores_json = src.scores_json,
-                        updated_at = CURRENT_TIMESTAMP()
-                    WHEN NOT MATCHED THEN INSERT (
-                        user_id, server_id, archetype_vector, scores_json,
-                        evidence_json, reputation_score, confidence, message_count_used
-                    ) VALUES (
-                        src.user_id, src.server_id, src.archetype_vector, src.scores_json,
-                        src.evidence_json, src.reputation_score, src.confidence, src.message_count_used
-                    )
-                    """,
-                    {
-                        "uid": u["id"],
-                        "sid": server_id,
-                        "vec": json.dumps(vector),
-                        "scores": json.dumps(u["scores"]),
-                        "evidence": json.dumps({}),
-                    },
-                )
-                conn.commit()
-            except Exception as e:
-                print(f"  Snowflake ✗ {u['first_name']} ({server_id}): {e}")
-                continue
-
-        print(f"  Snowflake ✓ {u['first_name']} {u['last_name']} (4 server_ids)")
-
-    conn.close()
+        print(f"  Snowflake ✓ {u['first_name']} {u['last_name']} ({len(SEED_SERVER_IDS)} server_ids)")
+    print(f"  {report['inserted']} inserted, {report['updated']} updated")
     return True
 
 
@@ -283,7 +249,7 @@ if __name__ == "__main__":
     print("=== Seeding Supabase profiles ===")
     seed_supabase()
     print()
-    print("=== Seeding Snowflake USER_ARCHETYPES ===")
+    print("=== Seeding Snowflake USER_VECTORS + SERVER_MEMBERSHIPS ===")
     seed_snowflake()
     print()
     print("Done! 5 test users ready for matching.")
@@ -4,8 +4,8 @@ Reputation Sync Worker: Solana → Supabase → Snowflake
 Polls UserIdentity PDA accounts on Solana for penalize_abandonment changes.
 When a user's abandonment_count changes:
   1. Update profiles.abandonment_count in Supabase.
-  2. If count >= 3 (flagged on-chain), set is_flagged=true in Snowflake
-     to remove them from the active match pool.
+  2. If count >= 3 (flagged on-chain), flag every one of their Snowflake
+     SERVER_MEMBERSHIPS to remove them from each server's match pool.
 
 Usage:
     cd backend
@@ -29,12 +29,15 @@ import base64
 from typing import Optional
 
 import requests
-import snowflake.connector
 from supabase import create_client, Client as SupabaseClient
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Shared Snowflake connection pool lives alongside the matching engine
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "matching"))
+from snowflake_pool import get_connection
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -74,29 +77,21 @@ def update_supabase_abandonment(
 # ── Snowflake ────────────────────────────────────────────────────────────────
 
 def _get_snowflake_connection():
-    return snowflake.connector.connect(
-        account=os.environ["SNOWFLAKE_ACCOUNT"],
-        user=os.environ["SNOWFLAKE_USER"],
-        password=os.environ["SNOWFLAKE_PASSWORD"],
-        warehouse=os.environ.get("SNOWFLAKE_WAREHOUSE", "MIRROR_WH"),
-        database=os.environ.get("SNOWFLAKE_DATABASE", "MIRROR"),
-        schema=os.environ.get("SNOWFLAKE_SCHEMA", "MATCHING"),
-        role=os.environ.get("SNOWFLAKE_ROLE", "MIRROR_APP_ROLE"),
-    )
+    """Borrow a session from the shared pool; conn.close() returns it."""
+    return get_connection()
 
 
 def update_user_flag(auth0_id: str, flagged: bool) -> None:
-    """Set is_flagged on the user's Snowflake user_archetypes row(s)."""
+    """Flag (or reactivate) the user on every server they belong to in Snowflake."""
     conn = _get_snowflake_connection()
     try:
         cur = conn.cursor()
         cur.execute(
             """
-            UPDATE USER_ARCHETYPES
-            SET is_flagged  = %(flag)s,
-                status      = CASE WHEN %(flag)s THEN 'flagged' ELSE 'active' END,
+            UPDATE SERVER_MEMBERSHIPS
+            SET status      = CASE WHEN %(flag)s THEN 'flagged' ELSE 'active' END,
                 updated_at  = CURRENT_TIMESTAMP()
-            WHERE auth0_id = %(uid)s
+            WHERE user_id = %(uid)s
             """,
             {"uid": auth0_id, "flag": flagged},
         )
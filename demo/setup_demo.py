@@ -11,18 +11,21 @@ import requests
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
 
-import snowflake.connector
 from dotenv import load_dotenv
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "backend", ".env"))
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "frontend", ".env"))
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "frontend", ".env.local"))
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "matching"))
+from matching_engine import bulk_upsert_archetypes
+
 SUPABASE_URL = os.environ.get("NEXT_PUBLIC_SUPABASE_URL", "").rstrip("/")
 SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
 
 DEMO_A_ID = "auth0|69a37834989a22983357f45c"     # Alex - alexwin2099
 DEMO_B_ID = "auth0|69a3b447d5da837a86ede8de"       # Saket
+DEMO_SERVER_IDS = ["general", "hackathon", "friend", "cofounder"]
 
 DIMS = [
     "abstract_thinking", "systems_thinking", "pattern_recognition",
@@ -76,44 +79,20 @@ def fix_saket_name():
     print(f"  Fix Saket name: {resp.status_code}")
 
 
-def seed_vector(conn, user_id, scores):
-    vec = to_vector(scores)
-    cur = conn.cursor()
-    for sid in ["general", "hackathon", "friend", "cofounder"]:
-        cur.execute(
-            """
-            MERGE INTO USER_ARCHETYPES tgt
-            USING (SELECT
-                %(uid)s AS user_id,
-                %(sid)s AS server_id,
-                PARSE_JSON(%(vec)s)::VECTOR(FLOAT, 50) AS archetype_vector,
-                PARSE_JSON(%(scores)s) AS scores_json,
-                PARSE_JSON('{}') AS evidence_json,
-                0.0 AS reputation_score,
-                'high' AS confidence,
-                100 AS message_count_used
-            ) src
-            ON tgt.user_id = src.user_id AND tgt.server_id = src.server_id
-            WHEN MATCHED THEN UPDATE SET
-                archetype_vector = src.archetype_vector,
-                scores_json = src.scores_json,
-                updated_at = CURRENT_TIMESTAMP()
-            WHEN NOT MATCHED THEN INSERT (
-                user_id, server_id, archetype_vector, scores_json,
-                evidence_json, reputation_score, confidence, message_count_used
-            ) VALUES (
-                src.user_id, src.server_id, src.archetype_vector, src.scores_json,
-                src.evidence_json, src.reputation_score, src.confidence, src.message_count_used
-            )
-            """,
-            {
-                "uid": user_id,
-                "sid": sid,
-                "vec": json.dumps(vec),
-                "scores": json.dumps(scores),
-            },
-        )
-        conn.commit()
+def seed_vector(user_id, scores):
+    """The demo user on every DEMO_SERVER_IDS server, in one bulk MERGE."""
+    bulk_upsert_archetypes([
+        {
+            "user_id": user_id,
+            "server_id": sid,
+            "vector": to_vector(scores),    # demo DIMS order, not the engine's
+            "scores": scores,
+            "evidence": {},
+            "confidence": "high",
+            "message_count_used": 100,
+        }
+        for sid in DEMO_SERVER_IDS
+    ])
 
 
 def main():
@@ -147,23 +126,12 @@ def main():
 
     print()
     print("=== Seeding demo vectors to Snowflake ===")
-    conn = snowflake.connector.connect(
-        account=os.environ["SNOWFLAKE_ACCOUNT"],
-        user=os.environ["SNOWFLAKE_USER"],
-        password=os.environ["SNOWFLAKE_PASSWORD"],
-        warehouse=os.environ.get("SNOWFLAKE_WAREHOUSE", "MIRROR_WH"),
-        database=os.environ.get("SNOWFLAKE_DATABASE", "MIRROR"),
-        schema=os.environ.get("SNOWFLAKE_SCHEMA", "MATCHING"),
-        role=os.environ.get("SNOWFLAKE_ROLE", "MIRROR_APP_ROLE"),
-    )
-
-    seed_vector(conn, DEMO_A_ID, alex_scores)
+    seed_vector(DEMO_A_ID, alex_scores)
     print(f"  ✓ Alex  ({DEMO_A_ID})")
 
-    seed_vector(conn, DEMO_B_ID, saket_scores)
+    seed_vector(DEMO_B_ID, saket_scores)
     print(f"  ✓ Saket ({DEMO_B_ID})")
 
-    conn.close()
     print()
     print("Done! Demo ready.")
     print()